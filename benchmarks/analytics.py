@@ -0,0 +1,97 @@
+"""Utilization reports from the occupancy cube against a loop over bookings
+A year of bookings in a generated building, then floor utilization &
+hour of day profile are computed both ways, and the cube is kept up to
+date while more bookings come
+Run from project root: python -m benchmarks.analytics"""
+import random
+import time
+from datetime import date, timedelta
+
+from booking.analytics import OccupancyAnalytics
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+
+ADMIN = "analytics-admin@varaha.com"
+ORGANIZATIONS = ["AnalyticsOrg1", "AnalyticsOrg2", "AnalyticsOrg3"]
+FLOORS = 5
+ROOMS_PER_FLOOR = 10
+DAYS = 365
+FIRST_DAY = date(2027, 1, 1)
+
+
+def setup_building(bookings_per_day):
+    """Bookings are inserted without quota & permission checks"""
+    user_handler.create_admin_user(ADMIN, "Analytics Admin")
+    for organization in ORGANIZATIONS:
+        organization_handler.create_organization(ADMIN, organization, "0000000000")
+    rooms = []
+    for floor in range(1, FLOORS + 1):
+        floor_handler.create_floor(ADMIN, 200 + floor)
+        for number in range(ROOMS_PER_FLOOR):
+            rooms.append(f"AN-{floor}-{number}")
+            room_handler.create_room(ADMIN, name=rooms[-1], floor=200 + floor, capacity=8)
+    generator = random.Random(1)
+    for day in range(DAYS):
+        booking_date = (FIRST_DAY + timedelta(days=day)).strftime("%d-%m-%Y")
+        date_ordinal = booking_handler._get_date_ordinal(booking_date)
+        for room_name, hour in generator.sample([(room_name, hour) for room_name in rooms
+                                                 for hour in range(8, 19)], bookings_per_day):
+            key = booking_handler._create_booking_key(room_name, booking_date, {hour: hour + 1})
+            booking_handler._insert_booking(key, ADMIN, generator.choice(ORGANIZATIONS), room_name,
+                                            booking_date, date_ordinal, hour, hour + 1)
+
+
+def loop_report():
+    """Floor utilization & hour of day profile looping over bookings"""
+    floor_hours, hour_counts = {}, [0] * 24
+    for booking_details in booking_handler.get_all_bookings().values():
+        start_hour, end_hour = next(iter(booking_details["slot"].items()))
+        floor = room_handler.get_room_details(booking_details["room"])["floor"]
+        floor_hours[floor] = floor_hours.get(floor, 0) + end_hour - start_hour
+        for hour in range(start_hour, end_hour):
+            hour_counts[hour] += 1
+    return floor_hours, hour_counts
+
+
+def cube_report(analytics):
+    utilization = analytics.get_utilization("floor")
+    return ({floor: floor_report["booked_hours"] for floor, floor_report in utilization.items()},
+            analytics.get_peak_hours()["hours"])
+
+
+def run(bookings_per_day=200, repeat=5):
+    setup_building(bookings_per_day)
+    start = time.perf_counter()
+    analytics = OccupancyAnalytics()
+    build_time = time.perf_counter() - start
+    assert loop_report() == cube_report(analytics)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        loop_report()
+    loop_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        cube_report(analytics)
+    cube_time = (time.perf_counter() - start) / repeat
+
+    print(f"bookings      : {len(booking_handler.bookings)}, cube built in {build_time * 1000:.0f} ms")
+    print(f"booking loop  : {loop_time * 1000:.2f} ms per report")
+    print(f"cube          : {cube_time * 1000:.2f} ms per report")
+    print(f"speedup       : {loop_time / cube_time:.1f}x")
+
+    user = "analytics-user@varaha.com"
+    user_handler.create_user(ADMIN, user, "Analytics User", ORGANIZATIONS[0])
+    organization_handler.set_organization_booking_limit(ADMIN, ORGANIZATIONS[0], 10 ** 6)
+    next_day = (FIRST_DAY + timedelta(days=DAYS)).strftime("%d-%m-%Y")
+    for room_name in list(room_handler.rooms)[:20]:
+        booking_handler.book_room(user, room_name, {20: 22}, next_day)
+    start = time.perf_counter()
+    cube_report(analytics)
+    print(f"20 bookings later, report with update: {(time.perf_counter() - start) * 1000:.2f} ms")
+    assert loop_report() == cube_report(analytics)
+    analytics.close()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,99 @@
+"""Batch room assignment against booking requests one by one
+A week of meeting requests(attendees, date, hour window, length,
+projector) in a building with a mix of room sizes. Greedy takes requests
+in the order given, each at its earliest start in the smallest free room,
+like find_available_rooms & book_room would. Assignment books the whole
+batch with booking_handler.assign_rooms
+Run from project root: python -m benchmarks.assignment [requests]"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from booking.availability import get_range_mask
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+
+ADMIN = "assign-admin@varaha.com"
+USER = "assign-user@varaha.com"
+ORGANIZATION = "AssignOrg"
+FLOORS = 10
+CAPACITIES = (4, 4, 6, 6, 8, 8, 10, 12, 16, 20, 30, 50)
+FIRST_DAY = date(2033, 1, 3)
+DAYS = 5
+
+
+def setup_building():
+    user_handler.create_admin_user(ADMIN, "Assign Admin")
+    organization_handler.create_organization(ADMIN, ORGANIZATION, "0000000000", monthly_quota=10 ** 6)
+    user_handler.create_user(ADMIN, USER, "Assign User", ORGANIZATION)
+    generator = random.Random(2)
+    for floor in range(1, FLOORS + 1):
+        floor_handler.create_floor(ADMIN, 300 + floor)
+        for number, capacity in enumerate(CAPACITIES):
+            room_handler.create_room(ADMIN, name=f"AS-{floor}-{number}", floor=300 + floor, capacity=capacity,
+                                     is_projector_available=generator.random() < 0.5)
+
+
+def get_requests(count):
+    generator = random.Random(3)
+    requests = []
+    for _ in range(count):
+        hours = generator.choice((1, 1, 1, 2, 2, 3))
+        window_start = generator.randrange(8, 17)
+        window_end = min(window_start + hours + generator.choice((0, 1, 2, 4)), 20)
+        requests.append({
+            "attendees": generator.choice((2, 3, 4, 5, 6, 8, 10, 12, 15, 25, 40)),
+            "date": (FIRST_DAY + timedelta(days=generator.randrange(DAYS))).strftime("%d-%m-%Y"),
+            "window": {window_start: window_end},
+            "hours": min(hours, window_end - window_start),
+            "projector": generator.random() < 0.3,
+        })
+    return requests
+
+
+def greedy(requests):
+    """Returns (assigned, empty seat hours) of one by one booking"""
+    masks, assigned, empty_seat_hours = {}, 0, 0
+    for request in requests:
+        date_ordinal = booking_handler._get_date_ordinal(request["date"])
+        window_start, window_end = next(iter(request["window"].items()))
+        spot = None
+        for start in range(window_start, window_end - request["hours"] + 1):
+            for room_name in room_handler._get_rooms_by_capacity(request["attendees"], request["projector"]):
+                if not masks.get((room_name, date_ordinal), 0) & get_range_mask(start, start + request["hours"]):
+                    spot = (room_name, start)
+                    break
+            if spot:
+                break
+        if spot:
+            room_name, start = spot
+            masks[(room_name, date_ordinal)] = masks.get((room_name, date_ordinal), 0) \
+                | get_range_mask(start, start + request["hours"])
+            assigned += 1
+            empty_seat_hours += (room_handler.rooms[room_name].capacity - request["attendees"]) * request["hours"]
+    return assigned, empty_seat_hours
+
+
+def run(count=3000):
+    setup_building()
+    requests = get_requests(count)
+    greedy_assigned, greedy_empty = greedy(requests)
+
+    start = time.perf_counter()
+    results = booking_handler.assign_rooms(USER, requests)
+    elapsed = time.perf_counter() - start
+    assigned = sum(result["booked"] for result in results)
+    empty = sum((room_handler.rooms[result["room"]].capacity - request["attendees"]) * request["hours"]
+                for result, request in zip(results, requests) if result["booked"])
+    assert len(booking_handler.get_booking_of_user(USER)) == assigned
+
+    print(f"requests   : {count} over {DAYS} days, {len(room_handler.rooms)} rooms in building")
+    print(f"greedy     : {greedy_assigned} assigned, {greedy_empty} empty seat hours, "
+          f"{greedy_empty / max(greedy_assigned, 1):.1f} per meeting")
+    print(f"assignment : {assigned} assigned & booked, {empty} empty seat hours, "
+          f"{empty / max(assigned, 1):.1f} per meeting, in {elapsed:.2f} sec")
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
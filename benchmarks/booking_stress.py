@@ -0,0 +1,115 @@
+"""Multi threaded booking stress test
+Many threads race for the same slots, throughput is measured per thread
+count and the run fails if any slot is double booked or quota overshoots
+Run from project root: python -m benchmarks.booking_stress"""
+import sys
+import threading
+import time
+from datetime import datetime
+
+from booking.availability import availability_handler, get_hours_from_mask
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+from utils.generic import FrozenClock, get_date_ordinal, set_clock
+
+ADMIN = "stress-admin@varaha.com"
+FLOOR = 98
+ROOMS = [f"STRESS-R{i}" for i in range(16)]
+DATES = ["01-01-2030", "02-01-2030"]  # same month, quota is kept per month
+HOURS = range(8, 20)
+ORGS_PER_RUN = 8  # 240 hours of quota for 384 slots, so both limits are hit
+USERS_PER_ORG = 4
+QUOTA = 30
+
+
+def setup_building():
+    user_handler.create_admin_user(ADMIN, "Stress Admin")
+    floor_handler.create_floor(ADMIN, FLOOR)
+    for room_name in ROOMS:
+        room_handler.create_room(ADMIN, name=room_name, floor=FLOOR, capacity=8)
+
+
+def create_users(run_id):
+    """Fresh organizations per run, since quota is kept per month"""
+    users = []
+    for org_number in range(ORGS_PER_RUN):
+        organization = f"StressOrg-{run_id}-{org_number}"
+        organization_handler.create_organization(ADMIN, organization, "0000000000")
+        for user_number in range(USERS_PER_ORG):
+            email = f"stress-{run_id}-{org_number}-{user_number}@varaha.com"
+            user_handler.create_user(ADMIN, email, "Stress User", organization)
+            users.append(email)
+    return users
+
+
+def clear_bookings():
+    for room_name in ROOMS:
+        for date in DATES:
+            for hour in HOURS:
+                key = booking_handler._create_booking_key(room_name, date, {hour: hour + 1})
+                booking_details = booking_handler.get_booking_details(key)
+                if booking_details:
+                    booking_handler.cancel_room_booking(
+                        booking_details["user"], room_name, {hour: hour + 1}, date)
+
+
+def worker(users, offset, attempts, results):
+    """Every thread walks the same slots, so threads keep colliding"""
+    booked = 0
+    for attempt in range(attempts):
+        user = users[(offset + attempt) % len(users)]
+        slot_number = attempt + offset
+        room_name = ROOMS[slot_number % len(ROOMS)]
+        date = DATES[slot_number // len(ROOMS) % len(DATES)]
+        hour = HOURS[slot_number // (len(ROOMS) * len(DATES)) % len(HOURS)]
+        try:
+            booking_handler.book_room(user, room_name, {hour: hour + 1}, date)
+            booked += 1
+        except Exception:
+            pass
+    results[offset] = booked
+
+
+def verify(users):
+    """No slot has two bookings and no organization is above quota"""
+    for room_name in ROOMS:
+        for date in DATES:
+            booked_hours = get_hours_from_mask(
+                availability_handler.get_occupancy_mask(room_name, get_date_ordinal(date)))
+            for hour in HOURS:
+                key = booking_handler._create_booking_key(room_name, date, {hour: hour + 1})
+                assert (key in booking_handler.bookings) == (hour in booked_hours), key
+
+    organizations = {user_handler.get_organization_from_user(user) for user in users}
+    for organization in organizations:
+        hours = organization_handler.get_organization_booking_hours(organization, date=DATES[0])
+        booked = len(booking_handler.get_booking_of_organization(organization=organization))
+        assert hours == booked <= QUOTA, (organization, hours, booked)
+
+
+def run(thread_counts=(1, 2, 4, 8, 16), attempts_per_thread=2000):
+    sys.setswitchinterval(1e-6)  # switch threads often so races surface
+    set_clock(FrozenClock(datetime(2029, 12, 1, 8, 0)))
+    setup_building()
+    for run_id, thread_count in enumerate(thread_counts):
+        users = create_users(run_id)
+        results = {}
+        threads = [threading.Thread(target=worker,
+                                    args=(users, offset, attempts_per_thread, results))
+                   for offset in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        verify(users)
+        attempts = attempts_per_thread * thread_count
+        print(f"threads={thread_count:<3} attempts={attempts:<6} booked={sum(results.values()):<5} "
+              f"throughput={attempts / elapsed:,.0f} ops/sec")
+        clear_bookings()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+"""Benchmark of book_many against the same slots booked one by one
+Run from project root: python -m benchmarks.bulk_booking"""
+import time
+from datetime import datetime
+
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+from utils.generic import FrozenClock, set_clock
+
+ADMIN = "bulk-admin@varaha.com"
+FLOOR = 97
+ROOMS = [f"BULK-R{i}" for i in range(3)]
+HOURS = range(9, 18)  # 27 slots per day, within 30 hour quota
+DATES = [f"{day:02d}-03-2030" for day in range(1, 29)]
+
+
+def setup_building():
+    user_handler.create_admin_user(ADMIN, "Bulk Admin")
+    floor_handler.create_floor(ADMIN, FLOOR)
+    for room_name in ROOMS:
+        room_handler.create_room(ADMIN, name=room_name, floor=FLOOR, capacity=8)
+
+
+def create_user(name):
+    """Separate organization per day booked, since quota is kept per month"""
+    organization_handler.create_organization(ADMIN, name, "0000000000")
+    email = f"{name.lower()}@varaha.com"
+    user_handler.create_user(ADMIN, email, "Bulk User", name)
+    return email
+
+
+def get_day_slots(date):
+    return [(room_name, date, {hour: hour + 1}) for room_name in ROOMS for hour in HOURS]
+
+
+def run():
+    set_clock(FrozenClock(datetime(2030, 2, 1, 8, 0)))
+    setup_building()
+    single_time = bulk_time = 0
+    for day_number, date in enumerate(DATES):
+        user = create_user(f"BulkSingle{day_number}")
+        start = time.perf_counter()
+        for room_name, date, time_slot in get_day_slots(date):
+            booking_handler.book_room(user, room_name, time_slot, date)
+        single_time += time.perf_counter() - start
+
+    for day_number, date in enumerate(DATES):
+        for room_name, date, time_slot in get_day_slots(date):  # free the slots again
+            booking_handler.cancel_room_booking(
+                booking_handler.get_booking_details(
+                    booking_handler._create_booking_key(room_name, date, time_slot))["user"],
+                room_name, time_slot, date)
+        user = create_user(f"BulkMany{day_number}")
+        start = time.perf_counter()
+        results = booking_handler.book_many(user, get_day_slots(date))
+        bulk_time += time.perf_counter() - start
+        assert all(result["booked"] for result in results)
+
+    slots = len(DATES) * len(ROOMS) * len(HOURS)
+    print(f"Slots booked: {slots} in batches of {len(ROOMS) * len(HOURS)}")
+    print(f"book_room : {single_time * 1000:.2f} ms")
+    print(f"book_many : {bulk_time * 1000:.2f} ms")
+    print(f"speedup   : {single_time / bulk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,79 @@
+"""Week grid of every room x hour for a calendar, one booking check per
+cell against free_busy, computed in one pass and then read from cache
+Run from project root: python -m benchmarks.free_busy [rooms]"""
+import random
+import sys
+from datetime import date, timedelta
+from timeit import timeit
+
+from booking.building import building_registry
+
+ADMIN = "grid-admin@varaha.com"
+FLOORS = 10
+DAYS = 7
+FIRST_DAY = date(2030, 12, 2)
+
+
+def setup_building(rooms_count, bookings_per_room_day=4):
+    """Bookings are inserted without quota & permission checks"""
+    building = building_registry.create_building("free-busy")
+    building.user_handler.create_admin_user(ADMIN, "Grid Admin")
+    for floor in range(1, FLOORS + 1):
+        building.floor_handler.create_floor(ADMIN, floor)
+    for number in range(rooms_count):
+        building.room_handler.create_room(ADMIN, name=f"GRID-{number}", floor=number % FLOORS + 1, capacity=8)
+    booking_handler = building.booking_handler
+    generator = random.Random(1)
+    for room_name in building.room_handler.rooms:
+        for booking_date in get_dates():
+            date_ordinal = booking_handler._get_date_ordinal(booking_date)
+            for hour in generator.sample(range(8, 19), bookings_per_room_day):
+                key = booking_handler._create_booking_key(room_name, booking_date, {hour: hour + 1})
+                booking_handler._insert_booking(key, ADMIN, "", room_name, booking_date,
+                                                date_ordinal, hour, hour + 1)
+    return building
+
+
+def get_dates():
+    return [(FIRST_DAY + timedelta(days=day)).strftime("%d-%m-%Y") for day in range(DAYS)]
+
+
+def cell_grid(building):
+    """Earlier way, a booking check per room, date & hour"""
+    booking_handler = building.booking_handler
+    return {room_name: [[booking_handler._check_if_booking_exists(room_name=room_name, date=booking_date,
+                                                                   time_slot={hour: hour + 1})
+                         for hour in range(24)] for booking_date in get_dates()]
+            for room_name in sorted(building.room_handler.rooms)}
+
+
+def matrix_grid(building):
+    dates = get_dates()
+    matrix = building.booking_handler.free_busy([dates[0], dates[-1]])
+    return {room_name: [[bool(mask >> hour & 1) for hour in range(24)] for mask in masks]
+            for room_name, masks in matrix["rooms"].items()}
+
+
+def run(rooms_count=500, repeat=5):
+    building = setup_building(rooms_count)
+    booking_handler = building.booking_handler
+    dates = get_dates()
+    assert cell_grid(building) == matrix_grid(building)
+
+    cell_time = timeit(lambda: cell_grid(building), number=1)
+    uncached_time = timeit(lambda: (booking_handler.free_busy_cache.clear(),
+                                    booking_handler.free_busy([dates[0], dates[-1]])), number=repeat) / repeat
+    cached_time = timeit(lambda: booking_handler.free_busy([dates[0], dates[-1]]), number=repeat) / repeat
+    print(f"grid of {rooms_count} rooms x {DAYS} days x 24 hours, {len(booking_handler.bookings)} bookings")
+    print(f"check per cell  : {cell_time * 1000:.1f} ms, {rooms_count * DAYS * 24} checks")
+    print(f"free_busy       : {uncached_time * 1000:.2f} ms, {cell_time / uncached_time:.0f}x")
+    print(f"free_busy cached: {cached_time * 1000:.3f} ms")
+
+    booking_handler._insert_booking("extra", ADMIN, "", "GRID-0", dates[3],
+                                    booking_handler._get_date_ordinal(dates[3]), 22, 23)
+    assert matrix_grid(building)["GRID-0"][3][22], "booking not seen after cache invalidation"
+    building_registry.remove_building("free-busy")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:2]))
@@ -0,0 +1,97 @@
+"""Warm restart benchmark, bookings are made with journaling on & the
+first two weeks of them archived, then a fresh process replays the
+journal, and again after a checkpoint
+Run from project root: python -m benchmarks.journal_replay [operations]"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from booking.booking import booking_handler, floor_handler, room_handler
+from booking.persistence import JournalManager
+from users.user import organization_handler, user_handler
+from utils.generic import FrozenClock, format_date_ordinal, set_clock
+
+ADMIN = "journal-admin@varaha.com"
+USER = "journal-user@varaha.com"
+ORGANIZATION = "JournalOrg"
+FLOOR = 95
+ROOMS = [f"JOURNAL-R{i}" for i in range(50)]
+START_DAY = datetime(2031, 1, 1).toordinal()
+ARCHIVED_DAYS = 14  # part of the first month, its quota hours count archived bookings too
+SLOTS_PER_DAY = len(ROOMS) * 24
+
+
+def setup_building():
+    user_handler.create_admin_user(ADMIN, "Journal Admin")
+    organization_handler.create_organization(ADMIN, ORGANIZATION, "0000000000",
+                                             monthly_quota=10 ** 9)
+    user_handler.create_user(ADMIN, USER, "Journal User", ORGANIZATION)
+    floor_handler.create_floor(ADMIN, FLOOR)
+    for room_name in ROOMS:
+        room_handler.create_room(ADMIN, name=room_name, floor=FLOOR, capacity=8)
+
+
+def book(operations):
+    """Books every hour of every room, day after day"""
+    for number in range(operations):
+        date = format_date_ordinal(START_DAY + number // SLOTS_PER_DAY)
+        hour = number % 24
+        booking_handler.book_room(USER, ROOMS[number // 24 % len(ROOMS)], {hour: hour + 1}, date)
+
+
+def restart(directory, operations):
+    """Replays directory in a fresh process, returns its output"""
+    result = subprocess.run([sys.executable, "-m", "benchmarks.journal_replay",
+                             "--replay", directory, str(operations)],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def replay(directory, operations):
+    start = time.perf_counter()
+    manager = JournalManager(directory, checkpoint_every=0)
+    replayed = manager.open()
+    elapsed = time.perf_counter() - start
+    manager.close()
+    archived = len(booking_handler.archive)
+    assert archived == min(operations, ARCHIVED_DAYS * SLOTS_PER_DAY), archived
+    assert len(booking_handler.bookings) + archived == operations, len(booking_handler.bookings)
+    first_month_hours = organization_handler.get_organization_booking_hours(
+        ORGANIZATION, date=format_date_ordinal(START_DAY))
+    assert first_month_hours == min(operations, 31 * SLOTS_PER_DAY), first_month_hours
+    print(f"replayed {replayed} records in {elapsed:.2f} sec, "
+          f"{len(booking_handler.bookings)} bookings, {archived} archived")
+
+
+def run(operations=200000):
+    set_clock(FrozenClock(datetime(2030, 12, 1, 8, 0)))
+    with tempfile.TemporaryDirectory() as directory:
+        manager = JournalManager(directory, checkpoint_every=0)
+        manager.open()
+        setup_building()
+        start = time.perf_counter()
+        book(operations)
+        elapsed = time.perf_counter() - start
+        booking_handler.archive_bookings(START_DAY + ARCHIVED_DAYS)
+        manager.journal.flush()
+        journal_size = os.path.getsize(os.path.join(directory, "journal"))
+        print(f"journaled {operations} bookings in {elapsed:.2f} sec "
+              f"({operations / elapsed:,.0f} ops/sec), journal {journal_size / operations:.0f} bytes/op")
+        print(f"restart from journal: {restart(directory, operations)}")
+
+        start = time.perf_counter()
+        manager.checkpoint()
+        print(f"checkpoint written in {time.perf_counter() - start:.2f} sec")
+        manager.close()
+        print(f"restart from checkpoint: {restart(directory, operations)}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--replay"]:
+        set_clock(FrozenClock(datetime(2030, 12, 1, 8, 0)))
+        replay(sys.argv[2], int(sys.argv[3]))
+    else:
+        run(*[int(arg) for arg in sys.argv[1:2]])
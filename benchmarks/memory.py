@@ -0,0 +1,89 @@
+"""Memory used per booking record, plain dict against BookingRecord
+and against a booking moved into the archive tier
+Strings are rebuilt for every booking, as they would arrive with
+separate requests
+Run from project root: python -m benchmarks.memory"""
+import gc
+import tracemalloc
+from datetime import date, timedelta
+
+from booking.archive import BookingArchive
+from utils.generic import get_date_ordinal
+from utils.records import BookingRecord
+
+BOOKINGS = 100000
+ROOMS = [f"ROOM-{floor}-{number}" for floor in range(10) for number in range(20)]
+ORGANIZATIONS = [f"Organization {number}" for number in range(50)]
+
+
+def fresh(value):
+    """Returns an equal string which is a separate object"""
+    return "".join(list(value))
+
+
+def get_booking_values(number):
+    booking_date = (date(2024, 1, 1) + timedelta(days=number // 2000)).strftime("%d-%m-%Y")
+    hour = number % 24
+    organization = ORGANIZATIONS[number % len(ORGANIZATIONS)]
+    return (hour, fresh(booking_date), get_date_ordinal(booking_date),
+            fresh(f"user{number % 5000}@{organization.replace(' ', '')}.com"),
+            fresh(ROOMS[number % len(ROOMS)]), fresh(organization))
+
+
+def create_dict_booking(hour, booking_date, date_ordinal, user, room, organization):
+    return {
+        "slot": {hour: hour + 1},
+        "date": booking_date,
+        "user": user,
+        "room": room,
+        "organization": organization,
+        "date_ordinal": date_ordinal
+    }
+
+
+def create_record_booking(hour, booking_date, date_ordinal, user, room, organization):
+    return BookingRecord(hour, hour + 1, booking_date, date_ordinal, user, room, organization)
+
+
+def measure(create_booking):
+    """Returns bytes allocated per booking still held by the store"""
+    gc.collect()
+    tracemalloc.start()
+    values = [get_booking_values(number) for number in range(BOOKINGS)]
+    store = {number: create_booking(*values[number]) for number in range(BOOKINGS)}
+    del values  # strings not kept by the store are freed
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return used / BOOKINGS
+
+
+def measure_archive():
+    """Returns bytes per booking held by the archive"""
+    gc.collect()
+    tracemalloc.start()
+    records = [create_record_booking(*get_booking_values(number)) for number in range(BOOKINGS)]
+    archive = BookingArchive()
+    archive.add_bookings(records, records[-1].date_ordinal + 1)
+    del records
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del archive
+    return used / BOOKINGS
+
+
+def run():
+    dict_bytes = measure(create_dict_booking)
+    record_bytes = measure(create_record_booking)
+    archive_bytes = measure_archive()
+    print(f"Bookings: {BOOKINGS}")
+    print(f"dict record    : {dict_bytes:.0f} bytes per booking")
+    print(f"BookingRecord  : {record_bytes:.0f} bytes per booking")
+    print(f"saved          : {100 * (1 - record_bytes / dict_bytes):.0f}%")
+    print(f"archived       : {archive_bytes:.0f} bytes per booking")
+
+
+if __name__ == "__main__":
+    run()
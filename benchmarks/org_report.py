@@ -0,0 +1,83 @@
+"""Microbenchmark for date range report of an organization
+Compares the sorted ordinal index with the earlier per booking strptime scan,
+and a whole year listing with reading pages of it through a cursor
+Run from project root: python -m benchmarks.org_report"""
+from datetime import date, timedelta
+from timeit import timeit
+
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+from utils.generic import find_if_date_in_range
+
+ADMIN = "bench-admin@varaha.com"
+USER = "bench-user@varaha.com"
+ORGANIZATION = "BenchOrg"
+ROOMS = ["BENCH-R1", "BENCH-R2", "BENCH-R3", "BENCH-R4"]
+HOURS_PER_ROOM = 6
+DAYS = 365
+
+
+def setup_building():
+    """Creates one organization with a year of bookings.
+    Bookings are inserted without quota checks as quota allows only 30 hours"""
+    user_handler.create_admin_user(ADMIN, "Bench Admin")
+    organization_handler.create_organization(ADMIN, ORGANIZATION, "0000000000")
+    user_handler.create_user(ADMIN, USER, "Bench User", ORGANIZATION)
+    floor_handler.create_floor(ADMIN, 99)
+    for room_name in ROOMS:
+        room_handler.create_room(ADMIN, name=room_name, floor=99, capacity=10)
+
+    first_day = date(2023, 1, 1)
+    for day in range(DAYS):
+        booking_date = (first_day + timedelta(days=day)).strftime("%d-%m-%Y")
+        for room_name in ROOMS:
+            for hour in range(9, 9 + HOURS_PER_ROOM):
+                key = booking_handler._create_booking_key(room_name, booking_date, {hour: hour + 1})
+                booking_handler._insert_booking(
+                    key, USER, ORGANIZATION, room_name, booking_date,
+                    booking_handler._get_date_ordinal(booking_date), hour, hour + 1)
+                booking_handler._create_user_booking_mapping(USER, key)
+
+
+def scan_report(date_range):
+    """Earlier implementation, parses dates of every booking of organization"""
+    org_bookings = []
+    for entry in booking_handler.org_booking_group[ORGANIZATION]:
+        booking_details = booking_handler.bookings[entry[2]]
+        if find_if_date_in_range(booking_details["date"], date_range):
+            org_bookings.append(booking_details)
+    return org_bookings
+
+
+def index_report(date_range):
+    return booking_handler.get_booking_of_organization(
+        organization=ORGANIZATION, date_range=date_range)
+
+
+def run(repeat=20):
+    setup_building()
+    date_range = ["12-06-2023", "18-06-2023"]  # one week
+    assert scan_report(date_range) == index_report(date_range)
+
+    total = len(booking_handler.org_booking_group[ORGANIZATION])
+    scan_time = timeit(lambda: scan_report(date_range), number=repeat) / repeat
+    index_time = timeit(lambda: index_report(date_range), number=repeat) / repeat
+    print(f"Bookings of organization: {total}, in one week: {len(index_report(date_range))}")
+    print(f"strptime scan : {scan_time * 1000:.3f} ms per report")
+    print(f"ordinal index : {index_time * 1000:.3f} ms per report")
+    print(f"speedup       : {scan_time / index_time:.1f}x")
+
+    pages = [None]  # cursors of 50 pages of 20 bookings, one year report is paged through
+    for _ in range(50):
+        pages.append(booking_handler.get_booking_page_of_organization(
+            organization=ORGANIZATION, cursor=pages[-1])["cursor"])
+    full_time = timeit(lambda: booking_handler.get_booking_of_organization(
+        organization=ORGANIZATION), number=repeat) / repeat
+    page_time = timeit(lambda: [booking_handler.get_booking_page_of_organization(
+        organization=ORGANIZATION, cursor=cursor) for cursor in pages], number=repeat) / repeat / len(pages)
+    print(f"full year list: {full_time * 1000:.3f} ms, {total} bookings")
+    print(f"page of 20    : {page_time * 1000:.3f} ms, average of pages 1 to {len(pages)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+"""Concurrent quota test, threads of one organization book together,
+each on its own day of the month so only the monthly quota can stop them.
+Fails if booked hours ever go over the quota
+Run from project root: python -m benchmarks.quota_contention"""
+import sys
+import threading
+import time
+from datetime import datetime
+
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+from utils.generic import FrozenClock, set_clock
+
+ADMIN = "quota-admin@varaha.com"
+FLOOR = 96
+ROOMS = [f"QUOTA-R{i}" for i in range(24)]
+QUOTA = 50
+THREADS = 16
+ROUNDS = 10
+
+
+def setup_building():
+    user_handler.create_admin_user(ADMIN, "Quota Admin")
+    floor_handler.create_floor(ADMIN, FLOOR)
+    for room_name in ROOMS:
+        room_handler.create_room(ADMIN, name=room_name, floor=FLOOR, capacity=8)
+
+
+def worker(user, date, barrier, results):
+    """Single, two hour & bulk bookings, no other thread books on date"""
+    barrier.wait()
+    booked_hours = 0
+    for number, room_name in enumerate(ROOMS):
+        try:
+            if number % 3 == 0:
+                booking_handler.book_room(user, room_name, {9: 10}, date)
+                booked_hours += 1
+            elif number % 3 == 1:
+                booking_handler.book_room(user, room_name, {9: 11}, date)
+                booked_hours += 2
+            else:
+                slots = [(room_name, date, {9: 10}), (room_name, date, {17: 18})]
+                if all(result["booked"] for result in booking_handler.book_many(user, slots)):
+                    booked_hours += 2
+        except Exception:
+            pass
+    results[user] = booked_hours
+
+
+def run():
+    sys.setswitchinterval(1e-6)  # switch threads often so races surface
+    set_clock(FrozenClock(datetime(2030, 1, 1, 8, 0)))
+    setup_building()
+    start = time.perf_counter()
+    for round_number in range(ROUNDS):
+        organization = f"QuotaOrg{round_number}"
+        organization_handler.create_organization(ADMIN, organization, "0000000000",
+                                                 monthly_quota=QUOTA)
+        users = []
+        for thread_number in range(THREADS):
+            users.append(f"quota-{round_number}-{thread_number}@varaha.com")
+            user_handler.create_user(ADMIN, users[-1], "Quota User", organization)
+
+        month = f"{round_number + 1:02d}-2030"  # new month every round
+        barrier = threading.Barrier(THREADS)
+        results = {}
+        threads = [threading.Thread(target=worker, args=(users[thread_number],
+                                                         f"{thread_number + 1:02d}-{month}",
+                                                         barrier, results))
+                   for thread_number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        hours = organization_handler.get_organization_booking_hours(organization, date=f"01-{month}")
+        booked = sum(end_hour - start_hour for booking in
+                     booking_handler.get_booking_of_organization(organization=organization)
+                     for start_hour, end_hour in booking["slot"].items())
+        assert hours == booked == sum(results.values()), (organization, hours, booked)
+        assert hours <= QUOTA, (organization, hours)
+        print(f"{organization}: {hours}/{QUOTA} hours booked by {THREADS} threads")
+    print(f"Quota held in {ROUNDS} rounds, {time.perf_counter() - start:.2f} sec")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,97 @@
+"""Equipment search of rooms, attribute index against a scan of room details
+Rooms of a generated building get random equipment in other_details, then
+"video conferencing + whiteboard + capacity >= 8" is searched both ways,
+on all floors and on one floor. Then 5 free rooms nearest to the home
+floor of an organization are searched by walking floors outwards against
+checking & sorting all rooms
+Run from project root: python -m benchmarks.room_search [rooms]"""
+import random
+import sys
+from timeit import timeit
+
+from booking.building import building_registry
+
+ADMIN = "search-admin@varaha.com"
+USER = "search-user@varaha.com"
+ORGANIZATION = "SearchOrg"
+HOME_FLOOR = 11
+DATE = "20-12-2030"
+FLOORS = 20
+ATTRIBUTES = {"video_conferencing": 0.3, "whiteboard": 0.5, "phone": 0.2}  # share of rooms having it
+ACCESSIBILITY = ["wheelchair", "hearing_loop"]
+
+
+def setup_building(rooms_count):
+    building = building_registry.create_building("room-search")
+    building.user_handler.create_admin_user(ADMIN, "Search Admin")
+    building.organization_handler.create_organization(ADMIN, ORGANIZATION, "0000000000",
+                                                      other_details={"floor": HOME_FLOOR})
+    building.user_handler.create_user(ADMIN, USER, "Search User", ORGANIZATION)
+    for floor in range(1, FLOORS + 1):
+        building.floor_handler.create_floor(ADMIN, floor)
+    generator = random.Random(1)
+    for number in range(rooms_count):
+        other_details = {attribute: True for attribute, share in ATTRIBUTES.items()
+                         if generator.random() < share}
+        if generator.random() < 0.2:
+            other_details["accessibility"] = generator.sample(ACCESSIBILITY, generator.randint(1, 2))
+        building.room_handler.create_room(
+            ADMIN, name=f"SEARCH-{number}", floor=generator.randint(1, FLOORS),
+            capacity=generator.randint(2, 20), is_projector_available=generator.random() < 0.5,
+            other_details=other_details)
+    date_ordinal = building.booking_handler._parse_date(DATE)[1]
+    for room_name in generator.sample(sorted(building.room_handler.rooms), rooms_count // 2):  # half are taken
+        building.availability_handler.mark_slot_booked(room_name, date_ordinal, 9, 10)
+    return building
+
+
+def scan_search(building, attributes, capacity, floor=None):
+    """Checks details of every room, smallest capacity first like the index"""
+    rooms = [room for room in building.room_handler.list_rooms().values()
+             if room.capacity >= capacity and (floor is None or room.floor == floor)
+             and all(room.other_details.get(attribute) == value for attribute, value in attributes.items())]
+    rooms.sort(key=lambda room: (room.capacity, room.name))
+    return [room.name for room in rooms]
+
+
+def index_search(building, attributes, capacity, floor=None):
+    return list(building.room_handler._get_rooms_by_capacity(capacity, False, floor, attributes))
+
+
+def scan_nearby(building, limit=5):
+    """Checks every room, then sorts free ones by distance from home floor"""
+    date_ordinal = building.booking_handler._parse_date(DATE)[1]
+    rooms = [room for room in building.room_handler.list_rooms().values()
+             if building.availability_handler.is_slot_free(room.name, date_ordinal, 9, 10)]
+    rooms.sort(key=lambda room: (abs(room.floor - HOME_FLOOR), room.capacity, room.name))
+    return [room.name for room in rooms[:limit]]
+
+
+def index_nearby(building, limit=5):
+    return [room.name for room in building.room_handler.find_nearby_rooms(USER, DATE, {9: 10}, limit=limit)]
+
+
+def run(rooms_count=5000, repeat=50):
+    building = setup_building(rooms_count)
+    attributes = {"video_conferencing": True, "whiteboard": True}
+    for floor in (None, 7):
+        assert scan_search(building, attributes, 8, floor) == index_search(building, attributes, 8, floor)
+        scan_time = timeit(lambda: scan_search(building, attributes, 8, floor), number=repeat) / repeat
+        index_time = timeit(lambda: index_search(building, attributes, 8, floor), number=repeat) / repeat
+        where = "all floors" if floor is None else f"floor {floor}"
+        print(f"VC + whiteboard + capacity >= 8, {where}: "
+              f"{len(index_search(building, attributes, 8, floor))} of {rooms_count} rooms")
+        print(f"  scan  : {scan_time * 1000:.3f} ms")
+        print(f"  index : {index_time * 1000:.3f} ms, {scan_time / index_time:.1f}x")
+
+    assert scan_nearby(building) == index_nearby(building)
+    scan_time = timeit(lambda: scan_nearby(building), number=repeat) / repeat
+    index_time = timeit(lambda: index_nearby(building), number=repeat) / repeat
+    print(f"5 free rooms nearest to floor {HOME_FLOOR}:")
+    print(f"  scan & sort   : {scan_time * 1000:.3f} ms")
+    print(f"  floors outward: {index_time * 1000:.3f} ms, {scan_time / index_time:.1f}x")
+    building_registry.remove_building("room-search")
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:2]))
@@ -0,0 +1,75 @@
+"""Scaling of floor sharded booking with number of shard processes
+Same bookings, spread evenly over floors, are sent in batches through
+ShardRouter.book_rooms with 1, 2, 4.. shards. Shards only run in
+parallel on as many cores as the machine has
+Run from project root: python -m benchmarks.sharded_booking [max shards]"""
+import os
+import sys
+import time
+
+from booking.sharding import ShardRouter
+from utils.generic import format_date_ordinal
+
+FLOORS = 8
+ROOMS_PER_FLOOR = 25
+DAYS = 10
+BATCH_SIZE = 2000
+FIRST_DAY = 741000  # an ordinal in year 2029
+
+
+def setup_building(router, run_name):
+    """Users & organizations stay in this process's handlers between
+    runs, so every run creates its own"""
+    admin, user = f"admin-{run_name}@varaha.com", f"user-{run_name}@varaha.com"
+    organization = f"ShardOrg{run_name}"
+    router.create_admin_user(admin, "Shard Admin")
+    router.create_organization(admin, organization, "0000000000", monthly_quota=10 ** 9)
+    router.create_user(admin, user, "Shard User", organization)
+    rooms = []
+    for floor in range(1, FLOORS + 1):
+        router.create_floor(admin, floor)
+        for number in range(ROOMS_PER_FLOOR):
+            rooms.append(f"SHARD-{floor}-{number}")
+            router.create_room(admin, name=rooms[-1], floor=floor, capacity=8)
+    return user, rooms
+
+
+def get_bookings(user, rooms):
+    """Every hour of every room for DAYS days, consecutive bookings are
+    on different floors"""
+    rooms_by_floor = sorted(rooms, key=lambda room: (int(room.split("-")[2]), int(room.split("-")[1])))
+    return [(user, room, {hour: hour + 1}, format_date_ordinal(FIRST_DAY + day))
+            for day in range(DAYS) for hour in range(24) for room in rooms_by_floor]
+
+
+def measure(workers):
+    router = ShardRouter(workers)
+    try:
+        user, rooms = setup_building(router, workers)
+        bookings = get_bookings(user, rooms)
+        start = time.perf_counter()
+        booked = 0
+        for position in range(0, len(bookings), BATCH_SIZE):
+            results = router.book_rooms(bookings[position:position + BATCH_SIZE])
+            booked += sum(result["booked"] for result in results)
+        elapsed = time.perf_counter() - start
+        assert booked == len(bookings), booked
+        assert len(router.get_booking_of_user(user)) == booked
+        return booked / elapsed
+    finally:
+        router.close()
+
+
+def run(max_workers=4):
+    print(f"cores available: {os.cpu_count()}")
+    workers, base = 1, None
+    while workers <= max_workers:
+        throughput = measure(workers)
+        base = base or throughput
+        print(f"shards={workers:<3} throughput={throughput:,.0f} bookings/sec "
+              f"scaling={throughput / base:.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,235 @@
+"""Synthetic workload benchmark
+Generates a building (floors, rooms with capacity & projector mix,
+organizations and their users), then threads run a mix of operations
+against the handlers. Reports ops/sec and p50/p95/p99 latency of every
+operation, results can be saved & compared with an earlier run.
+Run from project root: python -m benchmarks.workload --help
+eg. python -m benchmarks.workload --threads 4 --save before.json
+    python -m benchmarks.workload --threads 4 --compare before.json"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from booking.booking import booking_handler, floor_handler, room_handler
+from booking.instrumentation import disable_stats, enable_stats, stats
+from users.user import organization_handler, user_handler
+from utils.generic import FrozenClock, format_date_ordinal, set_clock
+
+ADMIN = "workload-admin@varaha.com"
+START_DAY = datetime(2032, 1, 1)
+CAPACITIES = (4, 6, 8, 10, 12, 20, 30, 50)
+OPERATIONS = ("book", "cancel", "list", "search", "report")
+DEFAULT_MIX = "book=40,cancel=10,list=15,search=25,report=10"
+
+
+def parse_mix(mix):
+    """"book=40,cancel=10" -> {"book": 40, "cancel": 10}"""
+    ratios = {}
+    for part in mix.split(","):
+        operation, ratio = part.split("=")
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation {operation}, expected one of {OPERATIONS}")
+        ratios[operation] = int(ratio)
+    return ratios
+
+
+class Building:
+    """Names of everything generated, handlers keep the actual state"""
+
+    def __init__(self, floors, rooms_per_floor, organizations, users_per_org,
+                 quota, seed):
+        self.random = random.Random(seed)
+        self.floors = list(range(100, 100 + floors))
+        self.rooms = []
+        self.organizations = [f"WorkloadOrg{number}" for number in range(organizations)]
+        self.users = []
+        user_handler.create_admin_user(ADMIN, "Workload Admin")
+        for floor in self.floors:
+            floor_handler.create_floor(ADMIN, floor)
+            for number in range(rooms_per_floor):
+                name = f"W{floor}-{number}"
+                room_handler.create_room(ADMIN, name=name, floor=floor,
+                                         capacity=self.random.choice(CAPACITIES),
+                                         is_projector_available=self.random.random() < 0.4)
+                self.rooms.append(name)
+        for organization in self.organizations:
+            organization_handler.create_organization(ADMIN, organization, "0000000000",
+                                                     monthly_quota=quota)
+            for number in range(users_per_org):
+                email = f"user{number}@{organization.lower()}.com"
+                user_handler.create_user(ADMIN, email, "Workload User", organization)
+                self.users.append(email)
+
+
+class Worker:
+    """Runs operations picked by ratio, keeps latencies per operation"""
+
+    def __init__(self, building, days, seed):
+        self.building = building
+        self.days = days
+        self.random = random.Random(seed)
+        self.booked = []  # (user, room, slot, date) this worker can cancel
+        self.latencies = {operation: [] for operation in OPERATIONS}
+        self.errors = {operation: 0 for operation in OPERATIONS}
+
+    def _get_date(self):
+        return format_date_ordinal(START_DAY.toordinal() + self.random.randrange(self.days))
+
+    def _get_slot(self):
+        hour = self.random.randrange(8, 19)
+        return {hour: hour + self.random.choice((1, 1, 1, 2))}
+
+    def book(self):
+        user = self.random.choice(self.building.users)
+        room, slot, date = self.random.choice(self.building.rooms), self._get_slot(), self._get_date()
+        booking_handler.book_room(user, room, slot, date)
+        self.booked.append((user, room, slot, date))
+
+    def cancel(self):
+        if not self.booked:
+            return
+        user, room, slot, date = self.booked.pop(self.random.randrange(len(self.booked)))
+        booking_handler.cancel_room_booking(user, room, slot, date)
+
+    def list(self):
+        room_handler.list_rooms(capacity=self.random.choice(CAPACITIES),
+                                projector_required=self.random.random() < 0.5)
+
+    def search(self):
+        room_handler.find_available_rooms(self._get_date(), self._get_slot(),
+                                          min_capacity=self.random.choice(CAPACITIES),
+                                          projector_required=self.random.random() < 0.3)
+
+    def report(self):
+        first_day = START_DAY.toordinal() + self.random.randrange(self.days)
+        booking_handler.get_booking_of_organization(
+            organization=self.random.choice(self.building.organizations),
+            date_range=[format_date_ordinal(first_day), format_date_ordinal(first_day + 7)])
+
+    def run(self, operations, count, barrier):
+        picks = self.random.choices(list(operations), weights=list(operations.values()), k=count)
+        barrier.wait()
+        for operation in picks:
+            start = time.perf_counter()
+            try:
+                getattr(self, operation)()
+            except Exception:
+                self.errors[operation] += 1  # conflicts, quota, closed dates
+            self.latencies[operation].append(time.perf_counter() - start)
+
+
+def get_percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+def run_workload(args):
+    set_clock(FrozenClock(datetime(2031, 12, 31, 8, 0)))
+    building = Building(args.floors, args.rooms_per_floor, args.organizations,
+                        args.users_per_org, args.quota, args.seed)
+    operations = parse_mix(args.mix)
+    workers = [Worker(building, args.days, args.seed + number) for number in range(args.threads)]
+    barrier = threading.Barrier(args.threads + 1)
+    threads = [threading.Thread(target=worker.run,
+                                args=(operations, args.operations // args.threads, barrier))
+               for worker in workers]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = {"config": vars(args), "elapsed_sec": elapsed, "operations": {}}
+    total = 0
+    for operation in operations:
+        latencies = sorted(latency for worker in workers for latency in worker.latencies[operation])
+        total += len(latencies)
+        results["operations"][operation] = {
+            "count": len(latencies),
+            "errors": sum(worker.errors[operation] for worker in workers),
+            "ops_per_sec": len(latencies) / elapsed,
+            "p50_ms": get_percentile(latencies, 50) * 1000,
+            "p95_ms": get_percentile(latencies, 95) * 1000,
+            "p99_ms": get_percentile(latencies, 99) * 1000,
+        }
+    results["ops_per_sec"] = total / elapsed
+    return results
+
+
+def print_results(results):
+    print(f"{'operation':<10}{'count':>8}{'errors':>8}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, operation_stats in results["operations"].items():
+        print(f"{operation:<10}{operation_stats['count']:>8}{operation_stats['errors']:>8}{operation_stats['ops_per_sec']:>12,.0f}"
+              f"{operation_stats['p50_ms']:>10.3f}{operation_stats['p95_ms']:>10.3f}{operation_stats['p99_ms']:>10.3f}")
+    print(f"total {results['ops_per_sec']:,.0f} ops/sec in {results['elapsed_sec']:.2f} sec")
+
+
+def compare(results, baseline, tolerance):
+    """Returns regressions against baseline, p95 latency or throughput
+    worse by more than tolerance(fraction)"""
+    regressions = []
+    for operation, operation_stats in results["operations"].items():
+        old_stats = baseline["operations"].get(operation)
+        if not old_stats:
+            continue
+        if operation_stats["p95_ms"] > old_stats["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{operation} p95 {old_stats['p95_ms']:.3f} -> {operation_stats['p95_ms']:.3f} ms")
+        if operation_stats["ops_per_sec"] < old_stats["ops_per_sec"] * (1 - tolerance):
+            regressions.append(f"{operation} {old_stats['ops_per_sec']:,.0f} -> "
+                               f"{operation_stats['ops_per_sec']:,.0f} ops/sec")
+    return regressions
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Mixed workload benchmark")
+    parser.add_argument("--floors", type=int, default=10)
+    parser.add_argument("--rooms-per-floor", type=int, default=20)
+    parser.add_argument("--organizations", type=int, default=50)
+    parser.add_argument("--users-per-org", type=int, default=40)
+    parser.add_argument("--quota", type=int, default=500, help="monthly quota of every organization")
+    parser.add_argument("--days", type=int, default=20, help="bookings are spread over these days")
+    parser.add_argument("--operations", type=int, default=50000, help="total, split among threads")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation ratios, default {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write results to this json file")
+    parser.add_argument("--compare", help="json file of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    parser.add_argument("--stats", action="store_true",
+                        help="instrument handlers & locks, lock waits are printed and saved")
+    return parser
+
+
+def run(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.stats:
+        enable_stats()
+    results = run_workload(args)
+    print_results(results)
+    if args.stats:
+        results["stats"] = stats()
+        disable_stats()
+        for name, lock_stats in results["stats"]["locks"].items():
+            print(f"{name} lock: {lock_stats['acquires']} acquires, {lock_stats['contended']} waited, "
+                  f"{lock_stats['wait_ms']:.1f} ms waiting, longest {lock_stats['max_wait_ms']:.2f} ms")
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
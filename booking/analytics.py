@@ -0,0 +1,252 @@
+"""Occupancy analytics, utilization of rooms, floors & organizations
+Occupancy is kept as a cube of room x date x hour, every room has an
+array of 24 bit hour masks (one per date, like booking.availability) and
+an array of organization ids (24 per date, 0 when free). Archived
+bookings stay in the cube, so reports cover past months too.
+
+The cube is built once and then kept up to date from the booking change
+feed, changes are applied before every report. Reports reduce arrays
+with C level loops (int.bit_count, array.count, strided slices) instead
+of looping over bookings"""
+import threading
+from array import array
+from collections import Counter
+
+from booking.archive import StringTable
+from booking.availability import HOURS_IN_DAY, get_hours_from_mask, get_range_mask
+from booking.booking import default_building
+from booking.feed import BOOKED, CANCELLED, SERIES_BOOKED, SERIES_ENDED, SERIES_SKIPPED
+from exceptions import InvalidParameterException, StaleSequenceException
+
+GROUPS = ("room", "floor", "organization")
+
+
+class OccupancyAnalytics:
+
+    def __init__(self, max_pending=100000, building=None):
+        """Reports on building, default one if not given"""
+        building = building or default_building
+        self.booking_handler = building.booking_handler
+        self.room_handler = building.room_handler
+        self.max_pending = max_pending  # changes kept between reports before a rebuild
+        self.lock = threading.Lock()
+        self.subscription = None
+        self.rebuild()
+
+    def rebuild(self):
+        """Builds the cube again from all bookings, archived ones too"""
+        with self.lock:
+            if self.subscription:
+                self.subscription.close()
+            # subscribed before reading, changes made meanwhile are applied again
+            self.subscription = self.booking_handler.subscribe_changes(max_pending=self.max_pending)
+            self.first_ordinal = None  # date of index 0 of the arrays
+            self.room_masks = {}  # room -> array of hour masks per date
+            self.room_organizations = {}  # room -> array of organization id + 1 per date & hour
+            self.organizations = StringTable()
+            self.series_ordinals = {}  # series id -> {ordinal: True} marked in the cube
+            for booking_details in self.booking_handler.archive.get_all_bookings():
+                self._mark(booking_details.room, booking_details.organization, booking_details.date_ordinal,
+                           booking_details.start_hour, booking_details.end_hour)
+            for booking_details in list(self.booking_handler.get_all_bookings().values()):
+                self._mark(booking_details.room, booking_details.organization, booking_details.date_ordinal,
+                           booking_details.start_hour, booking_details.end_hour)
+            for series_id in list(self.booking_handler.recurring_bookings):
+                self._mark_series(series_id)
+
+    def close(self):
+        self.subscription.close()
+
+    def refresh(self):
+        """Applies booking changes made since the last report"""
+        with self.lock:
+            try:
+                changes = self.subscription.get_pending()
+            except StaleSequenceException:
+                changes = None
+            if self.subscription.dropped:  # fell too far behind, changes are missing
+                changes = None
+            for change in changes or ():
+                if change.kind == BOOKED:
+                    self._mark(change.room, change.organization, change.date_ordinal,
+                               change.start_hour, change.end_hour)
+                elif change.kind == CANCELLED:
+                    self._clear(change.room, change.date_ordinal, change.start_hour, change.end_hour)
+                elif change.kind == SERIES_BOOKED:
+                    self._mark_series(change.key)
+                elif change.kind in (SERIES_SKIPPED, SERIES_ENDED):
+                    last_ordinal = change.date_ordinal if change.kind == SERIES_SKIPPED else None
+                    self._clear_series(change.key, change.room, change.date_ordinal, last_ordinal,
+                                       change.start_hour, change.end_hour)
+        if changes is None:
+            self.rebuild()
+
+    def _get_index(self, room_name, date_ordinal):
+        """Returns index of the date in arrays of the room, arrays are
+        grown(or shifted for an earlier date) to hold it"""
+        if self.first_ordinal is None:
+            self.first_ordinal = date_ordinal
+        if date_ordinal < self.first_ordinal:
+            shift = self.first_ordinal - date_ordinal
+            for name, masks in self.room_masks.items():
+                self.room_masks[name] = array("I", bytes(4 * shift)) + masks
+                self.room_organizations[name] = array("H", bytes(2 * shift * HOURS_IN_DAY)) \
+                    + self.room_organizations[name]
+            self.first_ordinal = date_ordinal
+        index = date_ordinal - self.first_ordinal
+        masks = self.room_masks.get(room_name)
+        if masks is None:
+            masks = self.room_masks[room_name] = array("I")
+            self.room_organizations[room_name] = array("H")
+        if index >= len(masks):
+            grow = index + 1 - len(masks)
+            masks.extend(array("I", bytes(4 * grow)))
+            self.room_organizations[room_name].extend(array("H", bytes(2 * grow * HOURS_IN_DAY)))
+        return index
+
+    def _mark(self, room_name, organization, date_ordinal, start_hour, end_hour):
+        index = self._get_index(room_name, date_ordinal)
+        self.room_masks[room_name][index] |= get_range_mask(start_hour, end_hour)
+        organization_id = self.organizations.get_id(organization) + 1
+        cells = self.room_organizations[room_name]
+        for hour in range(start_hour, end_hour):
+            cells[index * HOURS_IN_DAY + hour] = organization_id
+
+    def _clear(self, room_name, date_ordinal, start_hour, end_hour):
+        index = self._get_index(room_name, date_ordinal)
+        self.room_masks[room_name][index] &= ~get_range_mask(start_hour, end_hour)
+        cells = self.room_organizations[room_name]
+        for hour in range(start_hour, end_hour):
+            cells[index * HOURS_IN_DAY + hour] = 0
+
+    def _mark_series(self, series_id):
+        """Marks occurrences of recurring booking as it is now, a series
+        changed before this are marked without the dates it dropped"""
+        series = self.booking_handler.recurring_bookings.get(series_id)
+        if not series:
+            return
+        ordinals = self.series_ordinals.setdefault(series_id, {})
+        for ordinal in series.get_occurrences():
+            self._mark(series.room, series.organization, ordinal, series.start_hour, series.end_hour)
+            ordinals[ordinal] = True
+
+    def _clear_series(self, series_id, room_name, first_ordinal, last_ordinal, start_hour, end_hour):
+        """Clears occurrences marked for the series within the dates"""
+        ordinals = self.series_ordinals.get(series_id, {})
+        for ordinal in list(ordinals):
+            if ordinal >= first_ordinal and (last_ordinal is None or ordinal <= last_ordinal):
+                self._clear(room_name, ordinal, start_hour, end_hour)
+                ordinals.pop(ordinal)
+
+    def _get_slice(self, from_ordinal, to_ordinal):
+        """Returns (start, end) array indexes of the dates, clipped"""
+        if self.first_ordinal is None:
+            return 0, 0
+        start = 0 if from_ordinal is None else max(from_ordinal - self.first_ordinal, 0)
+        end = None if to_ordinal is None else max(to_ordinal - self.first_ordinal + 1, 0)
+        return start, end
+
+    def _get_days(self, from_ordinal, to_ordinal):
+        """Number of dates of the range, open ends are taken from the cube"""
+        if self.first_ordinal is None:
+            return 0
+        last_ordinal = self.first_ordinal + max(map(len, self.room_masks.values()), default=0) - 1
+        from_ordinal = self.first_ordinal if from_ordinal is None else from_ordinal
+        to_ordinal = last_ordinal if to_ordinal is None else to_ordinal
+        return max(to_ordinal - from_ordinal + 1, 0)
+
+    def _get_room_hours(self, room_name, start, end, hours_mask):
+        masks = self.room_masks.get(room_name)
+        if not masks:
+            return 0
+        return sum(map(int.bit_count, map(hours_mask.__and__, masks[start:end])))
+
+    def _get_organization_hours(self, organization_id, start, end, hours):
+        """Hours booked by organization in every room, per hour of day"""
+        hour_counts = [0] * HOURS_IN_DAY
+        cells_end = None if end is None else end * HOURS_IN_DAY
+        for cells in self.room_organizations.values():
+            for hour in hours:
+                hour_counts[hour] += cells[start * HOURS_IN_DAY + hour:cells_end:HOURS_IN_DAY].count(organization_id)
+        return hour_counts
+
+    def _get_rooms(self, group_by):
+        """Returns {group name: [room names]} of every room, booked or not"""
+        groups = {}
+        for room_name, room_details in list(self.room_handler.rooms.items()):
+            groups.setdefault(room_name if group_by == "room" else room_details.floor, []).append(room_name)
+        return groups
+
+    def _parse_report_range(self, date_range, hours):
+        if len(hours) != 2 or not 0 <= hours[0] < hours[1] <= HOURS_IN_DAY:
+            raise InvalidParameterException("Hours")
+        return self.booking_handler._get_date_range_ordinals(date_range)
+
+    def get_utilization(self, group_by="room", date_range=[], hours=(0, HOURS_IN_DAY)):
+        """Returns {room, floor or organization: {"booked_hours",
+        "available_hours", "utilization"}} within date range(all dates of
+        the cube if not given) and hours of day [start, end). Available
+        hours of an organization are those of all rooms"""
+        if group_by not in GROUPS:
+            raise InvalidParameterException("Group")
+        from_ordinal, to_ordinal = self._parse_report_range(date_range, hours)
+        self.refresh()
+        with self.lock:
+            start, end = self._get_slice(from_ordinal, to_ordinal)
+            room_hours = self._get_days(from_ordinal, to_ordinal) * (hours[1] - hours[0])
+            if group_by == "organization":
+                available_hours = room_hours * len(self.room_handler.rooms)
+                booked = {organization: sum(self._get_organization_hours(
+                              organization_id + 1, start, end, range(*hours)))
+                          for organization_id, organization in enumerate(self.organizations.strings)}
+            else:
+                hours_mask = get_range_mask(*hours)
+                rooms = self._get_rooms(group_by)
+                booked = {name: sum(self._get_room_hours(room_name, start, end, hours_mask)
+                                    for room_name in room_names)
+                          for name, room_names in rooms.items()}
+        report = {}
+        for name, booked_hours in booked.items():
+            if group_by != "organization":
+                available_hours = room_hours * len(rooms[name])
+            report[name] = {"booked_hours": booked_hours, "available_hours": available_hours,
+                            "utilization": booked_hours / available_hours if available_hours else 0.0}
+        return report
+
+    def get_peak_hours(self, group_by=None, name=None, date_range=[], top=3):
+        """Returns {"hours": booked hours per hour of day(24 counts),
+        "peak_hours": top busiest hours} of a room, floor, organization or
+        of the whole building if group_by isn't given"""
+        if group_by is not None and group_by not in GROUPS:
+            raise InvalidParameterException("Group")
+        from_ordinal, to_ordinal = self._parse_report_range(date_range, (0, HOURS_IN_DAY))
+        self.refresh()
+        with self.lock:
+            start, end = self._get_slice(from_ordinal, to_ordinal)
+            if group_by == "organization":
+                organization_id = self.organizations.ids.get(name)
+                hour_counts = [0] * HOURS_IN_DAY if organization_id is None else \
+                    self._get_organization_hours(organization_id + 1, start, end, range(HOURS_IN_DAY))
+            else:
+                room_names = self.room_masks if group_by is None else self._get_rooms(group_by).get(name, [])
+                mask_counts = Counter()  # few distinct masks, hours are expanded once per mask
+                for room_name in room_names:
+                    masks = self.room_masks.get(room_name)
+                    if masks:
+                        mask_counts.update(masks[start:end])
+                hour_counts = [0] * HOURS_IN_DAY
+                for mask, count in mask_counts.items():
+                    for hour in get_hours_from_mask(mask):
+                        hour_counts[hour] += count
+        peak_hours = sorted((hour for hour in range(HOURS_IN_DAY) if hour_counts[hour]),
+                            key=lambda hour: -hour_counts[hour])[:top]
+        return {"hours": hour_counts, "peak_hours": peak_hours}
+
+    def get_idle_rooms(self, date_range=[], hours=(0, HOURS_IN_DAY), max_utilization=0.0):
+        """Returns [(room, utilization)] of rooms used at most
+        max_utilization within dates & hours, least used first"""
+        utilization = self.get_utilization("room", date_range, hours)
+        idle_rooms = [(room_name, room_report["utilization"]) for room_name, room_report in utilization.items()
+                      if room_report["utilization"] <= max_utilization]
+        idle_rooms.sort(key=lambda room: (room[1], room[0]))
+        return idle_rooms
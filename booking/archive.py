@@ -0,0 +1,191 @@
+"""Read only archive tier of past bookings
+Bookings older than a horizon are moved out of the hot dicts & indexes
+into one set of columns per month: arrays of date, hours and ids of
+room, user & organization names. Rows of a month are sorted by date and
+hour, user & organization keep arrays of their row numbers"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from utils.generic import format_date_ordinal, get_month_of_ordinal, get_today_ordinal
+from utils.records import BookingRecord
+
+
+class StringTable:
+    """Gives every distinct string a small integer id"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+        self.lock = threading.Lock()
+
+    def get_id(self, string):
+        string_id = self.ids.get(string)
+        if string_id is None:
+            with self.lock:
+                string_id = self.ids.setdefault(string, len(self.strings))
+                if string_id == len(self.strings):
+                    self.strings.append(string)
+        return string_id
+
+
+class MonthArchive:
+    """Bookings of one month as columns, never changed once built"""
+    __slots__ = ("date_ordinals", "start_hours", "end_hours", "rooms",
+                 "users", "organizations", "user_rows", "org_rows")
+
+    def __init__(self, rows):
+        """rows are (date_ordinal, start_hour, end_hour, room id, user id,
+        organization id), sorted"""
+        self.date_ordinals = array("i", (row[0] for row in rows))
+        self.start_hours = array("b", (row[1] for row in rows))
+        self.end_hours = array("b", (row[2] for row in rows))
+        self.rooms = array("I", (row[3] for row in rows))
+        self.users = array("I", (row[4] for row in rows))
+        self.organizations = array("I", (row[5] for row in rows))
+        self.user_rows = self._group_rows(self.users)
+        self.org_rows = self._group_rows(self.organizations)
+
+    def _group_rows(self, column):
+        """Returns {id: array of row numbers}, rows stay in date order"""
+        rows = {}
+        for row_number, value in enumerate(column):
+            rows.setdefault(value, array("I")).append(row_number)
+        return rows
+
+    def get_rows(self):
+        for row_number in range(len(self.date_ordinals)):
+            yield (self.date_ordinals[row_number], self.start_hours[row_number],
+                   self.end_hours[row_number], self.rooms[row_number],
+                   self.users[row_number], self.organizations[row_number])
+
+
+class BookingArchive:
+
+    def __init__(self):
+        self.archived_before = 0  # bookings dated before this ordinal are in the archive
+        self.months = {}  # month number -> MonthArchive
+        self.month_numbers = []  # sorted
+        self.strings = StringTable()
+        self.lock = threading.Lock()  # one archiving run at a time, see Booking.archive_bookings
+
+    def add_bookings(self, bookings, archived_before):
+        """Adds booking records to the archive, then publishes the new
+        horizon. Changed months are built again & swapped in whole
+        Caller holds the lock"""
+        self.add_rows(((booking_details.date_ordinal, booking_details.start_hour,
+                        booking_details.end_hour, booking_details.room, booking_details.user,
+                        booking_details.organization) for booking_details in bookings), archived_before)
+
+    def add_rows(self, rows, archived_before=0):
+        """Same as add_bookings, rows are (date_ordinal, start_hour,
+        end_hour, room, user, organization) as given by get_month_rows"""
+        month_rows = {}
+        get_id = self.strings.get_id
+        for date_ordinal, start_hour, end_hour, room, user, organization in rows:
+            month_rows.setdefault(get_month_of_ordinal(date_ordinal), []).append((
+                date_ordinal, start_hour, end_hour, get_id(room), get_id(user), get_id(organization)))
+        for month, rows in month_rows.items():
+            if month in self.months:
+                rows.extend(self.months[month].get_rows())
+            rows.sort()
+            self.months[month] = MonthArchive(rows)
+        self.month_numbers = sorted(self.months)
+        self.archived_before = max(self.archived_before, archived_before)
+
+    def _get_record(self, month_archive, row_number):
+        strings = self.strings.strings
+        date_ordinal = month_archive.date_ordinals[row_number]
+        return BookingRecord(
+            start_hour=month_archive.start_hours[row_number],
+            end_hour=month_archive.end_hours[row_number],
+            date=format_date_ordinal(date_ordinal),
+            date_ordinal=date_ordinal,
+            user=strings[month_archive.users[row_number]],
+            room=strings[month_archive.rooms[row_number]],
+            organization=strings[month_archive.organizations[row_number]]
+        )
+
+    def get_bookings(self, field, name, from_ordinal=None, to_ordinal=None):
+        """Returns archived bookings of a user or organization(field is
+        "user" or "organization"), within dates(both inclusive) if given,
+        sorted by date and hour"""
+        return [booking_details for month_bookings in
+                self.iter_months(field, name, from_ordinal, to_ordinal)
+                for booking_details in month_bookings]
+
+    def iter_months(self, field, name, from_ordinal=None, to_ordinal=None):
+        """Yields archived bookings one month at a time, of a user or
+        organization(all bookings if field is None), within dates(both
+        inclusive) if given, sorted by date and hour"""
+        if field is not None:
+            name_id = self.strings.ids.get(name)
+            if name_id is None:
+                return
+        archived_before = self.archived_before
+        to_ordinal = archived_before - 1 if to_ordinal is None else min(to_ordinal, archived_before - 1)
+        from_ordinal = from_ordinal or 1
+        if to_ordinal < from_ordinal:
+            return
+        month_numbers = self.month_numbers
+        start = bisect_left(month_numbers, get_month_of_ordinal(from_ordinal))
+        end = bisect_right(month_numbers, get_month_of_ordinal(to_ordinal))
+        for month in month_numbers[start:end]:
+            month_archive = self.months[month]
+            date_ordinals = month_archive.date_ordinals
+            if field is None:
+                row_numbers = range(len(date_ordinals))
+            else:
+                rows_of_name = month_archive.user_rows if field == "user" else month_archive.org_rows
+                row_numbers = rows_of_name.get(name_id, ())
+            yield [self._get_record(month_archive, row_number) for row_number in row_numbers
+                   if from_ordinal <= date_ordinals[row_number] <= to_ordinal]
+
+    def get_all_bookings(self):
+        """Yields every archived booking record"""
+        for month in list(self.month_numbers):
+            month_archive = self.months[month]
+            for row_number in range(len(month_archive.date_ordinals)):
+                yield self._get_record(month_archive, row_number)
+
+    def get_month_rows(self):
+        """Yields rows of archived bookings, a list per month, in the form
+        add_rows takes them"""
+        strings = self.strings.strings
+        for month in list(self.month_numbers):
+            month_archive = self.months[month]
+            yield [(date_ordinal, start_hour, end_hour, strings[room], strings[user], strings[organization])
+                   for date_ordinal, start_hour, end_hour, room, user, organization in month_archive.get_rows()]
+
+    def __len__(self):
+        return sum(len(self.months[month].date_ordinals) for month in list(self.month_numbers))
+
+
+class Compactor:
+    """Background thread moving bookings older than horizon_days into the
+    archive every interval seconds"""
+
+    def __init__(self, booking_handler, horizon_days=90, interval=3600):
+        self.booking_handler = booking_handler
+        self.horizon_days = horizon_days
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def run_once(self):
+        """Archives now, returns count of bookings moved"""
+        return self.booking_handler.archive_bookings(get_today_ordinal() - self.horizon_days)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
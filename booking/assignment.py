@@ -0,0 +1,159 @@
+"""Room assignment of a batch of meeting requests
+A request is {"attendees", "date", "window": {earliest start: latest end},
+"hours": length, default 1, "projector": needed, default False}. Rooms
+are picked so seats left empty are fewest:
+- dates are solved apart, on copies of room occupancy masks
+- most constrained requests(fewest fitting rooms, least slack in window,
+  longest) are placed first, each in the smallest room with a free run
+  of hours in its window, among those the start leaving fewest free gaps
+- a request left without room gets one of a placed request's spot when
+  that request can be moved elsewhere(augmenting path of length one, as
+  in bipartite matching)
+Exact minimum waste with movable multi hour meetings is NP-hard, this
+gets close in a few passes over masks"""
+from booking.availability import FULL_DAY_MASK, HOURS_IN_DAY, get_range_mask
+
+
+def _get_start_mask(free_mask, hours):
+    """Bits of hours at which a run of free hours of the length starts"""
+    starts = free_mask
+    for shift in range(1, hours):
+        starts &= free_mask >> shift
+    return starts
+
+
+class Request:
+    __slots__ = ("position", "attendees", "date_ordinal", "window_start",
+                 "window_end", "hours", "projector", "rooms", "placement")
+
+    def __init__(self, position, attendees, date_ordinal, window_start, window_end,
+                 hours, projector, rooms):
+        self.position = position  # in the batch
+        self.attendees = attendees
+        self.date_ordinal = date_ordinal
+        self.window_start = window_start
+        self.window_end = window_end
+        self.hours = hours
+        self.projector = projector
+        self.rooms = rooms  # fitting room names, smallest first
+        self.placement = None  # (room, start hour)
+
+    def get_window_starts(self):
+        """Bits of start hours keeping the meeting within its window"""
+        return get_range_mask(self.window_start, self.window_end - self.hours + 1)
+
+
+class RoomAssigner:
+
+    def __init__(self, room_handler, availability_handler):
+        self.room_handler = room_handler
+        self.availability_handler = availability_handler
+
+    def solve(self, requests):
+        """Places parsed Requests, sets placement of those that fit.
+        Rooms aren't booked, see Booking.assign_rooms"""
+        date_requests = {}
+        for request in requests:
+            date_requests.setdefault(request.date_ordinal, []).append(request)
+        for date_ordinal, requests_of_date in date_requests.items():
+            self._solve_date(date_ordinal, requests_of_date)
+
+    def get_fitting_rooms(self, attendees, projector):
+        return list(self.room_handler._get_rooms_by_capacity(attendees, projector))
+
+    def _solve_date(self, date_ordinal, requests):
+        masks = {}  # room -> occupied hours, existing bookings & placed requests
+        placed = {}  # room -> {start hour: request} placed in this batch
+        requests.sort(key=lambda request: (len(request.rooms), request.window_end - request.window_start
+                                           - request.hours, -request.hours, -request.attendees))
+        unplaced = [request for request in requests if not self._place(request, masks, placed)]
+        stuck = {}  # placed requests with no spot in other rooms, until a move succeeds
+        for request in unplaced:
+            if self._place_by_moving(request, masks, placed, stuck):
+                stuck.clear()
+
+    def _get_mask(self, masks, room_name, date_ordinal):
+        mask = masks.get(room_name)
+        if mask is None:
+            mask = masks[room_name] = self.availability_handler.get_occupancy_mask(room_name, date_ordinal)
+        return mask
+
+    def _find_spot(self, request, masks, skip_room=None):
+        """Returns (room, start hour) of the smallest fitting room with a
+        free run in the window, start touching most booked hours or day
+        edges, so free hours stay in long runs. None if nothing fits"""
+        capacities = self.room_handler.rooms
+        best, best_capacity = None, None
+        window_starts = request.get_window_starts()
+        for room_name in request.rooms:
+            capacity = capacities[room_name].capacity
+            if best_capacity is not None and capacity > best_capacity:
+                break  # rooms are smallest first, bigger ones waste more
+            if room_name == skip_room:
+                continue
+            mask = self._get_mask(masks, room_name, request.date_ordinal)
+            starts = _get_start_mask(~mask & FULL_DAY_MASK, request.hours) & window_starts
+            while starts:
+                start = (starts & -starts).bit_length() - 1
+                starts &= starts - 1
+                end = start + request.hours
+                touching = (start == 0 or mask >> (start - 1) & 1) + (end == HOURS_IN_DAY or mask >> end & 1)
+                if best is None or touching > best[0]:
+                    best, best_capacity = (touching, room_name, start), capacity
+                if touching == 2:
+                    break
+        return None if best is None else best[1:]
+
+    def _mark(self, request, spot, masks, placed):
+        room_name, start = spot
+        request.placement = spot
+        masks[room_name] = self._get_mask(masks, room_name, request.date_ordinal) \
+            | get_range_mask(start, start + request.hours)
+        placed.setdefault(room_name, {})[start] = request
+
+    def _unmark(self, request, masks, placed):
+        room_name, start = request.placement
+        masks[room_name] &= ~get_range_mask(start, start + request.hours)
+        placed[room_name].pop(start)
+        request.placement = None
+
+    def _place(self, request, masks, placed):
+        spot = self._find_spot(request, masks)
+        if spot is None:
+            return False
+        self._mark(request, spot, masks, placed)
+        return True
+
+    def _place_by_moving(self, request, masks, placed, stuck):
+        """Takes the spot of one placed request which then moves to
+        another room or start, returns False if no such move exists.
+        Other rooms don't change while moves fail, so a request found
+        stuck there is only checked in its own room again"""
+        window_starts = request.get_window_starts()
+        for room_name in request.rooms:
+            for blocker_start, blocker in list(placed.get(room_name, {}).items()):
+                if blocker_start >= request.window_end or blocker_start + blocker.hours <= request.window_start:
+                    continue  # outside the window, moving it frees nothing
+                blocker_mask = get_range_mask(blocker_start, blocker_start + blocker.hours)
+                freed = ~(masks[room_name] & ~blocker_mask) & FULL_DAY_MASK
+                starts = _get_start_mask(freed, request.hours) & window_starts
+                if not starts:
+                    continue
+                start = (starts & -starts).bit_length() - 1
+                own_mask = masks[room_name] & ~blocker_mask | get_range_mask(start, start + request.hours)
+                own_starts = _get_start_mask(~own_mask & FULL_DAY_MASK, blocker.hours) & blocker.get_window_starts()
+                if blocker in stuck and not own_starts:
+                    continue
+                self._unmark(blocker, masks, placed)
+                self._mark(request, (room_name, start), masks, placed)
+                spot = None if blocker in stuck else self._find_spot(blocker, masks, skip_room=room_name)
+                if spot is None:
+                    stuck[blocker] = True
+                    if own_starts:
+                        spot = (room_name, (own_starts & -own_starts).bit_length() - 1)
+                if spot is not None:
+                    self._mark(blocker, spot, masks, placed)
+                    return True
+                self._unmark(request, masks, placed)
+                self._mark(blocker, (room_name, blocker_start), masks, placed)
+        return False
@@ -0,0 +1,101 @@
+"""Slot occupancy of rooms, one 24 bit mask per room and date
+Dates are ordinals, see utils.generic.get_date_ordinal"""
+
+HOURS_IN_DAY = 24
+FULL_DAY_MASK = (1 << HOURS_IN_DAY) - 1
+
+
+def get_range_mask(start_hour, end_hour=None):
+    """Returns mask with bits of hours start_hour..end_hour(exclusive) set"""
+    if end_hour is None:
+        end_hour = start_hour + 1
+    return ((1 << (end_hour - start_hour)) - 1) << start_hour
+
+
+def get_hours_from_mask(mask):
+    """Returns list of hours whose bit is set in the mask"""
+    hours = []
+    while mask:
+        lowest_bit = mask & -mask
+        hours.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return hours
+
+
+class Availability:
+
+    def __init__(self):
+        self.room_date_mask = {}  # (room, date) -> occupied hours as bits
+        self.room_series = {}  # room -> recurring bookings of the room
+
+    def get_occupancy_mask(self, room_name, date_ordinal):
+        """Returns bitmask of booked hours of a room on a date,
+        including hours held by recurring bookings"""
+        mask = self.room_date_mask.get((room_name, date_ordinal), 0)
+        series_list = self.room_series.get(room_name)
+        if series_list:
+            for series in series_list:
+                if series.occurs_on(date_ordinal):
+                    mask |= series.mask
+        return mask
+
+    def add_series(self, series):
+        """Room is held by the recurring booking on each of its dates
+        Lists of room_series are replaced, never changed, readers iterate
+        them without a lock"""
+        self.room_series[series.room] = self.room_series.get(series.room, []) + [series]
+
+    def remove_series(self, series):
+        """Drops recurring booking from the room"""
+        series_list = [other for other in self.room_series.get(series.room, []) if other is not series]
+        if series_list:
+            self.room_series[series.room] = series_list
+        else:
+            self.room_series.pop(series.room, None)
+
+    def get_series_at(self, room_name, date_ordinal, hour):
+        """Returns recurring booking holding the hour of room on date"""
+        series_list = self.room_series.get(room_name)
+        if series_list:
+            for series in series_list:
+                if series.start_hour <= hour < series.end_hour and series.occurs_on(date_ordinal):
+                    return series
+        return None
+
+    def is_slot_free(self, room_name, date_ordinal, hour, end_hour=None):
+        """Checks whether none of hour..end_hour(exclusive) is booked for
+        the room on date, only the hour is checked if end_hour not given"""
+        return not self.get_occupancy_mask(room_name, date_ordinal) & get_range_mask(hour, end_hour)
+
+    def mark_slot_booked(self, room_name, date_ordinal, hour, end_hour=None):
+        """Sets the bits of hour..end_hour(exclusive) in room's mask for date"""
+        room_date = (room_name, date_ordinal)
+        self.room_date_mask[room_date] = self.room_date_mask.get(room_date, 0) | \
+            get_range_mask(hour, end_hour)
+
+    def mark_slot_free(self, room_name, date_ordinal, hour, end_hour=None):
+        """Clears the bits of hour..end_hour(exclusive) in room's mask for date"""
+        room_date = (room_name, date_ordinal)
+        mask = self.room_date_mask.get(room_date, 0) & ~get_range_mask(hour, end_hour)
+        if mask:
+            self.room_date_mask[room_date] = mask
+        else:  # don't keep empty days around
+            self.room_date_mask.pop(room_date, None)
+
+    def get_free_mask(self, room_name, date_ordinal):
+        """Returns bitmask of free hours of a room on a date"""
+        return ~self.get_occupancy_mask(room_name, date_ordinal) & FULL_DAY_MASK
+
+    def get_free_hours(self, room_name, date_ordinal):
+        """Returns list of free hours of a room on a date"""
+        return get_hours_from_mask(self.get_free_mask(room_name, date_ordinal))
+
+    def get_first_free_hour(self, room_name, date_ordinal, from_hour=0):
+        """Returns first free hour at or after from_hour, None if day is full"""
+        free_mask = self.get_free_mask(room_name, date_ordinal) >> from_hour << from_hour
+        if not free_mask:
+            return None
+        return (free_mask & -free_mask).bit_length() - 1
+
+
+availability_handler = Availability()  # of the default building, bound in booking.booking
@@ -1,20 +1,47 @@
 """Do we need to take date into consideration while booking"""
+import threading
 import uuid
+from bisect import bisect_left, insort
+from itertools import islice
+from types import MappingProxyType
 
+from booking.archive import BookingArchive
+from booking.assignment import Request, RoomAssigner
+from booking.feed import (BOOKED, CANCELLED, SERIES_BOOKED, SERIES_ENDED,
+                          SERIES_SKIPPED, WAITLIST_PROMOTED, ChangeFeed)
+from booking.free_busy import MAX_FREE_BUSY_DAYS, FreeBusyCache
+from booking.availability import (HOURS_IN_DAY, availability_handler,
+                                  get_range_mask)
+from booking.building import building_registry
+from booking.paging import (ORDER_BY_DATE, ORDER_BY_ROOM, check_order,
+                            check_page_size, decode_cursor, encode_cursor,
+                            iter_index, iter_room_index, iter_sorted,
+                            merge_streams)
+from booking.recurrence import FREQUENCIES, RecurringBooking
+from booking.waitlist import Waitlist
 from exceptions import (AuthorizationException, DuplicateException,
-                        NotFoundException, RequiredParameterException)
-from users.user import organization_handler, user_handler
+                        InvalidParameterException, NotFoundException,
+                        QuotaExceededException, RequiredParameterException)
+from users.user import default_building
 from utils.authorization import Authorization
-from utils.generic import (check_if_dates_are_same,
-                           find_if_date_in_range, get_current_hour_minute,
-                           get_date_before, get_time_difference_in_minutes,
-                           get_today)
-from threading import Lock
-lock = Lock()
+from utils.ds_utils import StripedLock, VersionedSnapshot
+from utils.journal import (OP_ARCHIVE, OP_BOOK, OP_CANCEL, OP_FLOOR,
+                           OP_ROOM, OP_ROOM_UPDATE, OP_SERIES,
+                           OP_SERIES_END, OP_SERIES_SKIP)
+from utils.records import BookingRecord, RoomRecord
+from utils.generic import (format_date_ordinal, get_current_minute_of_day,
+                           get_date_ordinal, get_month_of_ordinal,
+                           get_today_ordinal)
+
 
 class Floor:
-    floors = {}
-    floor_room = {}
+    # stores are per building, handlers of the building are bound by booking.building
+
+    def __init__(self):
+        self.floors = {}  # entries are read only, replaced on change(copy-on-write)
+        self.floors_snapshot = VersionedSnapshot(self.floors)
+        self.floor_room = {}  # floor -> {room: True}
+        self.floor_numbers = []  # sorted, to walk floors outwards from one
 
     def create_floor(self, requestor = "", number=0, rooms_count=0): # Apply validation on input types
         """Public function to be called from outside the class
@@ -26,13 +53,19 @@ class Floor:
         if floor_exists:
             raise DuplicateException("Floor")
 
-        self.floors[number] = {
-            "id": str(uuid.uuid4()),
-            "rooms_count": rooms_count
-        }
-
+        self._add_floor(number, rooms_count, str(uuid.uuid4()))
         return f"Floor number {number} created successfully"
 
+    def _add_floor(self, number, rooms_count, id):
+        """Stores floor, also used to replay the journal"""
+        self.floors[number] = MappingProxyType({
+            "id": id,
+            "rooms_count": rooms_count
+        })
+        self.floors_snapshot.publish()
+        insort(self.floor_numbers, number)
+        self.building.record(OP_FLOOR, number, rooms_count, id)
+
     def _check_if_floor_exists(self, floor_number):
         """Internal Class function to check duplicacy"""
         if floor_number in self.floors:
@@ -42,7 +75,7 @@ class Floor:
     def _check_can_create_floor(self, requestor_email):
         """Checks whether requestor is authorized to create Floor"""
         requestor_email = requestor_email.lower()
-        requestor_details = user_handler.get_user_details(requestor_email)
+        requestor_details = self.user_handler.get_user_details(requestor_email)
         return Authorization.can_manage_floors(requestor_details)
 
     def get_floor_details(self, floor_number):
@@ -52,35 +85,71 @@ class Floor:
         return self.floors.get(floor_number, None)
     
     def get_all_floors(self):
-        """Returns Details of all Floors"""
-        return self.floors
+        """Returns read only snapshot of Details of all Floors"""
+        return self.floors_snapshot.get()
+
+    def _update_floor(self, floor_number, **changes):
+        """Replaces floor details with an updated copy, so details
+        handed out earlier never change under readers"""
+        self.floors[floor_number] = MappingProxyType({**self.floors[floor_number], **changes})
+        self.floors_snapshot.publish()
 
     def _increase_room_count_of_floor(self, floor_number, increment_count=1):
         """Function to increase room count in a floor"""
-        self.floors[floor_number]["rooms_count"] += 1
+        rooms_count = self.floors[floor_number]["rooms_count"] + increment_count
+        self._update_floor(floor_number, rooms_count=rooms_count)
         return f"Increased room count on floor {floor_number}"
 
     def _decrease_room_count_of_floor(self, floor_number, increment_count=1):
         """Function to decrease room count in a floor"""
-        self.floors[floor_number]["rooms_count"] -= 1
+        rooms_count = self.floors[floor_number]["rooms_count"] - increment_count
+        self._update_floor(floor_number, rooms_count=rooms_count)
         return f"Decreased room count on floor {floor_number}"
 
     def add_room_to_floor(self, floor=0, room=""):
         """Adds a room to particular floor in grouping"""
-        self.floor_room[floor] = {  # used map because adding/removing is O(1)
-            room: True
-        }
+        self.floor_room.setdefault(floor, {})[room] = True  # used map because adding/removing is O(1)
         self._increase_room_count_of_floor(floor)
         return f"Added room {room} to floor {floor}"
 
+    def get_rooms_of_floor(self, floor_number):
+        """Returns names of rooms on the floor"""
+        return list(self.floor_room.get(floor_number, {}))
+
+    def iter_floors_by_distance(self, home_floor):
+        """Yields (distance, [floors]) of existing floors, nearest to
+        home_floor first, both floors at the same distance together"""
+        floor_numbers = self.floor_numbers
+        above = bisect_left(floor_numbers, home_floor)
+        below = above - 1
+        while below >= 0 or above < len(floor_numbers):
+            distance = min(home_floor - floor_numbers[below] if below >= 0 else float("inf"),
+                           floor_numbers[above] - home_floor if above < len(floor_numbers) else float("inf"))
+            floors = []
+            if below >= 0 and home_floor - floor_numbers[below] == distance:
+                floors.append(floor_numbers[below])
+                below -= 1
+            if above < len(floor_numbers) and floor_numbers[above] - home_floor == distance:
+                floors.append(floor_numbers[above])
+                above += 1
+            yield distance, floors
+
 
 floor_handler = Floor()
 
 
 class Room:
-    rooms = {}
-    bookings = {}
-    
+
+    def __init__(self):
+        self.rooms = {}
+        self.rooms_snapshot = VersionedSnapshot(self.rooms)
+        self.bookings = {}
+        self.capacity_index = {}  # (floor or None, projector_required) -> sorted [(capacity, name)]
+        self.attribute_index = {}  # (attribute, value) of other_details -> bitmap of room bits
+        self.room_bits = {}  # room -> its bit in attribute bitmaps
+        self.bit_rooms = []  # bit -> room
+        self.lock = threading.Lock()  # one room change at a time, readers don't take it
+
     def create_room(self, requestor="", name="", floor=1, 
                     capacity=0, is_projector_available=False, 
                     other_details={}):
@@ -94,22 +163,159 @@ class Room:
         if room_exists:
             raise DuplicateException("Room")
 
-        floor_details = floor_handler.get_floor_details(floor)
+        floor_details = self.floor_handler.get_floor_details(floor)
         if not floor_details:
             raise NotFoundException("Floor")
 
-        self.rooms[name] = {
-            "id": str(uuid.uuid4()),
-            "name": name,
-            "floor": floor,
-            "capacity": capacity,
-            "is_projector_available": is_projector_available,
-            "other_details": other_details,
-            "is_available": True
-        }
-        floor_handler.add_room_to_floor(floor, name)
-
+        self._add_room(name, floor, capacity, is_projector_available,
+                       other_details, str(uuid.uuid4()))
         return f"Room {name} created successfully"
+
+    def _add_room(self, name, floor, capacity, is_projector_available,
+                  other_details, id):
+        """Stores room & indexes it, also used to replay the journal"""
+        with self.lock:
+            self.rooms[name] = RoomRecord(
+                id=id,
+                name=name,
+                floor=floor,
+                capacity=capacity,
+                is_projector_available=is_projector_available,
+                other_details=MappingProxyType(dict(other_details)),
+                is_available=True
+            )
+            self.rooms_snapshot.publish()
+            self.floor_handler.add_room_to_floor(floor, name)
+            self._add_room_to_capacity_index(name)
+            self.room_bits[name] = len(self.bit_rooms)
+            self.bit_rooms.append(name)
+            self._index_attributes(name, other_details, add=True)
+            self.building.record(OP_ROOM, name, floor, capacity, is_projector_available,
+                                 dict(other_details), id)
+
+    def update_room(self, requestor="", name="", capacity=None,
+                    is_projector_available=None, other_details=None):
+        """Changes capacity, projector or other details(replaced as a
+        whole) of a room, those not given stay. Bookings are kept
+        Requires Manage Rooms Permission"""
+        if not self._check_can_create_room(requestor):   # check permissions
+            raise AuthorizationException("Update Room")
+        if not self._check_if_room_exists(name):
+            raise NotFoundException("Room")
+        room_details = self.rooms[name]
+        self._update_room(
+            name, room_details.capacity if capacity is None else capacity,
+            room_details.is_projector_available if is_projector_available is None else is_projector_available,
+            room_details.other_details if other_details is None else other_details)
+        return f"Room {name} updated successfully"
+
+    def _update_room(self, name, capacity, is_projector_available, other_details):
+        """Replaces room details with an updated copy & moves the room in
+        indexes, also used to replay the journal. Capacity lists are
+        replaced, not changed, so searches running meanwhile see old
+        or new list whole"""
+        with self.lock:
+            old_details = self.rooms[name]
+            self._index_attributes(name, old_details.other_details, add=False)
+            for index_key, index in list(self.capacity_index.items()):
+                if (old_details.capacity, name) in index:
+                    self.capacity_index[index_key] = [entry for entry in index if entry[1] != name]
+            self.rooms[name] = RoomRecord(
+                id=old_details.id,
+                name=name,
+                floor=old_details.floor,
+                capacity=capacity,
+                is_projector_available=is_projector_available,
+                other_details=MappingProxyType(dict(other_details)),
+                is_available=old_details.is_available
+            )
+            self.rooms_snapshot.publish()
+            self._add_room_to_capacity_index(name, copy=True)
+            self._index_attributes(name, other_details, add=True)
+            self.building.record(OP_ROOM_UPDATE, name, capacity, is_projector_available,
+                                 dict(other_details))
+
+    def _get_attribute_keys(self, details, strict=False):
+        """Yields (attribute, value) index keys of other details, every
+        item of a list, tuple or set value is a key of its own. Values
+        that can't be hashed aren't indexed, or raise if strict"""
+        for attribute, value in details.items():
+            values = value if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+            for item in values:
+                try:
+                    hash(item)
+                except TypeError:
+                    if strict:
+                        raise InvalidParameterException("Attributes")
+                    continue
+                yield (attribute, item)
+
+    def _index_attributes(self, room_name, details, add):
+        """Sets(or clears) bit of room in bitmaps of its attributes,
+        bitmaps are ints, replaced never changed in place"""
+        bit = 1 << self.room_bits[room_name]
+        for index_key in self._get_attribute_keys(details):
+            bitmap = self.attribute_index.get(index_key, 0)
+            bitmap = bitmap | bit if add else bitmap & ~bit
+            if bitmap:
+                self.attribute_index[index_key] = bitmap
+            else:
+                self.attribute_index.pop(index_key, None)
+
+    def _add_room_to_capacity_index(self, room_name, copy=False):
+        """Adds room to every capacity sorted list it can be searched from,
+        so that a search never has to filter on floor or projector.
+        Lists are copied first if copy is set"""
+        room_details = self.rooms[room_name]
+        floors = (None, room_details["floor"])
+        projector_options = (False, True) if room_details["is_projector_available"] else (False,)
+        for floor in floors:
+            for projector_required in projector_options:
+                index = self.capacity_index.get((floor, projector_required), [])
+                if copy or not index:
+                    index = self.capacity_index[(floor, projector_required)] = list(index)
+                insort(index, (room_details["capacity"], room_name))
+
+    def _get_rooms_by_capacity(self, min_capacity=0, projector_required=False, floor=None,
+                               attributes={}):
+        """Yields room names with capacity >= min_capacity, smallest first.
+        attributes is {attribute: value} other details must have, a list,
+        tuple or set value needs all its items"""
+        index = self.capacity_index.get((floor, bool(projector_required)), [])
+        start = bisect_left(index, (min_capacity or 0,))
+        if not attributes:
+            for position in range(start, len(index)):
+                yield index[position][1]
+            return
+        matching = self._get_attribute_bitmap(attributes)
+        if matching.bit_count() >= len(index) - start:  # attributes filter less than capacity
+            for position in range(start, len(index)):
+                if matching >> self.room_bits[index[position][1]] & 1:
+                    yield index[position][1]
+            return
+        rooms = []
+        while matching:
+            lowest_bit = matching & -matching
+            matching ^= lowest_bit
+            room_details = self.rooms[self.bit_rooms[lowest_bit.bit_length() - 1]]
+            if room_details.capacity >= (min_capacity or 0) \
+                    and (floor is None or room_details.floor == floor) \
+                    and (room_details.is_projector_available or not projector_required):
+                rooms.append((room_details.capacity, room_details.name))
+        rooms.sort()
+        for capacity, room_name in rooms:
+            yield room_name
+
+    def _get_attribute_bitmap(self, attributes):
+        """Returns bitmap of rooms having all the attributes"""
+        if not isinstance(attributes, dict):
+            raise InvalidParameterException("Attributes")
+        matching = (1 << len(self.bit_rooms)) - 1
+        for index_key in self._get_attribute_keys(attributes, strict=True):
+            matching &= self.attribute_index.get(index_key, 0)
+            if not matching:
+                break
+        return matching
     
     def _check_if_room_exists(self, room_name):
         """Internal Class function to check duplicacy"""
@@ -122,7 +328,7 @@ class Room:
     def _check_can_create_room(self, requestor_email):
         """Checks whether requestor is authorized to create Room"""
         requestor_email = requestor_email.lower()
-        requestor_details = user_handler.get_user_details(requestor_email)
+        requestor_details = self.user_handler.get_user_details(requestor_email)
         return Authorization.can_manage_rooms(requestor_details)
 
     def get_room_details(self, name):
@@ -131,23 +337,113 @@ class Room:
             raise RequiredParameterException(name)
         return self.rooms.get(name, None)
     
-    def list_rooms(self, capacity=None, projector_required=False):
-        """Returns Details of all Rooms with filters(if applied)"""
-        rooms = self.rooms
-        if capacity:
-            rooms = {i: rooms[i] for i in rooms if rooms[i]["capacity"] >= capacity}
-        if projector_required:
-            rooms = {i: rooms[i] for i in rooms if rooms[i]["is_projector_available"]}
+    def list_rooms(self, capacity=None, projector_required=False,
+                   date="", time_slot={}, floor=None, attributes={}):
+        """Returns Details of all Rooms with filters(if applied)
+        attributes is {attribute: value} of other details eg.
+        {"video_conferencing": True, "whiteboard": True}, see
+        _get_rooms_by_capacity. If time_slot is given, only rooms free in
+        that slot are returned.
+        Rooms are read from a snapshot, so result is never changed later"""
+        rooms = self.rooms_snapshot.get()
+        if capacity or projector_required or floor is not None or attributes:
+            rooms = {i: rooms[i] for i in
+                     self._get_rooms_by_capacity(capacity, projector_required, floor, attributes)
+                     if i in rooms}
+        if time_slot:
+            date, date_ordinal = self.booking_handler._parse_date(date)
+            start_hour, end_hour = self.booking_handler._get_slot_hours(time_slot)
+            rooms = {i: rooms[i] for i in rooms
+                     if self.availability_handler.is_slot_free(i, date_ordinal, start_hour, end_hour)}
         return rooms
 
+    def find_available_rooms(self, date="", time_slot={}, min_capacity=0,
+                             projector_required=False, floor=None, limit=5, attributes={}):
+        """Returns upto limit rooms free in the time slot which satisfy
+        the filters(attributes as in list_rooms), best fitting(smallest
+        capacity) room first"""
+        date, date_ordinal = self.booking_handler._parse_date(date)
+        start_hour, end_hour = self.booking_handler._get_slot_hours(time_slot)
+        available_rooms = []
+        if limit <= 0:
+            return available_rooms
+        for room_name in self._get_rooms_by_capacity(min_capacity, projector_required, floor, attributes):
+            if self.availability_handler.is_slot_free(room_name, date_ordinal, start_hour, end_hour):
+                available_rooms.append(self.rooms[room_name])
+                if len(available_rooms) >= limit:
+                    break
+        return available_rooms
+
+    def find_nearby_rooms(self, requestor="", date="", time_slot={}, min_capacity=0,
+                          projector_required=False, limit=5, attributes={}, home_floor=None):
+        """Returns upto limit rooms free in the time slot which satisfy
+        the filters, nearest to home floor first, best fitting room first
+        on floors equally far. Home floor is the "floor" in other details
+        of requestor's organization, or home_floor if given.
+        Floors are visited outwards & search stops once limit rooms are found"""
+        if home_floor is None:
+            home_floor = self._get_home_floor(requestor)
+        if isinstance(home_floor, bool) or not isinstance(home_floor, (int, float)):
+            raise InvalidParameterException("Home Floor")
+        date, date_ordinal = self.booking_handler._parse_date(date)
+        start_hour, end_hour = self.booking_handler._get_slot_hours(time_slot)
+        nearby_rooms = []
+        if limit <= 0:
+            return nearby_rooms
+        for distance, floors in self.floor_handler.iter_floors_by_distance(home_floor):
+            free_rooms = []
+            for floor in floors:
+                found = 0
+                for room_name in self._get_rooms_by_capacity(min_capacity, projector_required, floor, attributes):
+                    if self.availability_handler.is_slot_free(room_name, date_ordinal, start_hour, end_hour):
+                        free_rooms.append(self.rooms[room_name])
+                        found += 1
+                        if found >= limit - len(nearby_rooms):  # rest of the floor fits worse
+                            break
+            free_rooms.sort(key=lambda room: (room.capacity, room.name))
+            nearby_rooms.extend(free_rooms[:limit - len(nearby_rooms)])
+            if len(nearby_rooms) >= limit:
+                break
+        return nearby_rooms
+
+    def _get_home_floor(self, requestor):
+        """Returns "floor" of other details of requestor's organization"""
+        requestor_details = self.user_handler.get_user_details(requestor.lower())
+        if not requestor_details:
+            raise NotFoundException("User")
+        organization_details = self.organization_handler.get_organization_details(
+            requestor_details.organization) if requestor_details.organization else None
+        if not organization_details or organization_details.other_details.get("floor") is None:
+            raise NotFoundException("Home Floor")
+        return organization_details.other_details["floor"]
+
 
 room_handler = Room()
 
 
 class Booking:
-    bookings = {}
-    user_booking_group = {}
-    org_booking_group = {}
+
+    def __init__(self, waitlist_by_quota=False):
+        """waitlist_by_quota puts waiters of organizations with more quota
+        left first, else waiters are first come first served"""
+        self.bookings = {}
+        self.bookings_snapshot = VersionedSnapshot(self.bookings)
+        self.user_booking_group = {}  # user -> sorted [(date_ordinal, hour, key)]
+        self.org_booking_group = {}  # organization -> sorted [(date_ordinal, hour, key)]
+        self.user_room_booking_group = {}  # user -> {room: sorted entries}, entries shared with user_booking_group
+        self.org_room_booking_group = {}  # organization -> {room: sorted entries}
+        self.recurring_bookings = {}  # series id -> RecurringBooking
+        self.user_series_group = {}  # user -> {series id: True}
+        self.org_series_group = {}  # organization -> {series id: True}
+        self.archive = BookingArchive()  # bookings moved out of the dicts above once old
+        self.open_from = 0  # dates before this are archived, can't be booked or cancelled
+        self.feed = ChangeFeed()  # booking changes for subscribers
+        self.waitlist = Waitlist(by_quota=waitlist_by_quota)  # waiters of booked slots, promoted on cancellation
+        self.free_busy_cache = FreeBusyCache()  # free/busy matrices, dropped on changes of their rooms
+        # Locks are always taken in order room -> organization -> user
+        self.room_locks = StripedLock()  # guards bookings & slot bitmap of a (room, date)
+        self.org_locks = StripedLock()  # guards quota & booking index of an organization
+        self.user_locks = StripedLock()  # guards booking index of a user
 
     def _create_booking_key(self, room_name, date, time_slot):
         """A unique key for every organization and month is generated
@@ -161,130 +457,744 @@ class Booking:
         if not self._check_can_create_booking(requestor):   # check permissions
             raise AuthorizationException("Create Booking")
 
-        requestor_details = user_handler.get_user_details(requestor)
+        requestor_details = self.user_handler.get_user_details(requestor)
         if not requestor_details:
             raise NotFoundException("User")
 
-        room_details = room_handler.get_room_details(room_name)
+        room_details = self.room_handler.get_room_details(room_name)
         if not room_details:
             raise NotFoundException("Room")
 
         organization = requestor_details.get("organization")
-        booking_hours = organization_handler.get_organization_booking_hours(organization)
-        if booking_hours >= 30:
-            raise Exception("You have completed your quota of 30 hour booking")
-
-        if not date:
-            date = get_today()
-        else:
-            print("VERIFY THE DATE FORMAT HERE")
+        date, date_ordinal = self._parse_date(date)
+        start_hour, end_hour = self._get_slot_hours(time_slot)
         key = self._create_booking_key(room_name, date, time_slot)
 
-        booking_exists = self._check_if_booking_exists(key)
-        if booking_exists:
-            raise DuplicateException("Room Booking")
-
-        self.bookings[key] = {
-            "slot": time_slot,
-            "date": date,
-            "user": requestor,
-            "room": room_name,
-            "organization": requestor_details.get("organization")
-        }
-        self._create_user_booking_mapping(requestor, key)  # add booking against user
-        self._create_org_booking_mapping(requestor_details.get("organization"), key)  # add booking against org
-        organization_handler.increase_organization_booking_hours(organization)  # update org booking hours
+        with self.room_locks.get_lock((room_name, date_ordinal)):  # check & book atomically
+            self._check_date_is_open(date_ordinal)
+            if not self.availability_handler.is_slot_free(room_name, date_ordinal, start_hour, end_hour):
+                raise DuplicateException("Room Booking")
+
+            self._book_free_slot(key, requestor, organization, room_name,
+                                 date, date_ordinal, start_hour, end_hour)
 
         return f"Room {room_name} booked for time slot {str(time_slot)}"
+
+    def _book_free_slot(self, key, requestor, organization, room_name,
+                        date, date_ordinal, start_hour, end_hour):
+        """Reserves quota & stores booking of a slot checked to be free
+        Caller holds the room lock"""
+        self.organization_handler.reserve_organization_booking_hours(
+            organization, {get_month_of_ordinal(date_ordinal): end_hour - start_hour})  # raises if over quota
+        with self.org_locks.get_lock(organization):
+            self._insert_booking(key, requestor, organization, room_name,
+                                 date, date_ordinal, start_hour, end_hour)
+        self._create_user_booking_mapping(requestor, key)  # add booking against user
+
+    def join_waitlist(self, requestor="", room_name="", time_slot={}, date=""):
+        """Queues requestor for a booked slot, requestor gets the booking
+        once the slot is cancelled & is notified through the change feed
+        (subscribe_changes(user=requestor), kind "waitlist_promoted").
+        Books right away if the slot is free"""
+        requestor_details = self.user_handler.get_user_details(requestor)
+        if not Authorization.can_manage_bookings(requestor_details):  # check permissions
+            raise AuthorizationException("Create Booking")
+        if not self.room_handler.get_room_details(room_name):
+            raise NotFoundException("Room")
+        organization = requestor_details.get("organization")
+        date, date_ordinal = self._parse_date(date)
+        start_hour, end_hour = self._get_slot_hours(time_slot)
+
+        with self.room_locks.get_lock((room_name, date_ordinal)):  # so a cancellation can't be missed
+            self._check_date_is_open(date_ordinal)
+            if self.availability_handler.is_slot_free(room_name, date_ordinal, start_hour, end_hour):
+                self._book_free_slot(self._create_booking_key(room_name, date, time_slot), requestor,
+                                     organization, room_name, date, date_ordinal, start_hour, end_hour)
+                return f"Room {room_name} booked for time slot {str(time_slot)}"
+            priority = 0
+            if self.waitlist.by_quota:  # more quota left, earlier
+                priority = self.organization_handler.get_organization_booking_hours(
+                    organization, get_month_of_ordinal(date_ordinal)) \
+                    - self.organization_handler.get_organization_booking_limit(organization)
+            waiting = self.waitlist.add(room_name, date_ordinal, start_hour, end_hour,
+                                        requestor, priority)
+        return f"Added to waitlist of room {room_name} for time slot {str(time_slot)}, " \
+            f"{waiting} waiting"
+
+    def leave_waitlist(self, requestor="", room_name="", time_slot={}, date=""):
+        """Takes requestor off the waitlist of a slot joined through
+        join_waitlist. Requires Manage Booking Permission"""
+        if not self._check_can_create_booking(requestor):  # check permissions
+            raise AuthorizationException("Create Booking")
+        date_ordinal = self._parse_date(date)[1]
+        start_hour, end_hour = self._get_slot_hours(time_slot)
+        if not self.waitlist.remove(room_name, date_ordinal, start_hour, end_hour, requestor):
+            raise NotFoundException("Waitlist Entry")
+        return f"Removed from waitlist of room {room_name} for time slot {str(time_slot)}"
+
+    def _promote_waiters(self, room_name, date_ordinal):
+        """Books freed hours of room & date for the first waiters that fit,
+        waiters who can't book anymore(permission, quota) are dropped
+        Caller holds the room lock"""
+        while True:
+            waiter = self.waitlist.pop_next(room_name, date_ordinal, lambda start_hour, end_hour:
+                                            self.availability_handler.is_slot_free(
+                                                room_name, date_ordinal, start_hour, end_hour))
+            if waiter is None:
+                return
+            user, start_hour, end_hour = waiter
+            user_details = self.user_handler.get_user_details(user)
+            if not Authorization.can_manage_bookings(user_details):
+                continue
+            organization = user_details.get("organization")
+            date = format_date_ordinal(date_ordinal)
+            key = self._create_booking_key(room_name, date, {start_hour: end_hour})
+            try:
+                self._book_free_slot(key, user, organization, room_name,
+                                     date, date_ordinal, start_hour, end_hour)
+            except QuotaExceededException:
+                continue
+            self._publish_change(WAITLIST_PROMOTED, key, room_name, organization, user,
+                                 date_ordinal, start_hour, end_hour)
+
+    def _insert_booking(self, key, requestor, organization, room_name,
+                        date, date_ordinal, start_hour, end_hour):
+        """Stores booking, marks slot & adds it against organization
+        Caller holds the room and organization locks"""
+        self.bookings[key] = BookingRecord(
+            start_hour=start_hour,
+            end_hour=end_hour,
+            date=date,
+            date_ordinal=date_ordinal,
+            user=requestor,
+            room=room_name,
+            organization=organization
+        )
+        self.bookings_snapshot.publish()
+        self.availability_handler.mark_slot_booked(room_name, date_ordinal, start_hour, end_hour)
+        self._create_org_booking_mapping(organization, key)  # add booking against org
+        self.building.record(OP_BOOK, key, requestor, organization, room_name,
+                             date_ordinal, start_hour, end_hour)
+        self._publish_change(BOOKED, key, room_name, organization, requestor,
+                             date_ordinal, start_hour, end_hour)
+
+    def _publish_change(self, kind, key, room_name, organization, user,
+                        date_ordinal, start_hour, end_hour):
+        """Sends change to feed subscribers, caller holds the room lock so
+        changes of a room are numbered in the order they happened.
+        Cached free/busy of the room & date goes, of all later dates too
+        for a recurring booking made or ended"""
+        self.free_busy_cache.invalidate(room_name, date_ordinal,
+                                        None if kind in (SERIES_BOOKED, SERIES_ENDED) else date_ordinal)
+        self.feed.publish(kind, key, room_name, self.room_handler.rooms[room_name].floor,
+                          organization, user, date_ordinal, start_hour, end_hour)
+
+    def _publish_series_change(self, kind, series, date_ordinal):
+        self._publish_change(kind, series.id, series.room, series.organization, series.user,
+                             date_ordinal, series.start_hour, series.end_hour)
+
+    def subscribe_changes(self, room=None, floor=None, organization=None,
+                          from_sequence=None, max_pending=1000, user=None):
+        """Returns subscription to booking changes of a room, floor,
+        organization or user(all changes if none given), see booking.feed
+        Read changes with subscription.get(timeout) or get_pending()"""
+        return self.feed.subscribe(room, floor, organization, from_sequence, max_pending, user)
+
+    def assign_rooms(self, requestor="", requests=[], commit=True):
+        """Picks rooms & start hours for a batch of meetings, each request
+        is {"attendees", "date", "window": {earliest start: latest end},
+        "hours": default 1, "projector": default False}, see
+        booking.assignment. Rooms are picked to leave fewest seats empty,
+        all assigned meetings are then booked together through book_many
+        (none if any fails), unless commit is False.
+        Returns result of every request in same order, with the picked
+        room & slot even if booking them failed"""
+        assigner = RoomAssigner(self.room_handler, self.availability_handler)
+        results, parsed = [], []
+        for position, meeting in enumerate(requests):
+            result = {"room": None, "date": meeting.get("date"), "slot": None,
+                      "booked": False, "error": None}
+            results.append(result)
+            try:
+                attendees = meeting.get("attendees")
+                if not isinstance(attendees, int) or attendees <= 0:
+                    raise InvalidParameterException("Attendees")
+                date, date_ordinal = self._parse_date(meeting.get("date"))
+                self._check_date_is_open(date_ordinal)
+                result["date"] = date
+                window_start, window_end = self._get_slot_hours(meeting.get("window"))
+                hours = meeting.get("hours", 1)
+                if not isinstance(hours, int) or not 0 < hours <= window_end - window_start:
+                    raise InvalidParameterException("Hours")
+                projector = bool(meeting.get("projector", False))
+            except Exception as e:
+                result["error"] = str(e)
+                continue
+            rooms = assigner.get_fitting_rooms(attendees, projector)
+            if not rooms:
+                result["error"] = str(NotFoundException("Room"))
+                continue
+            parsed.append(Request(position, attendees, date_ordinal, window_start, window_end,
+                                  hours, projector, rooms))
+
+        assigner.solve(parsed)
+        slots = []
+        for request in parsed:
+            result = results[request.position]
+            if request.placement is None:
+                result["error"] = "No room is free in the time window"
+                continue
+            room_name, start_hour = request.placement
+            result.update(room=room_name, slot={start_hour: start_hour + request.hours})
+            slots.append((room_name, result["date"], result["slot"]))
+        if commit and slots:
+            try:
+                booked = iter(self.book_many(requestor, slots))
+            except Exception as e:  # plan is returned with the failure, eg. requestor can't book
+                booked = iter([{"booked": False, "error": str(e)}] * len(slots))
+            for result in results:
+                if result["room"]:
+                    booking_result = next(booked)
+                    result["booked"] = booking_result["booked"]
+                    result["error"] = booking_result["error"]
+        return results
+
+    def book_many(self, requestor="", slots=[]):
+        """Books all (room_name, date, time_slot) slots or none of them
+        Requestor, rooms & quota are checked once for the whole batch.
+        Returns result of every slot in same order, if any slot fails
+        nothing is booked. Going over quota is an error of the slots in the
+        months over it, not an exception"""
+        requestor_details = self.user_handler.get_user_details(requestor)
+        if not Authorization.can_manage_bookings(requestor_details):  # check permissions
+            raise AuthorizationException("Create Booking")
+        organization = requestor_details.get("organization")
+
+        results, bookings_to_create, keys_in_batch = [], [], set()
+        for room_name, date, time_slot in slots:
+            result = {"room": room_name, "date": date, "slot": time_slot,
+                      "booked": False, "error": None}
+            results.append(result)
+            try:
+                if not self.room_handler.get_room_details(room_name):
+                    raise NotFoundException("Room")
+                date, date_ordinal = self._parse_date(date)
+                result["date"] = date
+                start_hour, end_hour = self._get_slot_hours(time_slot)
+                key = self._create_booking_key(room_name, date, time_slot)
+                if key in keys_in_batch:
+                    raise DuplicateException("Room Booking")
+            except Exception as e:
+                result["error"] = str(e)
+                continue
+            keys_in_batch.add(key)
+            bookings_to_create.append((result, key, room_name, time_slot,
+                                       date, date_ordinal, start_hour, end_hour))
+        if len(bookings_to_create) < len(results):
+            return results
+
+        room_date_locks = self.room_locks.get_locks(
+            (booking[2], booking[5]) for booking in bookings_to_create)
+        for room_date_lock in room_date_locks:  # sorted order, can't deadlock
+            room_date_lock.acquire()
+        try:
+            conflict = False
+            batch_mask = {}  # slots of the batch may overlap each other too
+            for result, key, room_name, time_slot, date, date_ordinal, start_hour, end_hour in bookings_to_create:
+                slot_mask = get_range_mask(start_hour, end_hour)
+                room_date = (room_name, date_ordinal)
+                if date_ordinal < self.open_from:
+                    result["error"] = str(InvalidParameterException("Date"))
+                    conflict = True
+                elif not self.availability_handler.is_slot_free(room_name, date_ordinal, start_hour, end_hour) \
+                        or batch_mask.get(room_date, 0) & slot_mask:
+                    result["error"] = str(DuplicateException("Room Booking"))
+                    conflict = True
+                batch_mask[room_date] = batch_mask.get(room_date, 0) | slot_mask
+            if conflict:
+                return results
+
+            month_hours = {}
+            for booking in bookings_to_create:
+                month = get_month_of_ordinal(booking[5])
+                month_hours[month] = month_hours.get(month, 0) + booking[7] - booking[6]
+            try:  # nothing is reserved if any month goes over quota
+                self.organization_handler.reserve_organization_booking_hours(organization, month_hours)
+            except QuotaExceededException as e:
+                self._set_quota_error(results, bookings_to_create, organization, month_hours, e)
+                return results
+            with self.org_locks.get_lock(organization):
+                for result, key, room_name, time_slot, date, date_ordinal, start_hour, end_hour in bookings_to_create:
+                    self._insert_booking(key, requestor, organization, room_name,
+                                         date, date_ordinal, start_hour, end_hour)
+                    result["booked"] = True
+            with self.user_locks.get_lock(requestor):  # add bookings against user
+                user_map = self.user_booking_group.setdefault(requestor, [])
+                user_room_map = self.user_room_booking_group.setdefault(requestor, {})
+                for booking in bookings_to_create:
+                    self._add_to_booking_index(user_map, user_room_map, booking[1])
+        finally:
+            for room_date_lock in room_date_locks:
+                room_date_lock.release()
+        return results
+
+    def _set_quota_error(self, results, bookings_to_create, organization, month_hours, error):
+        """Sets error on results of bookings in months over quota, on all
+        of them if hours were given back meanwhile"""
+        limit = self.organization_handler.get_organization_booking_limit(organization)
+        months_over = {month for month, hours in month_hours.items()
+                       if self.organization_handler.get_organization_booking_hours(
+                           organization, month) + hours > limit} or set(month_hours)
+        for booking in bookings_to_create:
+            if get_month_of_ordinal(booking[5]) in months_over:
+                booking[0]["error"] = str(error)
+
+    def _get_slot_hours(self, time_slot):
+        """Returns (start_hour, end_hour) of a slot eg. {9:12} -> (9, 12)
+        A slot is a dict of exactly one int start & end hour"""
+        if not time_slot:
+            raise RequiredParameterException("time_slot")
+        if not isinstance(time_slot, dict) or len(time_slot) != 1:
+            raise InvalidParameterException("Time Slot")
+        start_hour, end_hour = next(iter(time_slot.items()))
+        if type(start_hour) is not int or type(end_hour) is not int \
+                or not 0 <= start_hour < end_hour <= HOURS_IN_DAY:
+            raise InvalidParameterException("Time Slot")
+        return start_hour, end_hour
+
+    def _get_slot_hour(self, time_slot):
+        """Returns starting hour of a slot eg. {12:13} -> 12"""
+        return self._get_slot_hours(time_slot)[0]
     
+    def _get_date_ordinal(self, date):
+        """Returns ordinal of a dd-mm-YYYY date, validating its format"""
+        try:
+            return get_date_ordinal(date)
+        except (TypeError, ValueError):
+            raise InvalidParameterException("Date")
+
+    def _parse_date(self, date=""):
+        """Validates a dd-mm-YYYY date once at API boundary, returns it in
+        canonical form with its ordinal. Today if date isn't given"""
+        date_ordinal = self._get_date_ordinal(date) if date else get_today_ordinal()
+        return format_date_ordinal(date_ordinal), date_ordinal
+
+    def _get_booking_index_entry(self, key):
+        """Entry under which booking is kept in user/org sorted index,
+        the record is kept too so a slice of index can be read alone"""
+        booking_details = self.bookings[key]
+        return (booking_details.date_ordinal, booking_details.start_hour, key, booking_details)
+
+    def _add_to_booking_index(self, index, room_index, key):
+        """Inserts booking in a date sorted index & in the date sorted
+        index of its room, both hold the same entry"""
+        entry = self._get_booking_index_entry(key)
+        insort(index, entry)
+        insort(room_index.setdefault(entry[3].room, []), entry)
+
+    def _remove_from_booking_index(self, index, room_index, key):
+        """Removes booking from a date sorted index & its room index"""
+        entry = self._get_booking_index_entry(key)
+        for entries in (index, room_index.get(entry[3].room, [])):
+            position = bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                entries.pop(position)
+        if not room_index.get(entry[3].room, True):
+            room_index.pop(entry[3].room)
+
+    def _get_date_range_ordinals(self, date_range=[]):
+        """Returns (from, to) ordinals of a [from, to] date range, both
+        None if range isn't given"""
+        if len(date_range) == 0:
+            return None, None
+        if len(date_range) != 2:
+            raise InvalidParameterException("Date Range")
+        return self._get_date_ordinal(date_range[0]), self._get_date_ordinal(date_range[1])
+
+    def _get_bookings_from_index(self, index, date_range=[], from_ordinal=0):
+        """Returns bookings of a date sorted index, within date range
+        (both days inclusive) if given, and not before from_ordinal"""
+        range_from, range_to = self._get_date_range_ordinals(date_range)
+        start = bisect_left(index, (max(range_from or 0, from_ordinal),))
+        end = len(index) if range_to is None else bisect_left(index, (range_to + 1,))
+        return [entry[3] for entry in index[start:end]]  # slice is copied at once
+
+    def _get_bookings_with_archive(self, index, field, name, date_range=[]):
+        """Returns bookings of a user/organization index together with
+        archived ones, sorted by date and hour"""
+        archived_before = self.archive.archived_before
+        bookings = self._get_bookings_from_index(index, date_range, archived_before)
+        if not archived_before:
+            return bookings
+        archived = self.archive.get_bookings(field, name, *self._get_date_range_ordinals(date_range))
+        return archived + bookings if archived else bookings
+
     def _check_can_create_booking(self, requestor_email):
         """Checks whether requestor is authorized to create Booking"""
         requestor_email = requestor_email.lower()
-        requestor_details = user_handler.get_user_details(requestor_email)
+        requestor_details = self.user_handler.get_user_details(requestor_email)
         return Authorization.can_manage_bookings(requestor_details)
 
     def _create_user_booking_mapping(self, user="", key=""):
         """add booking against user"""
-        user_map = self.user_booking_group.get(user)
-        if user_map:
-            user_map[key] = 1
-        else:
-            self.user_booking_group[user] = {key: 1}
+        with self.user_locks.get_lock(user):
+            user_map = self.user_booking_group.setdefault(user, [])
+            user_room_map = self.user_room_booking_group.setdefault(user, {})
+            self._add_to_booking_index(user_map, user_room_map, key)
         return ""
 
     def _create_org_booking_mapping(self, org="", key=""):
-        """add booking against organization"""
-        org_map = self.org_booking_group.get(org)
-        if org_map:
-            org_map[key] = 1
-        else:
-            self.org_booking_group[org] = {key: 1}
+        """add booking against organization
+        Caller holds the organization lock"""
+        org_map = self.org_booking_group.setdefault(org, [])
+        org_room_map = self.org_room_booking_group.setdefault(org, {})
+        self._add_to_booking_index(org_map, org_room_map, key)
         return ""
 
     def _delete_user_booking_mapping(self, user="", key=""):
         """remove booking against user"""
-        user_map = self.user_booking_group.get(user)
-        if user_map:
-            lock.acquire()
-            self.user_booking_group[user].pop(key)
-            lock.release()
+        with self.user_locks.get_lock(user):
+            user_map = self.user_booking_group.get(user)
+            if user_map:
+                self._remove_from_booking_index(user_map, self.user_room_booking_group[user], key)
         return ""
 
     def _delete_org_booking_mapping(self, org="", key=""):
-        """Remove booking against Organization"""
+        """Remove booking against Organization
+        Caller holds the organization lock"""
         org_map = self.org_booking_group.get(org)
         if org_map:
-            lock.acquire()
-            self.org_booking_group[org].pop(key)
-            lock.release()
+            self._remove_from_booking_index(org_map, self.org_room_booking_group[org], key)
         return ""
 
     def cancel_room_booking(self, requestor="", room="",
                             time_slot={}, date=""):
         """Remove booking function"""
-        if not date:
-            date = get_today()
-        else:
-            # TODO: Verify date format here
-            pass
-
+        date, date_ordinal = self._parse_date(date)
         key = self._create_booking_key(room, date, time_slot)
-        booking_details = self.get_booking_details(key)
-        if not booking_details:
-            raise NotFoundException("Booking")
-        
-        if requestor != booking_details.get("user"):
-            raise Exception("Sorry, you are not authorized to delete this booking")
-        
-        requestor_details = user_handler.get_user_details(requestor)
-        if not requestor_details:
-            raise NotFoundException("User")
-        
-        if check_if_dates_are_same(booking_details.get("date"), get_today()):  # if the current date and booking date are same,
+        with self.room_locks.get_lock((room, date_ordinal)):  # so booking can't be cancelled twice
+            self._check_date_is_open(date_ordinal)
+            booking_details = self.get_booking_details(key)
+            if not booking_details:
+                return self._cancel_series_occurrence(requestor, room, time_slot, date_ordinal)
+
+            if requestor != booking_details.get("user"):
+                raise Exception("Sorry, you are not authorized to delete this booking")
+
+            requestor_details = self.user_handler.get_user_details(requestor)
+            if not requestor_details:
+                raise NotFoundException("User")
+
+            self._check_if_cancellation_allowed(date_ordinal, booking_details.start_hour)
+
+            self._remove_booking(key)
+            self.organization_handler.release_organization_booking_hours(
+                booking_details.organization, {get_month_of_ordinal(date_ordinal):
+                                               booking_details.end_hour - booking_details.start_hour})  # update org booking hours
+            self._promote_waiters(room, date_ordinal)
+
+        return f"Booking for room {room} cancelled"
+
+    def _remove_booking(self, key):
+        """Deletes booking, its slot & mappings, also used to replay the
+        journal. Caller holds the room lock"""
+        booking_details = self._unlink_booking(key)
+        self.building.record(OP_CANCEL, key)
+        self._publish_change(CANCELLED, key, booking_details.room, booking_details.organization,
+                             booking_details.user, booking_details.date_ordinal,
+                             booking_details.start_hour, booking_details.end_hour)
+
+    def _unlink_booking(self, key):
+        """Drops booking from bookings, availability & mappings
+        Caller holds the room lock"""
+        booking_details = self.bookings[key]
+        organization = booking_details.organization
+        with self.org_locks.get_lock(organization):
+            self._delete_org_booking_mapping(organization, key)  # Remove booking against Org
+        self._delete_user_booking_mapping(booking_details.user, key)  # Remove booking against user
+        self.bookings.pop(key)  # Delete Booking
+        self.bookings_snapshot.publish()
+        self.availability_handler.mark_slot_free(booking_details.room, booking_details.date_ordinal,
+                                            booking_details.start_hour, booking_details.end_hour)
+        return booking_details
+
+    def _check_date_is_open(self, date_ordinal):
+        """Archived dates are history, they can't be changed"""
+        if date_ordinal < self.open_from:
+            raise InvalidParameterException("Date")
+
+    def archive_bookings(self, before_ordinal):
+        """Moves bookings dated before the date from hot dicts & indexes
+        into the archive, returns count of bookings moved.
+        Recurring bookings are rules, they stay as they are"""
+        with self.archive.lock:
+            if before_ordinal <= self.open_from:
+                return 0
+            self.open_from = before_ordinal
+            self.room_locks.drain()  # bookings & cancellations that passed the date check are done
+            self.building.record(OP_ARCHIVE, before_ordinal)  # after their records, replay archives them too
+
+            keys = []
+            for org_map in list(self.org_booking_group.values()):
+                keys.extend(entry[2] for entry in org_map[:bisect_left(org_map, (before_ordinal,))])
+            archived = [self.bookings[key] for key in keys]
+            self.archive.add_bookings(archived, before_ordinal)  # readers switch to archive for those dates
+            self.waitlist.drop_before(before_ordinal)
+            for key, booking_details in zip(keys, archived):
+                with self.room_locks.get_lock((booking_details.room, booking_details.date_ordinal)):
+                    self._unlink_booking(key)
+            return len(keys)
+
+    def _check_if_cancellation_allowed(self, date_ordinal, start_hour):
+        """Booking can't be cancelled when meeting is about to start"""
+        if date_ordinal == get_today_ordinal():  # if the current date and booking date are same,
             # then only perform logic, else doesn't make sense
-            booked_time_str = str(next(iter(time_slot))) + ":00"
-            current_time_str = get_current_hour_minute()
-            if get_time_difference_in_minutes(booked_time_str, current_time_str) < 15:  # check if less than 15 minutes are remaining in meeting
+            if abs(start_hour * 60 - get_current_minute_of_day()) < 15:  # check if less than 15 minutes are remaining in meeting
                 raise Exception("Booking can't be cancelled as time for meeting is less than 15 minutes")
-        
+
+    def book_recurring_room(self, requestor="", room_name="", time_slot={},
+                            start_date="", frequency="weekly", interval=1,
+                            until="", count=0):
+        """Books room in the time slot on every occurrence of the rule
+        eg. weekly from start_date until a date or for count occurrences.
+        Rule is stored once, occurrences aren't created as bookings.
+        Requires Manage Booking Permission"""
+        requestor_details = self.user_handler.get_user_details(requestor)
+        if not Authorization.can_manage_bookings(requestor_details):  # check permissions
+            raise AuthorizationException("Create Booking")
+        if not self.room_handler.get_room_details(room_name):
+            raise NotFoundException("Room")
+        if frequency not in FREQUENCIES:
+            raise InvalidParameterException("Frequency")
+        if not isinstance(interval, int) or interval < 1:
+            raise InvalidParameterException("Interval")
+        if not until and not count:
+            raise RequiredParameterException("until or count")
+
+        start_hour, end_hour = self._get_slot_hours(time_slot)
+        start_ordinal = self._parse_date(start_date)[1]
+        self._check_date_is_open(start_ordinal)
+        until_ordinal = self._get_date_ordinal(until) if until else None
         organization = requestor_details.get("organization")
-        lock.acquire()
-        self.bookings.pop(key)  # Delete Booking
-        lock.release()
-        self._delete_user_booking_mapping(requestor, key)  # Remove booking against user
-        self._delete_org_booking_mapping(organization, key)  # Remove booking against Org
-        organization_handler.decrease_organization_booking_hours(organization)  # update org booking hours
+        series = RecurringBooking(room_name, requestor, organization, start_hour,
+                                  end_hour, frequency, interval, start_ordinal,
+                                  until_ordinal, count)
+        ordinals = list(series.get_occurrences())
+        if not ordinals:
+            raise InvalidParameterException("Date Range")
 
+        room_date_locks = self.room_locks.get_locks((room_name, ordinal) for ordinal in ordinals)
+        for room_date_lock in room_date_locks:  # sorted order, can't deadlock
+            room_date_lock.acquire()
+        try:
+            for ordinal in ordinals:  # checked against day masks, nothing is materialized
+                if not self.availability_handler.is_slot_free(room_name, ordinal, start_hour, end_hour):
+                    raise DuplicateException(f"Room Booking on {format_date_ordinal(ordinal)}")
+
+            self.organization_handler.reserve_organization_booking_hours(
+                organization, self._get_series_month_hours(series, ordinals))  # raises if any month goes over quota
+            self._add_series(series)
+        finally:
+            for room_date_lock in room_date_locks:
+                room_date_lock.release()
+
+        return f"Room {room_name} booked for time slot {str(time_slot)} " \
+            f"on {len(ordinals)} dates, recurring booking id {series.id}"
+
+    def _add_series(self, series):
+        """Stores recurring booking & holds its room, also used to replay
+        the journal. Caller holds the room locks of its dates"""
+        with self.org_locks.get_lock(series.organization):
+            self.recurring_bookings[series.id] = series
+            self.availability_handler.add_series(series)
+            self.org_series_group.setdefault(series.organization, {})[series.id] = True
+        with self.user_locks.get_lock(series.user):
+            self.user_series_group.setdefault(series.user, {})[series.id] = True
+        self.building.record(OP_SERIES, *series.get_state())
+        self._publish_series_change(SERIES_BOOKED, series, series.start_ordinal)
+
+    def _cancel_series_occurrence(self, requestor, room, time_slot, date_ordinal):
+        """Cancels one date of a recurring booking
+        Caller holds the room lock of the date"""
+        start_hour, end_hour = self._get_slot_hours(time_slot)
+        series = self.availability_handler.get_series_at(room, date_ordinal, start_hour)
+        if not series or series.start_hour != start_hour or series.end_hour != end_hour:
+            raise NotFoundException("Booking")
+        if requestor != series.user:
+            raise Exception("Sorry, you are not authorized to delete this booking")
+        self._check_if_cancellation_allowed(date_ordinal, start_hour)
+
+        with self.org_locks.get_lock(series.organization):
+            series.cancelled_ordinals.add(date_ordinal)
+        self.building.record(OP_SERIES_SKIP, series.id, date_ordinal)
+        self._publish_series_change(SERIES_SKIPPED, series, date_ordinal)
+        self.organization_handler.release_organization_booking_hours(
+            series.organization, self._get_series_month_hours(series, [date_ordinal]))  # update org booking hours
+        self._promote_waiters(room, date_ordinal)
         return f"Booking for room {room} cancelled"
+
+    def cancel_recurring_booking(self, requestor="", series_id=""):
+        """Cancels all occurrences of a recurring booking from today onwards,
+        earlier occurrences are kept as history. Like a booking, it can't
+        be cancelled when today's meeting is about to start"""
+        series = self.recurring_bookings.get(series_id)
+        if not series:
+            raise NotFoundException("Recurring Booking")
+        if requestor != series.user:
+            raise Exception("Sorry, you are not authorized to delete this booking")
+
+        today_ordinal = get_today_ordinal()
+        ordinals = list(series.get_occurrences(today_ordinal))
+        room_date_locks = self.room_locks.get_locks((series.room, ordinal) for ordinal in ordinals)
+        for room_date_lock in room_date_locks:  # sorted order, can't deadlock
+            room_date_lock.acquire()
+        try:
+            if ordinals:
+                self._check_if_cancellation_allowed(ordinals[0], series.start_hour)
+            self._end_series(series, today_ordinal)
+            self.organization_handler.release_organization_booking_hours(
+                series.organization, self._get_series_month_hours(series, ordinals))  # update org booking hours
+            for ordinal in ordinals:
+                self._promote_waiters(series.room, ordinal)
+        finally:
+            for room_date_lock in room_date_locks:
+                room_date_lock.release()
+        return f"Recurring booking for room {series.room} cancelled"
+
+    def _end_series(self, series, from_ordinal):
+        """Drops occurrences of recurring booking from the date onwards,
+        also used to replay the journal. Caller holds the room locks"""
+        with self.org_locks.get_lock(series.organization):
+            if series.start_ordinal >= from_ordinal:  # nothing happened yet
+                self.availability_handler.remove_series(series)
+                self.recurring_bookings.pop(series.id, None)
+                self.org_series_group.get(series.organization, {}).pop(series.id, None)
+                with self.user_locks.get_lock(series.user):
+                    self.user_series_group.get(series.user, {}).pop(series.id, None)
+            else:
+                series.end_ordinal = min(series.end_ordinal, from_ordinal - 1)
+        self.building.record(OP_SERIES_END, series.id, from_ordinal)
+        self._publish_series_change(SERIES_ENDED, series, from_ordinal)
+
+    def _get_series_month_hours(self, series, ordinals):
+        """Returns {month: hours} held by the series on the dates"""
+        month_hours = {}
+        for ordinal in ordinals:
+            month = get_month_of_ordinal(ordinal)
+            month_hours[month] = month_hours.get(month, 0) + series.end_hour - series.start_hour
+        return month_hours
+
+    def _get_series_occurrences(self, series_ids, date_range=[]):
+        """Returns occurrence details of recurring bookings in date range"""
+        from_ordinal, to_ordinal = self._get_date_range_ordinals(date_range)
+        occurrences = []
+        for series_id in list(series_ids):
+            series = self.recurring_bookings.get(series_id)
+            if series:
+                occurrences.extend(series.get_occurrence_details(ordinal) for ordinal in
+                                   series.get_occurrences(from_ordinal, to_ordinal))
+        return occurrences
+
+    def _merge_series_occurrences(self, bookings, series_ids, date_range=[]):
+        """Adds recurring booking occurrences to date sorted bookings"""
+        if not series_ids:
+            return bookings
+        bookings = bookings + self._get_series_occurrences(series_ids, date_range)
+        bookings.sort(key=lambda booking: (booking["date_ordinal"],
+                                           self._get_slot_hour(booking["slot"])))
+        return bookings
+
+    def get_recurring_bookings_of_user(self, user=""):
+        """Returns Details of all recurring bookings of user"""
+        return [self.recurring_bookings[series_id].get_details()
+                for series_id in list(self.user_series_group.get(user, {}))
+                if series_id in self.recurring_bookings]
     
     def _check_if_booking_exists(self, key=None, room_name="", date="", time_slot={}):
         """Internal Class function to check duplicacy"""
         if not key:
-            key = self._create_booking_key(room_name, date, time_slot)
+            return not self.availability_handler.is_slot_free(
+                room_name, self._parse_date(date)[1], *self._get_slot_hours(time_slot))
         if key in self.bookings:
             return True
         return False
 
+    def free_busy(self, date_range=[], floor=None, rooms=None):
+        """Returns {"dates": [dd-mm-YYYY], "rooms": {room: busy masks}} of
+        the rooms given, or rooms of floor, or all rooms, within date range
+        (both days inclusive, upto MAX_FREE_BUSY_DAYS, today if not given).
+        Busy masks are a tuple of one 24 bit mask per date, bit h is set if
+        hour h is booked, recurring & archived bookings included.
+        Matrices are cached for a few seconds, a booking change of a room
+        & date drops those holding it"""
+        from_ordinal, to_ordinal = self._get_date_range_ordinals(date_range)
+        if from_ordinal is None:
+            from_ordinal = to_ordinal = get_today_ordinal()
+        if not 0 <= to_ordinal - from_ordinal < MAX_FREE_BUSY_DAYS:
+            raise InvalidParameterException("Date Range")
+        key = (from_ordinal, to_ordinal, self._get_free_busy_rooms(floor, rooms))
+        matrix = self.free_busy_cache.get(key)
+        if matrix is None:
+            token = self.free_busy_cache.begin(key)
+            matrix = self._get_free_busy(*key)
+            self.free_busy_cache.put(token, matrix)
+        dates, room_masks = matrix
+        return {"dates": list(dates), "rooms": dict(room_masks)}
+
+    def _get_free_busy_rooms(self, floor, rooms):
+        """Returns sorted tuple of room names of a free/busy query"""
+        if rooms is not None:
+            if isinstance(rooms, str):
+                raise InvalidParameterException("Rooms")
+            room_names = set(rooms)
+            for room_name in room_names:
+                if not self.room_handler.get_room_details(room_name):
+                    raise NotFoundException("Room")
+            if floor is not None:
+                room_names = {room_name for room_name in room_names
+                              if self.room_handler.rooms[room_name].floor == floor}
+        elif floor is not None:
+            room_names = self.floor_handler.get_rooms_of_floor(floor)
+        else:
+            room_names = list(self.room_handler.rooms)
+        return tuple(sorted(room_names))
+
+    def _get_free_busy(self, from_ordinal, to_ordinal, room_names):
+        """Computes (dates, {room: busy masks}) in one pass, one mask
+        lookup per room & date"""
+        ordinals = range(from_ordinal, to_ordinal + 1)
+        archived_masks = {}  # (room, date_ordinal) -> hours of archived bookings, they left the masks
+        if from_ordinal < self.archive.archived_before:
+            for booking_details in self.archive.get_bookings(None, None, from_ordinal, to_ordinal):
+                room_date = (booking_details.room, booking_details.date_ordinal)
+                archived_masks[room_date] = archived_masks.get(room_date, 0) \
+                    | get_range_mask(booking_details.start_hour, booking_details.end_hour)
+        get_mask = self.availability_handler.room_date_mask.get
+        room_series = self.availability_handler.room_series
+        get_occupancy_mask = self.availability_handler.get_occupancy_mask
+        room_masks = {}
+        for room_name in room_names:
+            if room_name in room_series or archived_masks:
+                room_masks[room_name] = tuple(
+                    get_occupancy_mask(room_name, ordinal) | archived_masks.get((room_name, ordinal), 0)
+                    for ordinal in ordinals)
+            else:
+                room_masks[room_name] = tuple([get_mask((room_name, ordinal), 0) for ordinal in ordinals])
+        return tuple(map(format_date_ordinal, ordinals)), room_masks
+
+    def get_available_hours(self, room_name="", date=""):
+        """Returns list of free hours of a room on date(today by default)"""
+        if not room_name:
+            raise RequiredParameterException("room_name")
+        return self.availability_handler.get_free_hours(room_name, self._parse_date(date)[1])
+
+    def get_first_available_hour(self, room_name="", date="", from_hour=0):
+        """Returns first free hour of a room on date, None if fully booked"""
+        if not room_name:
+            raise RequiredParameterException("room_name")
+        return self.availability_handler.get_first_free_hour(
+            room_name, self._parse_date(date)[1], from_hour)
+
     def get_booking_details(self, key=None):
         """Returns Details of Booking from key"""
         if not key:
@@ -292,44 +1202,165 @@ class Booking:
         return self.bookings.get(key, None)
 
     def get_all_bookings(self):
-        """Returns Details of all bookings"""
-        return self.bookings
+        """Returns read only snapshot of Details of all bookings"""
+        return self.bookings_snapshot.get()
 
     def get_booking_of_organization(self, user="", organization="", 
                                     date_range=[]):
-        """Returns Details of all bookings of organization, with filters"""
-        last_month_bookings = []
+        """Returns Details of all bookings of organization, with filters
+        sorted by date and hour"""
         if user:
-            organization = user_handler.get_organization_from_user(user)
-
-        org_bookings = self.org_booking_group.get(organization, None)
-        if not org_bookings:
-            return last_month_bookings
-
-        for i in org_bookings:
-            booking_details = self.bookings[i]
-            booking_date = booking_details["date"]
-            if len(date_range) > 0:
-                if find_if_date_in_range(booking_date, date_range):
-                    last_month_bookings.append(booking_details)
+            organization = self.user_handler.get_organization_from_user(user)
+
+        org_bookings = self._get_bookings_with_archive(
+            self.org_booking_group.get(organization, []), "organization", organization, date_range)
+        return self._merge_series_occurrences(
+            org_bookings, self.org_series_group.get(organization), date_range)
+
+    def get_booking_of_user(self, user="", date_range=[]):
+        """Returns Details of all bookings of user, with filters
+        sorted by date and hour"""
+        user_bookings = self._get_bookings_with_archive(
+            self.user_booking_group.get(user, []), "user", user, date_range)
+        return self._merge_series_occurrences(
+            user_bookings, self.user_series_group.get(user), date_range)
+
+    def _get_sort_key(self, order, room_name, date_ordinal, start_hour, key):
+        if order == ORDER_BY_ROOM:
+            return room_name, date_ordinal, start_hour, key
+        return date_ordinal, start_hour, key
+
+    def _iter_archived(self, field, name, order, after, from_ordinal, to_ordinal):
+        """Yields (sort key, booking) of archived bookings after the sort
+        key. Date order sorts a month at a time, room order all months of
+        the range at once"""
+        if after and order == ORDER_BY_DATE:
+            from_ordinal = max(from_ordinal or 0, after[0])
+        months = self.archive.iter_months(field, name, from_ordinal, to_ordinal)
+
+        def get_sort_keyed(month_bookings):
+            for booking_details in month_bookings:
+                key = self._create_booking_key(booking_details.room, booking_details.date,
+                                               booking_details.slot)
+                yield self._get_sort_key(order, booking_details.room, booking_details.date_ordinal,
+                                         booking_details.start_hour, key), booking_details
+
+        if order == ORDER_BY_ROOM:
+            yield from iter_sorted((pair for month_bookings in months
+                                    for pair in get_sort_keyed(month_bookings)), after)
+        else:
+            for month_bookings in months:
+                yield from iter_sorted(get_sort_keyed(month_bookings), after)
+
+    def _iter_series(self, series, order, after, from_ordinal, to_ordinal):
+        """Yields (sort key, occurrence details) of a recurring booking
+        after the sort key"""
+        date_after = after
+        if after and order == ORDER_BY_ROOM:
+            if series.room < after[0]:
+                return
+            date_after = after[1:] if series.room == after[0] else None
+        if date_after:
+            from_ordinal = max(from_ordinal or 0, date_after[0])
+        for ordinal in series.get_occurrences(from_ordinal, to_ordinal):
+            key = self._create_booking_key(series.room, format_date_ordinal(ordinal), series.get_slot())
+            sort_key = self._get_sort_key(order, series.room, ordinal, series.start_hour, key)
+            if after is None or sort_key > after:
+                yield sort_key, series.get_occurrence_details(ordinal)
+
+    def _stream_bookings(self, field, name, date_range=[], order=ORDER_BY_DATE, cursor=None):
+        """Returns a stream of (sort key, booking) of a user or organization
+        (field is "user" or "organization", all bookings if None) within
+        date range, archived bookings & recurring booking occurrences too,
+        sorted by order and starting after the cursor. Nothing is read
+        before the stream is, every source is read lazily & merged"""
+        check_order(order)
+        after = decode_cursor(cursor, order)
+        range_from, to_ordinal = self._get_date_range_ordinals(date_range)
+        archived_before = self.archive.archived_before
+        from_ordinal = max(range_from or 0, archived_before)
+        if field == "user":
+            indexes = [(self.user_booking_group.get(name, []),
+                        self.user_room_booking_group.get(name, {}))]
+            series_ids = self.user_series_group.get(name, {})
+        elif field == "organization":
+            indexes = [(self.org_booking_group.get(name, []),
+                        self.org_room_booking_group.get(name, {}))]
+            series_ids = self.org_series_group.get(name, {})
+        else:
+            indexes = [(self.org_booking_group[organization], self.org_room_booking_group[organization])
+                       for organization in list(self.org_booking_group)]
+            series_ids = self.recurring_bookings
+
+        streams = []
+        for index, room_index in indexes:
+            if order == ORDER_BY_ROOM:
+                streams.append(iter_room_index(room_index, after, from_ordinal, to_ordinal))
             else:
-                last_month_bookings.append(booking_details)
-        
-        return last_month_bookings
+                streams.append(iter_index(index, after, from_ordinal, to_ordinal))
+        if archived_before:
+            streams.append(self._iter_archived(field, name, order, after, range_from, to_ordinal))
+        for series_id in list(series_ids):
+            series = self.recurring_bookings.get(series_id)
+            if series:
+                streams.append(self._iter_series(series, order, after, range_from, to_ordinal))
+        return merge_streams(streams)
 
-    def get_booking_of_user(self, user=""):
-        """Returns Details of all bookings of user"""
-        last_month_bookings = []
-        
-        user_bookings = self.user_booking_group.get(user, None)
-        if not user_bookings:
-            return last_month_bookings
+    def _get_page(self, stream, order, page_size):
+        """Returns {"bookings": first page_size bookings of the stream,
+        "cursor": cursor of the next page, None on the last page}"""
+        sort_keyed = list(islice(stream, page_size + 1))
+        cursor = encode_cursor(order, sort_keyed[page_size - 1][0]) if len(sort_keyed) > page_size else None
+        return {"bookings": [booking for _, booking in sort_keyed[:page_size]], "cursor": cursor}
 
-        for i in user_bookings:
-            booking_details = self.bookings[i]
-            last_month_bookings.append(booking_details)
-        
-        return last_month_bookings
+    def iter_booking_of_organization(self, user="", organization="", date_range=[],
+                                     order=ORDER_BY_DATE, cursor=None):
+        """Yields bookings of organization one by one, sorted by date
+        and hour(order="date") or by room, date and hour(order="room"),
+        after the cursor of a page if given"""
+        if user:
+            organization = self.user_handler.get_organization_from_user(user)
+        stream = self._stream_bookings("organization", organization, date_range, order, cursor)
+        return (booking for _, booking in stream)
+
+    def iter_booking_of_user(self, user="", date_range=[], order=ORDER_BY_DATE, cursor=None):
+        """Yields bookings of user one by one, see iter_booking_of_organization"""
+        stream = self._stream_bookings("user", user, date_range, order, cursor)
+        return (booking for _, booking in stream)
+
+    def iter_all_bookings(self, date_range=[], order=ORDER_BY_DATE, cursor=None):
+        """Yields every booking one by one, see iter_booking_of_organization"""
+        stream = self._stream_bookings(None, None, date_range, order, cursor)
+        return (booking for _, booking in stream)
+
+    def get_booking_page_of_organization(self, user="", organization="", date_range=[],
+                                         order=ORDER_BY_DATE, page_size=20, cursor=None):
+        """Returns a page of bookings of organization, {"bookings": [...],
+        "cursor": pass it to get the next page, None on the last page}.
+        Next page starts after the last booking of this one, earlier
+        pages aren't read again"""
+        check_page_size(page_size)
+        if user:
+            organization = self.user_handler.get_organization_from_user(user)
+        return self._get_page(self._stream_bookings("organization", organization, date_range, order, cursor),
+                              order, page_size)
+
+    def get_booking_page_of_user(self, user="", date_range=[], order=ORDER_BY_DATE,
+                                 page_size=20, cursor=None):
+        """Returns a page of bookings of user, see get_booking_page_of_organization"""
+        check_page_size(page_size)
+        return self._get_page(self._stream_bookings("user", user, date_range, order, cursor),
+                              order, page_size)
+
+    def get_all_bookings_page(self, date_range=[], order=ORDER_BY_DATE, page_size=20, cursor=None):
+        """Returns a page of all bookings, see get_booking_page_of_organization"""
+        check_page_size(page_size)
+        return self._get_page(self._stream_bookings(None, None, date_range, order, cursor),
+                              order, page_size)
 
 
 booking_handler = Booking()
+
+default_building.bind(availability_handler=availability_handler, floor_handler=floor_handler,
+                      room_handler=room_handler, booking_handler=booking_handler)
+building_registry.add_building(default_building)
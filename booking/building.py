@@ -0,0 +1,105 @@
+"""Buildings served by one process
+A building owns its handlers, and with them its own stores, indexes,
+locks, change feed, waitlist & archive. Handlers of a building are bound
+to each other, so an operation never touches another building's state
+or waits on its locks.
+The module handlers(booking.booking.booking_handler, users.user.user_handler,
+...) are the default building, users.user creates it & binds its handlers,
+booking.booking binds the rest and registers it as DEFAULT_BUILDING"""
+import threading
+
+from booking.availability import Availability
+from exceptions import (DuplicateException, InvalidParameterException,
+                        NotFoundException, RequiredParameterException)
+
+DEFAULT_BUILDING = "default"
+HANDLERS = ("organization_handler", "user_handler", "availability_handler",
+            "floor_handler", "room_handler", "booking_handler")
+
+
+class Building:
+
+    def __init__(self, name, handlers=None, record=None, waitlist_by_quota=False):
+        """handlers are (organization, user, availability, floor, room,
+        booking) handlers in HANDLERS order, new empty ones if not given,
+        waitlist_by_quota is passed to the new Booking handler.
+        record(op, *args) journals operations of the building, they aren't
+        journaled if not given, see utils.journal.record. Handlers left out
+        of a shorter tuple can be bound later through bind"""
+        if handlers is None:
+            from booking.booking import Booking, Floor, Room  # these modules import this one
+            from users.user import Organization, User
+            handlers = (Organization(), User(), Availability(), Floor(), Room(),
+                        Booking(waitlist_by_quota))
+        self.name = name
+        self.record_operation = record
+        self.bind(**dict(zip(HANDLERS, handlers)))
+
+    def bind(self, **handlers):
+        """Binds handlers, named as in HANDLERS, to the building & to the
+        handlers bound before them. The default building is bound a few
+        handlers at a time, as their modules are imported"""
+        for handler_name, handler in handlers.items():
+            if handler_name not in HANDLERS:
+                raise InvalidParameterException("Handler")
+            setattr(self, handler_name, handler)
+        for handler_name in HANDLERS:
+            handler = getattr(self, handler_name, None)
+            if handler is None:
+                continue
+            handler.building = self
+            for other_name in HANDLERS:
+                if hasattr(self, other_name):
+                    setattr(handler, other_name, getattr(self, other_name))
+
+    def record(self, op, *args):
+        """Journals a mutating operation of the building"""
+        if self.record_operation is not None:
+            self.record_operation(op, *args)
+
+
+class BuildingRegistry:
+
+    def __init__(self):
+        self.buildings = {}  # name -> Building
+        self.lock = threading.Lock()  # guards buildings only, never held while a building is used
+
+    def add_building(self, building):
+        with self.lock:
+            if building.name in self.buildings:
+                raise DuplicateException("Building")
+            self.buildings[building.name] = building
+        return building
+
+    def create_building(self, name="", waitlist_by_quota=False):
+        """Creates an empty building, its first admin is created through
+        its user_handler.create_admin_user. Waitlists of the building
+        put organizations with more quota left first if waitlist_by_quota.
+        Returns the Building"""
+        if not name:
+            raise RequiredParameterException("Building Name")
+        return self.add_building(Building(name, waitlist_by_quota=waitlist_by_quota))
+
+    def get_building(self, name=DEFAULT_BUILDING):
+        building = self.buildings.get(name)
+        if building is None:
+            raise NotFoundException("Building")
+        return building
+
+    def remove_building(self, name=""):
+        """Drops a building with all its data, change feed subscriptions
+        of it see no more changes. Default building can't be removed"""
+        if name == DEFAULT_BUILDING:
+            raise InvalidParameterException("Building")
+        with self.lock:
+            building = self.buildings.pop(name, None)
+        if building is None:
+            raise NotFoundException("Building")
+        return f"Building {name} removed successfully"
+
+    def list_buildings(self):
+        """Returns names of buildings, sorted"""
+        return sorted(self.buildings)
+
+
+building_registry = BuildingRegistry()
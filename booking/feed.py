@@ -0,0 +1,155 @@
+"""Change feed of bookings, so displays & calendars get what changed
+instead of polling all bookings.
+
+Every booking change gets the next sequence number and goes to the
+subscribers of its room, floor, organization or user (or of everything).
+Recent changes are kept, so a subscriber can resume after the last
+sequence it saw. Each subscriber has a bounded queue and publishing never
+waits for it: a subscriber falling more than max_pending changes behind
+is dropped and gets StaleSequenceException once it has read what was
+queued, it then resumes from its last sequence or reloads if that is too
+old. A client loading bookings subscribes first, so nothing is missed in
+between, changes it already loaded come again & can be applied twice."""
+import threading
+from collections import deque
+from queue import Empty, Full, Queue
+
+from exceptions import InvalidParameterException, StaleSequenceException
+from utils.records import ChangeRecord
+
+BOOKED = "booked"
+CANCELLED = "cancelled"
+SERIES_BOOKED = "series_booked"  # key is series id, date is its first date
+SERIES_SKIPPED = "series_skipped"  # one date of a recurring booking cancelled
+SERIES_ENDED = "series_ended"  # recurring booking cancelled from the date on
+WAITLIST_PROMOTED = "waitlist_promoted"  # waiter got the booking, comes after its "booked"
+FILTERS = ("room", "floor", "organization", "user")
+
+
+class Subscription:
+    """Changes of one room, floor, organization, user or all of them"""
+
+    def __init__(self, feed, filter_key, max_pending):
+        self.feed = feed
+        self.filter_key = filter_key  # (field, value) or None for all
+        self.queue = Queue(max_pending)
+        self.last_sequence = 0  # of the last change returned
+        self.dropped = False
+
+    def _put(self, change):
+        """Called by the feed, returns False if queue is full"""
+        try:
+            self.queue.put_nowait(change)
+        except Full:
+            self.dropped = True
+            return False
+        return True
+
+    def _check_dropped(self):
+        if self.dropped and self.queue.empty():  # nothing is queued after a drop
+            raise StaleSequenceException(self.last_sequence)
+
+    def get(self, timeout=None):
+        """Returns next change, waits up to timeout seconds(forever if
+        None), returns None if nothing changed"""
+        self._check_dropped()
+        try:
+            change = self.queue.get(timeout=timeout)
+        except Empty:
+            self._check_dropped()
+            return None
+        self.last_sequence = change.sequence
+        return change
+
+    def get_pending(self):
+        """Returns changes queued so far without waiting"""
+        self._check_dropped()
+        changes = []
+        while True:
+            try:
+                changes.append(self.queue.get_nowait())
+            except Empty:
+                break
+        if changes:
+            self.last_sequence = changes[-1].sequence
+        return changes
+
+    def close(self):
+        self.feed._remove_subscription(self)
+
+
+class ChangeFeed:
+
+    def __init__(self, history_size=10000):
+        self.sequence = 0
+        self.history = deque(maxlen=history_size)  # recent changes, oldest first
+        self.subscriptions = {}  # filter key or None -> {Subscription: True}
+        self.lock = threading.Lock()  # leaf lock, publishers may hold room locks
+
+    def publish(self, kind, key, room, floor, organization, user,
+                date_ordinal, start_hour, end_hour):
+        """Numbers the change & queues it for its subscribers"""
+        with self.lock:
+            self.sequence += 1
+            change = ChangeRecord(self.sequence, kind, key, room, floor, organization,
+                                  user, date_ordinal, start_hour, end_hour)
+            self.history.append(change)
+            if not self.subscriptions:
+                return
+            for filter_key in (("room", room), ("floor", floor), ("organization", organization),
+                               ("user", user), None):
+                subscriptions = self.subscriptions.get(filter_key)
+                if not subscriptions:
+                    continue
+                for subscription in list(subscriptions):
+                    if not subscription._put(change):
+                        self._unlink(subscription)
+
+    def subscribe(self, room=None, floor=None, organization=None,
+                  from_sequence=None, max_pending=1000, user=None):
+        """Returns Subscription to changes of the room, floor, organization
+        or user, or of everything if none is given. Changes after
+        from_sequence are queued first, from now on if not given"""
+        filters = [(field, value) for field, value in
+                   zip(FILTERS, (room, floor, organization, user)) if value is not None]
+        if len(filters) > 1:
+            raise InvalidParameterException("Subscription filter")
+        filter_key = filters[0] if filters else None
+        subscription = Subscription(self, filter_key, max_pending)
+        with self.lock:  # no change can be published between backlog & going live
+            if from_sequence is not None:
+                oldest_sequence = self.history[0].sequence if self.history else self.sequence + 1
+                if from_sequence < oldest_sequence - 1 or from_sequence > self.sequence:
+                    raise StaleSequenceException(from_sequence)
+                subscription.last_sequence = from_sequence
+                for change in self._get_history_after(from_sequence):
+                    if self._matches(change, filter_key) and not subscription._put(change):
+                        return subscription  # dropped, reader resumes after the backlog
+            else:
+                subscription.last_sequence = self.sequence
+            self.subscriptions.setdefault(filter_key, {})[subscription] = True
+        return subscription
+
+    def _get_history_after(self, sequence):
+        """Changes kept after the sequence, history is sorted by sequence"""
+        start = len(self.history) - (self.sequence - sequence)
+        for position in range(max(start, 0), len(self.history)):
+            yield self.history[position]
+
+    def _matches(self, change, filter_key):
+        return filter_key is None or getattr(change, filter_key[0]) == filter_key[1]
+
+    def _unlink(self, subscription):
+        """Caller holds the lock"""
+        subscriptions = self.subscriptions.get(subscription.filter_key, {})
+        subscriptions.pop(subscription, None)
+        if not subscriptions:
+            self.subscriptions.pop(subscription.filter_key, None)
+
+    def _remove_subscription(self, subscription):
+        with self.lock:
+            self._unlink(subscription)
+
+    def get_sequence(self):
+        """Sequence of the latest change"""
+        return self.sequence
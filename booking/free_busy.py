@@ -0,0 +1,86 @@
+"""Short lived cache of free/busy matrices, see Booking.free_busy
+An entry is kept for ttl seconds, and dropped at once when a booking
+change hits one of its rooms within its dates. A change made while a
+matrix is being computed keeps that matrix out of the cache, so a cached
+matrix never misses a change made before it is read"""
+import threading
+import time
+from itertools import count
+
+MAX_FREE_BUSY_DAYS = 62  # dates of one matrix
+
+
+class FreeBusyCache:
+
+    def __init__(self, ttl=5.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # (from_ordinal, to_ordinal, rooms) -> (expires at, matrix)
+        self.room_keys = {}  # room -> {entry key: True}
+        self.pending = {}  # token -> (key, rooms) of matrices being computed
+        self.tokens = count()
+        self.lock = threading.Lock()  # leaf lock, taken under room locks
+
+    def get(self, key):
+        """Returns cached matrix of the key, None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return None
+            return entry[1]
+
+    def begin(self, key):
+        """Returns token to put matrix of key with, once computed"""
+        with self.lock:
+            token = next(self.tokens)
+            self.pending[token] = (key, frozenset(key[2]))
+            return token
+
+    def put(self, token, matrix):
+        """Caches matrix unless a change of its rooms & dates came after
+        begin"""
+        with self.lock:
+            pending = self.pending.pop(token, None)
+            if pending is None:
+                return
+            key = pending[0]
+            now = time.monotonic()
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                for old_key in [old_key for old_key, entry in self.entries.items() if entry[0] <= now]:
+                    self._drop(old_key)
+                if len(self.entries) >= self.max_entries:  # oldest goes
+                    self._drop(next(iter(self.entries)))
+            self.entries[key] = (now + self.ttl, matrix)
+            for room_name in key[2]:
+                self.room_keys.setdefault(room_name, {})[key] = True
+
+    def invalidate(self, room_name, from_ordinal, to_ordinal=None):
+        """Drops matrices holding the room on any date from from_ordinal
+        to to_ordinal(both inclusive, no end if not given)"""
+        with self.lock:
+            for key in list(self.room_keys.get(room_name, ())):
+                if key[1] >= from_ordinal and (to_ordinal is None or key[0] <= to_ordinal):
+                    self._drop(key)
+            for token, (key, rooms) in list(self.pending.items()):
+                if room_name in rooms and key[1] >= from_ordinal \
+                        and (to_ordinal is None or key[0] <= to_ordinal):
+                    self.pending.pop(token)
+
+    def _drop(self, key):
+        """Caller holds the lock"""
+        self.entries.pop(key, None)
+        for room_name in key[2]:
+            keys = self.room_keys.get(room_name)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    self.room_keys.pop(room_name)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.room_keys.clear()
+            self.pending.clear()
@@ -0,0 +1,39 @@
+"""Stats of handler operations & lock waits, see utils.stats
+Nothing is instrumented until enable_stats is called"""
+from booking.booking import booking_handler, floor_handler, room_handler
+from users.user import organization_handler, user_handler
+from utils.stats import Stats
+
+stats_collector = Stats()
+
+
+def enable_stats(dump_interval=None, output=None):
+    """Instruments public methods of all handlers and the booking locks
+    of the default building, other buildings aren't instrumented. Stats
+    are also written every dump_interval seconds if given"""
+    if not stats_collector.is_attached():
+        for handler in (floor_handler, room_handler, booking_handler,
+                        organization_handler, user_handler):
+            stats_collector.attach(handler)
+        stats_collector.attach_locks("room", booking_handler.room_locks)
+        stats_collector.attach_locks("organization", booking_handler.org_locks)
+        stats_collector.attach_locks("user", booking_handler.user_locks)
+        stats_collector.attach_locks("quota", organization_handler.quota_locks)
+    if dump_interval:
+        stats_collector.start_dump(dump_interval, output)
+
+
+def disable_stats():
+    """Restores handlers & locks, stats gathered so far are kept"""
+    stats_collector.stop_dump()
+    stats_collector.detach()
+
+
+def reset_stats():
+    stats_collector.reset()
+
+
+def stats():
+    """Returns calls, errors by exception, latency percentiles &
+    histogram of every operation, and acquires & wait time of locks"""
+    return stats_collector.get_stats()
@@ -0,0 +1,100 @@
+"""Sorted streams of bookings & cursors to resume them
+A stream yields (sort key, booking) in sort key order, sort key is
+(date ordinal, start hour, booking key) for date order and
+(room, date ordinal, start hour, booking key) for room order. Booking key
+makes sort keys unique, so a cursor is just the sort key of the last
+booking seen and the next page starts right after it, wherever the
+bookings before it moved in between"""
+import base64
+import json
+from bisect import bisect_left
+from heapq import merge
+
+from exceptions import InvalidParameterException
+
+ORDER_BY_DATE = "date"
+ORDER_BY_ROOM = "room"
+ORDERS = (ORDER_BY_DATE, ORDER_BY_ROOM)
+MAX_PAGE_SIZE = 500
+CHUNK_SIZE = 256  # entries copied from an index at a time
+
+
+def check_order(order):
+    if order not in ORDERS:
+        raise InvalidParameterException("Order")
+
+
+def check_page_size(page_size):
+    if not isinstance(page_size, int) or not 0 < page_size <= MAX_PAGE_SIZE:
+        raise InvalidParameterException("Page Size")
+
+
+def encode_cursor(order, sort_key):
+    return base64.urlsafe_b64encode(json.dumps([order, *sort_key]).encode()).decode()
+
+
+def decode_cursor(cursor, order):
+    """Returns sort key of the cursor, None if there is no cursor"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (AttributeError, ValueError):
+        raise InvalidParameterException("Cursor")
+    types = (str, int, int, str) if order == ORDER_BY_ROOM else (int, int, str)  # of the sort key
+    if not isinstance(values, list) or len(values) != len(types) + 1 or values[0] != order \
+            or any(type(value) is not value_type for value, value_type in zip(values[1:], types)):
+        raise InvalidParameterException("Cursor")
+    return tuple(values[1:])
+
+
+def _get_next_probe(sort_key):
+    """Smallest key sorting after sort_key, key + "\\0" is the smallest
+    string after key"""
+    return sort_key[:-1] + (sort_key[-1] + "\0",)
+
+
+def iter_index(index, after=None, from_ordinal=None, to_ordinal=None, prefix=()):
+    """Yields (prefix + sort key, record) of a date sorted index of
+    (date ordinal, hour, key, record) entries after the (date) sort key.
+    Position is looked up again for every chunk, so the index may change
+    while the stream is read"""
+    if after and after[0] >= (from_ordinal or 0):
+        probe = _get_next_probe(after)
+    else:
+        probe = (from_ordinal or 0,)
+    while True:
+        start = bisect_left(index, probe)
+        chunk = index[start:start + CHUNK_SIZE]
+        for entry in chunk:
+            if to_ordinal is not None and entry[0] > to_ordinal:
+                return
+            yield prefix + entry[:3], entry[3]
+        if len(chunk) < CHUNK_SIZE:
+            return
+        probe = _get_next_probe(chunk[-1][:3])
+
+
+def iter_room_index(room_index, after=None, from_ordinal=None, to_ordinal=None):
+    """Yields (room sort key, record) of a {room: date sorted index}
+    after the (room) sort key"""
+    for room in sorted(room_index):
+        if after and room < after[0]:
+            continue
+        index = room_index.get(room)
+        if index:
+            room_after = after[1:] if after and room == after[0] else None
+            yield from iter_index(index, room_after, from_ordinal, to_ordinal, (room,))
+
+
+def iter_sorted(sort_keyed, after=None):
+    """Sorts (sort key, booking) pairs, yields those after the sort key"""
+    for sort_key, booking in sorted(sort_keyed, key=lambda pair: pair[0]):
+        if after is None or sort_key > after:
+            yield sort_key, booking
+
+
+def merge_streams(streams):
+    """Merges sorted streams into one, sort keys are unique so bookings
+    are never compared"""
+    return merge(*streams)
@@ -0,0 +1,235 @@
+"""Warm restarts from a journal of operations, see utils.journal
+Directory keeps a checkpoint: compacted records that rebuild the whole
+state at some point, and journal: records of operations done after it.
+Startup replays checkpoint and then journal. Replay is idempotent, a
+record of something already in state is skipped, so a journal that is
+partly in checkpoint too replays to the same state. Archived bookings are
+kept in checkpoint as archive rows, never booked again"""
+import os
+import threading
+
+from booking.availability import availability_handler
+from booking.booking import booking_handler, floor_handler, room_handler
+from booking.recurrence import RecurringBooking
+from users.user import organization_handler, user_handler
+from utils.journal import (OP_ARCHIVE, OP_ARCHIVE_ROWS, OP_BOOK,
+                           OP_BOOKING_LIMIT, OP_CANCEL, OP_FLOOR,
+                           OP_ORGANIZATION, OP_ROOM, OP_ROOM_UPDATE, OP_SERIES,
+                           OP_SERIES_END, OP_SERIES_SKIP, OP_USER, Journal,
+                           read_records, set_journal, write_records)
+from utils.generic import format_date_ordinal, get_month_of_ordinal
+
+JOURNAL_FILE = "journal"
+OLD_JOURNAL_FILE = "journal.old"  # journal being compacted into checkpoint
+CHECKPOINT_FILE = "checkpoint"
+
+
+def _replay_organization(name, contact_info, other_details, id):
+    if not organization_handler._check_if_organization_exists(name):
+        organization_handler._add_organization(name, contact_info, other_details, id)
+
+
+def _replay_user(email, full_name, role, id, organization):
+    if not user_handler._check_if_user_exists(email):
+        user_handler._restore_user(email, full_name, role, id, organization)
+
+
+def _replay_floor(number, rooms_count, id):
+    if not floor_handler._check_if_floor_exists(number):
+        floor_handler._add_floor(number, rooms_count, id)
+
+
+def _replay_room(name, floor, capacity, is_projector_available, other_details, id):
+    if not room_handler._check_if_room_exists(name):
+        room_handler._add_room(name, floor, capacity, is_projector_available,
+                               other_details, id)
+
+
+def _replay_room_update(name, capacity, is_projector_available, other_details):
+    if room_handler._check_if_room_exists(name):
+        room_handler._update_room(name, capacity, is_projector_available, other_details)
+
+
+def _replay_book(key, user, organization, room_name, date_ordinal, start_hour, end_hour):
+    if key in booking_handler.bookings or date_ordinal < booking_handler.open_from \
+            or not availability_handler.is_slot_free(
+            room_name, date_ordinal, start_hour, end_hour):  # slot is held by a later booking
+        return
+    booking_handler._insert_booking(key, user, organization, room_name,
+                                    format_date_ordinal(date_ordinal),
+                                    date_ordinal, start_hour, end_hour)
+    booking_handler._create_user_booking_mapping(user, key)
+
+
+def _replay_cancel(key):
+    if key in booking_handler.bookings:
+        booking_handler._remove_booking(key)
+
+
+def _replay_series(*state):
+    if state[0] not in booking_handler.recurring_bookings:
+        booking_handler._add_series(RecurringBooking.from_state(*state))
+
+
+def _replay_series_skip(series_id, date_ordinal):
+    series = booking_handler.recurring_bookings.get(series_id)
+    if series:
+        series.cancelled_ordinals.add(date_ordinal)
+
+
+def _replay_series_end(series_id, from_ordinal):
+    series = booking_handler.recurring_bookings.get(series_id)
+    if series:
+        booking_handler._end_series(series, from_ordinal)
+
+
+def _replay_archive_rows(rows):
+    """Rows are published by the OP_ARCHIVE record following them"""
+    with booking_handler.archive.lock:
+        booking_handler.archive.add_rows(rows)
+
+
+REPLAY_FUNCTIONS = {
+    OP_ORGANIZATION: _replay_organization,
+    OP_BOOKING_LIMIT: organization_handler._set_organization_booking_limit,
+    OP_USER: _replay_user,
+    OP_FLOOR: _replay_floor,
+    OP_ROOM: _replay_room,
+    OP_ROOM_UPDATE: _replay_room_update,
+    OP_BOOK: _replay_book,
+    OP_CANCEL: _replay_cancel,
+    OP_SERIES: _replay_series,
+    OP_SERIES_SKIP: _replay_series_skip,
+    OP_SERIES_END: _replay_series_end,
+    OP_ARCHIVE: booking_handler.archive_bookings,  # skips a date already archived
+    OP_ARCHIVE_ROWS: _replay_archive_rows,
+}
+
+
+def _replay_records(records):
+    """Applies (op, args) records, returns count applied"""
+    replayed = 0
+    for op, args in records:
+        replay_function = REPLAY_FUNCTIONS.get(op)
+        if replay_function:
+            replay_function(*args)
+            replayed += 1
+    return replayed
+
+
+def _rebuild_booking_hours():
+    """Booked hours of organizations aren't journaled, they are counted
+    again from bookings, archived bookings & recurring bookings once
+    replay is done"""
+    month_hours = {}
+    for booking_details in booking_handler.bookings.values():
+        key = (booking_details.organization, get_month_of_ordinal(booking_details.date_ordinal))
+        month_hours[key] = month_hours.get(key, 0) + booking_details.end_hour - booking_details.start_hour
+    for rows in booking_handler.archive.get_month_rows():
+        for date_ordinal, start_hour, end_hour, room, user, organization in rows:
+            key = (organization, get_month_of_ordinal(date_ordinal))
+            month_hours[key] = month_hours.get(key, 0) + end_hour - start_hour
+    for series in booking_handler.recurring_bookings.values():
+        for ordinal in series.get_occurrences():
+            key = (series.organization, get_month_of_ordinal(ordinal))
+            month_hours[key] = month_hours.get(key, 0) + series.end_hour - series.start_hour
+    organization_handler.org_booking_hours.clear()
+    organization_handler.org_booking_hours.update(month_hours)
+
+
+def replay(directory):
+    """Rebuilds state from files of directory, returns number of records
+    replayed. Call before anything is created"""
+    replayed = 0
+    for file_name in (CHECKPOINT_FILE, OLD_JOURNAL_FILE, JOURNAL_FILE):
+        replayed += _replay_records(read_records(os.path.join(directory, file_name)))
+    _rebuild_booking_hours()
+    return replayed
+
+
+def get_checkpoint_records():
+    """Yields compacted records that rebuild current state, organizations
+    come before their users and rooms before their bookings"""
+    for organization in organization_handler.get_all_organizations().values():
+        yield OP_ORGANIZATION, (organization.name, organization.contact_info,
+                                dict(organization.other_details), organization.id)
+    for organization, hours in list(organization_handler.org_booking_limit.items()):
+        yield OP_BOOKING_LIMIT, (organization, hours)
+    for user in user_handler.get_all_users().values():
+        yield OP_USER, (user.email, user.full_name, user.role, user.id, user.organization)
+
+    rooms = room_handler.list_rooms()
+    floor_rooms_count = {}  # replayed rooms add to rooms count of floor again
+    for room in rooms.values():
+        floor_rooms_count[room.floor] = floor_rooms_count.get(room.floor, 0) + 1
+    for number, floor in floor_handler.get_all_floors().items():
+        yield OP_FLOOR, (number, floor["rooms_count"] - floor_rooms_count.get(number, 0), floor["id"])
+    for room in rooms.values():
+        yield OP_ROOM, (room.name, room.floor, room.capacity, room.is_projector_available,
+                        dict(room.other_details), room.id)
+
+    archive = booking_handler.archive
+    with archive.lock:  # no booking moves to archive while both are read
+        for key, booking_details in booking_handler.get_all_bookings().items():
+            yield OP_BOOK, (key, booking_details.user, booking_details.organization,
+                            booking_details.room, booking_details.date_ordinal,
+                            booking_details.start_hour, booking_details.end_hour)
+        for rows in archive.get_month_rows():
+            yield OP_ARCHIVE_ROWS, (rows,)
+        if archive.archived_before:
+            yield OP_ARCHIVE, (archive.archived_before,)
+    for series in list(booking_handler.recurring_bookings.values()):
+        yield OP_SERIES, series.get_state()
+
+
+def write_checkpoint(directory):
+    """Writes compacted records of current state as the checkpoint"""
+    write_records(os.path.join(directory, CHECKPOINT_FILE), get_checkpoint_records())
+
+
+class JournalManager:
+    """Replays a directory on open & records every later operation in
+    it, checkpoint is taken every checkpoint_every journaled records"""
+
+    def __init__(self, directory, checkpoint_every=100000, **journal_options):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.journal_options = journal_options
+        self.journal = None
+        self.checkpoint_lock = threading.Lock()
+
+    def open(self):
+        """Replays state & starts journaling, returns records replayed"""
+        os.makedirs(self.directory, exist_ok=True)
+        replayed = replay(self.directory)
+        old_journal_path = os.path.join(self.directory, OLD_JOURNAL_FILE)
+        journal_path = os.path.join(self.directory, JOURNAL_FILE)
+        if os.path.exists(old_journal_path):  # last checkpoint didn't finish
+            write_checkpoint(self.directory)  # nothing is running yet, state is complete
+            os.remove(old_journal_path)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+        self.journal = Journal(journal_path, **self.journal_options)
+        self.journal.on_flush = self._checkpoint_if_due
+        set_journal(self.journal)
+        return replayed
+
+    def _checkpoint_if_due(self, journal):
+        if self.checkpoint_every and journal.records_count >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Compacts journal into checkpoint, operations keep running
+        Journal is moved aside first, so every record of it is in state
+        read afterwards. Records of operations running meanwhile may land
+        in both new journal & checkpoint, replay skips them"""
+        with self.checkpoint_lock:
+            old_journal_path = os.path.join(self.directory, OLD_JOURNAL_FILE)
+            self.journal.rotate(old_journal_path)
+            write_checkpoint(self.directory)
+            os.remove(old_journal_path)
+
+    def close(self):
+        """Stops journaling, buffered records are written"""
+        set_journal(None)
+        self.journal.close()
@@ -0,0 +1,144 @@
+"""Recurring bookings, stored once as a rule and expanded only for the
+dates a query asks about"""
+import uuid
+from datetime import date as date_type
+
+from booking.availability import get_range_mask
+from utils.generic import format_date_ordinal, get_month_of_ordinal
+
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+FREQUENCIES = (DAILY, WEEKLY, MONTHLY)
+
+
+def _get_ordinal_of_month(month_number, day):
+    """Ordinal of day in the month, None if month doesn't have that day"""
+    try:
+        return date_type(month_number // 12, month_number % 12 + 1, day).toordinal()
+    except ValueError:
+        return None
+
+
+class RecurringBooking:
+    """A series of bookings of one room & slot, eg. every Monday 10 to 11
+    Monthly series repeat on the day of month of start date, months
+    without that day are skipped"""
+
+    def __init__(self, room="", user="", organization="", start_hour=0, end_hour=1,
+                 frequency=WEEKLY, interval=1, start_ordinal=0, until_ordinal=None, count=0):
+        self.id = str(uuid.uuid4())
+        self.room = room
+        self.user = user
+        self.organization = organization
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.mask = get_range_mask(start_hour, end_hour)
+        self.frequency = frequency
+        self.interval = interval
+        self.start_ordinal = start_ordinal
+        self.start_day = date_type.fromordinal(start_ordinal).day if start_ordinal else 0
+        self.start_month = get_month_of_ordinal(start_ordinal) if start_ordinal else 0
+        self.cancelled_ordinals = set()  # single occurrences cancelled
+        if count:
+            self.end_ordinal = self._get_nth_ordinal(count - 1)
+        else:
+            self.end_ordinal = until_ordinal
+
+    def _get_step(self):
+        """Days between occurrences of daily & weekly series"""
+        return self.interval * 7 if self.frequency == WEEKLY else self.interval
+
+    def _get_nth_ordinal(self, n):
+        """Ordinal of the nth(0 based) occurrence"""
+        if self.frequency != MONTHLY:
+            return self.start_ordinal + n * self._get_step()
+        month_number = self.start_month
+        while True:  # months without the day don't count as occurrence
+            ordinal = _get_ordinal_of_month(month_number, self.start_day)
+            if ordinal is not None:
+                if n == 0:
+                    return ordinal
+                n -= 1
+            month_number += self.interval
+
+    def is_scheduled_on(self, ordinal):
+        """Checks whether rule has an occurrence on the date, even if cancelled"""
+        if not self.start_ordinal <= ordinal <= self.end_ordinal:
+            return False
+        if self.frequency != MONTHLY:
+            return (ordinal - self.start_ordinal) % self._get_step() == 0
+        if date_type.fromordinal(ordinal).day != self.start_day:
+            return False
+        return (get_month_of_ordinal(ordinal) - self.start_month) % self.interval == 0
+
+    def occurs_on(self, ordinal):
+        """Checks whether series holds the room on the date"""
+        return ordinal not in self.cancelled_ordinals and self.is_scheduled_on(ordinal)
+
+    def get_occurrences(self, from_ordinal=None, to_ordinal=None):
+        """Yields ordinals of occurrences within the dates(both inclusive)"""
+        from_ordinal = max(from_ordinal or self.start_ordinal, self.start_ordinal)
+        to_ordinal = min(to_ordinal or self.end_ordinal, self.end_ordinal)
+        if from_ordinal > to_ordinal:
+            return
+        if self.frequency != MONTHLY:
+            step = self._get_step()
+            skipped = -(-(from_ordinal - self.start_ordinal) // step)  # ceil
+            ordinals = range(self.start_ordinal + skipped * step, to_ordinal + 1, step)
+        else:
+            first_month = get_month_of_ordinal(from_ordinal)
+            first_month += (self.start_month - first_month) % self.interval
+            ordinals = (_get_ordinal_of_month(month_number, self.start_day) for month_number in
+                        range(first_month, get_month_of_ordinal(to_ordinal) + 1, self.interval))
+        for ordinal in ordinals:
+            if ordinal is not None and from_ordinal <= ordinal <= to_ordinal \
+                    and ordinal not in self.cancelled_ordinals:
+                yield ordinal
+
+    def get_slot(self):
+        """Returns a new {start_hour: end_hour} slot, callers may keep or change it"""
+        return {self.start_hour: self.end_hour}
+
+    def get_occurrence_details(self, ordinal):
+        """Returns details of one occurrence, same shape as a booking"""
+        return {
+            "slot": self.get_slot(),
+            "date": format_date_ordinal(ordinal),
+            "user": self.user,
+            "room": self.room,
+            "organization": self.organization,
+            "date_ordinal": ordinal,
+            "series_id": self.id
+        }
+
+    def get_state(self):
+        """Returns everything needed to rebuild the series with from_state,
+        as plain values"""
+        return (self.id, self.room, self.user, self.organization, self.start_hour,
+                self.end_hour, self.frequency, self.interval, self.start_ordinal,
+                self.end_ordinal, sorted(self.cancelled_ordinals))
+
+    @classmethod
+    def from_state(cls, id, room, user, organization, start_hour, end_hour,
+                   frequency, interval, start_ordinal, end_ordinal, cancelled_ordinals):
+        """Rebuilds a series from get_state values"""
+        series = cls(room, user, organization, start_hour, end_hour, frequency,
+                     interval, start_ordinal, end_ordinal)
+        series.id = id
+        series.cancelled_ordinals = set(cancelled_ordinals)
+        return series
+
+    def get_details(self):
+        """Returns details of the series"""
+        return {
+            "id": self.id,
+            "room": self.room,
+            "user": self.user,
+            "organization": self.organization,
+            "slot": self.get_slot(),
+            "frequency": self.frequency,
+            "interval": self.interval,
+            "start_date": format_date_ordinal(self.start_ordinal),
+            "end_date": format_date_ordinal(self.end_ordinal),
+        }
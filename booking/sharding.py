@@ -0,0 +1,341 @@
+"""Floor sharded mode, bookings spread over several processes
+Every shard is a process with its own handlers owning a disjoint set of
+floors, so bookings of different floors run on different cores. The
+router is used in place of the handlers:
+- users & organizations are created on the router and on every shard
+- floors are given to shards round robin, rooms & their bookings,
+  cancellations and availability go to the shard owning their floor
+- monthly quota is checked & kept on the router for all shards, so an
+  organization can't go over it by booking on several floors at once
+- user & organization booking lists and room searches ask all shards
+  and merge the results
+Recurring bookings aren't routed yet, they need one shard per series"""
+from multiprocessing import get_context
+from threading import Lock
+from types import MappingProxyType
+
+from booking.booking import booking_handler, room_handler
+from exceptions import (AuthorizationException, DuplicateException,
+                        InvalidParameterException, NotFoundException)
+from users.user import organization_handler, user_handler
+from utils.authorization import Authorization
+from utils.generic import get_month_of_ordinal
+
+
+def _serve(connection):
+    """Shard process, runs batches of (handler, method, args, kwargs)
+    calls and sends back (ok, result or exception) of each"""
+    from booking.booking import booking_handler, floor_handler, room_handler
+    from users.user import organization_handler, user_handler
+    handlers = {"booking": booking_handler, "room": room_handler,
+                "floor": floor_handler, "organization": organization_handler,
+                "user": user_handler}
+    while True:
+        calls = connection.recv()
+        if calls is None:
+            break
+        results = []
+        for handler_name, method, args, kwargs in calls:
+            try:
+                result = getattr(handlers[handler_name], method)(*args, **kwargs)
+                if isinstance(result, MappingProxyType):  # snapshots can't be pickled
+                    result = dict(result)
+                results.append((True, result))
+            except Exception as e:
+                results.append((False, e))
+        connection.send(results)
+    connection.close()
+
+
+class Shard:
+    """Connection to one shard process, one batch in flight at a time"""
+
+    def __init__(self, context):
+        self.connection, shard_connection = context.Pipe()
+        self.process = context.Process(target=_serve, args=(shard_connection,), daemon=True)
+        self.process.start()
+        shard_connection.close()
+        self.lock = Lock()
+
+    def call(self, handler_name, method, *args, **kwargs):
+        """Runs one call on the shard, returns its result or raises its exception"""
+        with self.lock:
+            self.connection.send([(handler_name, method, args, kwargs)])
+            ok, result = self.connection.recv()[0]
+        if not ok:
+            raise result
+        return result
+
+    def close(self):
+        with self.lock:
+            self.connection.send(None)
+        self.process.join()
+
+
+class ShardRouter:
+
+    def __init__(self, workers=2, start_method="spawn"):
+        context = get_context(start_method)
+        self.shards = [Shard(context) for _ in range(workers)]
+        self.floor_shard = {}  # floor number -> shard number
+        self.room_floor = {}  # room name -> floor number
+        self.lock = Lock()  # guards floor & room maps
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def _broadcast(self, handler_name, method, *args, **kwargs):
+        """Runs the call on every shard, returns results in shard order"""
+        return self._scatter({shard_number: [(handler_name, method, args, kwargs)]
+                              for shard_number in range(len(self.shards))})
+
+    def _scatter(self, shard_calls):
+        """Sends {shard number: calls} to all shards first, so they run in
+        parallel, then collects {shard number: [(ok, result)]}"""
+        shard_numbers = sorted(shard_calls)
+        for shard_number in shard_numbers:  # sorted order, can't deadlock
+            self.shards[shard_number].lock.acquire()
+        try:
+            for shard_number in shard_numbers:
+                self.shards[shard_number].connection.send(shard_calls[shard_number])
+            return {shard_number: self.shards[shard_number].connection.recv()
+                    for shard_number in shard_numbers}
+        finally:
+            for shard_number in shard_numbers:
+                self.shards[shard_number].lock.release()
+
+    def _get_results(self, handler_name, method, *args, **kwargs):
+        """Broadcasts the call, raises first exception, returns results"""
+        results = []
+        for shard_results in self._broadcast(handler_name, method, *args, **kwargs).values():
+            ok, result = shard_results[0]
+            if not ok:
+                raise result
+            results.append(result)
+        return results
+
+    def _get_room_shard(self, room_name):
+        floor = self.room_floor.get(room_name)
+        if floor is None:
+            raise NotFoundException("Room")
+        return self.shards[self.floor_shard[floor]]
+
+    # Users & organizations, kept on router & every shard
+
+    def create_admin_user(self, email="", full_name=""):
+        result = user_handler.create_admin_user(email, full_name)
+        self._get_results("user", "create_admin_user", email, full_name)
+        return result
+
+    def create_organization(self, requestor="", name="", contact_info="",
+                            other_details={}, monthly_quota=None):
+        result = organization_handler.create_organization(
+            requestor, name, contact_info, other_details, monthly_quota)
+        self._get_results("organization", "create_organization", requestor, name,
+                          contact_info, other_details, monthly_quota)
+        return result
+
+    def create_user(self, requestor="", email="", full_name="", organization=""):
+        result = user_handler.create_user(requestor, email, full_name, organization)
+        self._get_results("user", "create_user", requestor, email, full_name, organization)
+        return result
+
+    def set_organization_booking_limit(self, requestor="", organization="", hours=0):
+        result = organization_handler.set_organization_booking_limit(requestor, organization, hours)
+        self._get_results("organization", "set_organization_booking_limit",
+                          requestor, organization, hours)
+        return result
+
+    def get_organization_booking_hours(self, organization, month=None, date=""):
+        """Booked hours over all shards"""
+        return organization_handler.get_organization_booking_hours(organization, month, date)
+
+    # Floors & rooms, owned by one shard
+
+    def create_floor(self, requestor="", number=0, rooms_count=0):
+        with self.lock:
+            shard_number = self.floor_shard.get(number, len(self.floor_shard) % len(self.shards))
+            result = self.shards[shard_number].call("floor", "create_floor", requestor, number, rooms_count)
+            self.floor_shard[number] = shard_number
+        return result
+
+    def create_room(self, requestor="", name="", floor=1, capacity=0,
+                    is_projector_available=False, other_details={}):
+        with self.lock:
+            if floor not in self.floor_shard:
+                raise NotFoundException("Floor")
+            if name in self.room_floor:  # shards can't see rooms of each other
+                raise DuplicateException("Room")
+            result = self.shards[self.floor_shard[floor]].call(
+                "room", "create_room", requestor, name, floor, capacity,
+                is_projector_available, other_details)
+            self.room_floor[name] = floor
+        return result
+
+    def update_room(self, requestor="", name="", capacity=None,
+                    is_projector_available=None, other_details=None):
+        return self._get_room_shard(name).call("room", "update_room", requestor, name, capacity,
+                                               is_projector_available, other_details)
+
+    def get_all_floors(self):
+        floors = {}
+        for shard_floors in self._get_results("floor", "get_all_floors"):
+            floors.update(shard_floors)
+        return floors
+
+    def get_room_details(self, name):
+        return self._get_room_shard(name).call("room", "get_room_details", name)
+
+    def list_rooms(self, capacity=None, projector_required=False, date="", time_slot={},
+                   floor=None, attributes={}):
+        rooms = {}
+        for shard_rooms in self._get_results("room", "list_rooms", capacity,
+                                             projector_required, date, time_slot,
+                                             floor, attributes):
+            rooms.update(shard_rooms)
+        return rooms
+
+    def find_available_rooms(self, date="", time_slot={}, min_capacity=0,
+                             projector_required=False, floor=None, limit=5, attributes={}):
+        """Best fitting rooms of all shards, smallest capacity first"""
+        if floor is not None:
+            if floor not in self.floor_shard:
+                return []
+            return self.shards[self.floor_shard[floor]].call(
+                "room", "find_available_rooms", date, time_slot, min_capacity,
+                projector_required, floor, limit, attributes)
+        rooms = [room for shard_rooms in self._get_results(
+                     "room", "find_available_rooms", date, time_slot, min_capacity,
+                     projector_required, floor, limit, attributes)
+                 for room in shard_rooms]
+        rooms.sort(key=lambda room: (room["capacity"], room["name"]))
+        return rooms[:limit]
+
+    def find_nearby_rooms(self, requestor="", date="", time_slot={}, min_capacity=0,
+                          projector_required=False, limit=5, attributes={}, home_floor=None):
+        """Nearest rooms of all shards, home floor is found on router"""
+        if home_floor is None:
+            home_floor = room_handler._get_home_floor(requestor)
+        rooms = [room for shard_rooms in self._get_results(
+                     "room", "find_nearby_rooms", requestor, date, time_slot, min_capacity,
+                     projector_required, limit, attributes, home_floor)
+                 for room in shard_rooms]
+        rooms.sort(key=lambda room: (abs(room["floor"] - home_floor), room["capacity"], room["name"]))
+        return rooms[:limit]
+
+    # Bookings, run on shard owning the room, quota kept on router
+
+    def _check_booking(self, requestor, room_name, time_slot, date):
+        """Validates booking on router, returns (organization, month, hours)"""
+        requestor_details = user_handler.get_user_details(requestor)
+        if not Authorization.can_manage_bookings(requestor_details):  # check permissions
+            raise AuthorizationException("Create Booking")
+        self._get_room_shard(room_name)
+        date_ordinal = booking_handler._parse_date(date)[1]
+        start_hour, end_hour = booking_handler._get_slot_hours(time_slot)
+        return (requestor_details.get("organization"),
+                get_month_of_ordinal(date_ordinal), end_hour - start_hour)
+
+    def book_room(self, requestor="", room_name="", time_slot={}, date=""):
+        organization, month, hours = self._check_booking(requestor, room_name, time_slot, date)
+        organization_handler.reserve_organization_booking_hours(
+            organization, {month: hours})  # raises if over quota of all shards
+        try:
+            return self._get_room_shard(room_name).call(
+                "booking", "book_room", requestor, room_name, time_slot, date)
+        except Exception:
+            organization_handler.release_organization_booking_hours(organization, {month: hours})
+            raise
+
+    def book_rooms(self, bookings=[]):
+        """Books many (requestor, room_name, time_slot, date) bookings,
+        each one independently. Every shard gets its bookings in one
+        message and shards run in parallel. Returns per booking
+        {"booked": bool, "result": message, "error": message}"""
+        results = [{"booked": False, "result": None, "error": None} for _ in bookings]
+        shard_calls, shard_positions, reserved = {}, {}, {}
+        for position, (requestor, room_name, time_slot, date) in enumerate(bookings):
+            try:
+                organization, month, hours = self._check_booking(requestor, room_name, time_slot, date)
+                organization_handler.reserve_organization_booking_hours(organization, {month: hours})
+            except Exception as e:
+                results[position]["error"] = str(e)
+                continue
+            reserved[position] = (organization, {month: hours})
+            shard_number = self.floor_shard[self.room_floor[room_name]]
+            shard_calls.setdefault(shard_number, []).append(
+                ("booking", "book_room", (requestor, room_name, time_slot, date), {}))
+            shard_positions.setdefault(shard_number, []).append(position)
+
+        for shard_number, shard_results in self._scatter(shard_calls).items():
+            for position, (ok, result) in zip(shard_positions[shard_number], shard_results):
+                if ok:
+                    results[position].update(booked=True, result=result)
+                else:
+                    results[position]["error"] = str(result)
+                    organization_handler.release_organization_booking_hours(*reserved[position])
+        return results
+
+    def cancel_room_booking(self, requestor="", room="", time_slot={}, date=""):
+        result = self._get_room_shard(room).call(
+            "booking", "cancel_room_booking", requestor, room, time_slot, date)
+        date_ordinal = booking_handler._parse_date(date)[1]
+        start_hour, end_hour = booking_handler._get_slot_hours(time_slot)
+        organization_handler.release_organization_booking_hours(
+            user_handler.get_organization_from_user(requestor),
+            {get_month_of_ordinal(date_ordinal): end_hour - start_hour})
+        return result
+
+    def get_available_hours(self, room_name="", date=""):
+        return self._get_room_shard(room_name).call(
+            "booking", "get_available_hours", room_name, date)
+
+    def get_first_available_hour(self, room_name="", date="", from_hour=0):
+        return self._get_room_shard(room_name).call(
+            "booking", "get_first_available_hour", room_name, date, from_hour)
+
+    def free_busy(self, date_range=[], floor=None, rooms=None):
+        """Matrix of rooms of all shards, each shard is asked for its own
+        rooms only and caches its part"""
+        if isinstance(rooms, str):
+            raise InvalidParameterException("Rooms")
+        if rooms is not None:
+            shard_rooms = {}
+            for room_name in rooms:
+                shard_number = self.floor_shard[self.room_floor[room_name]] \
+                    if room_name in self.room_floor else None
+                if shard_number is None:
+                    raise NotFoundException("Room")
+                shard_rooms.setdefault(shard_number, []).append(room_name)
+            shard_calls = {shard_number: [("booking", "free_busy", (date_range, floor, names), {})]
+                           for shard_number, names in shard_rooms.items()}
+        elif floor is not None:
+            shard_calls = {self.floor_shard[floor]: [("booking", "free_busy", (date_range, floor, None), {})]} \
+                if floor in self.floor_shard else {}
+        else:
+            shard_calls = {shard_number: [("booking", "free_busy", (date_range, None, None), {})]
+                           for shard_number in range(len(self.shards))}
+        matrix = booking_handler.free_busy(date_range, rooms=())  # checks date range, dates of the result
+        for shard_results in self._scatter(shard_calls).values():
+            ok, result = shard_results[0]
+            if not ok:
+                raise result
+            matrix["rooms"].update(result["rooms"])
+        matrix["rooms"] = dict(sorted(matrix["rooms"].items()))
+        return matrix
+
+    def _merge_bookings(self, method, *args):
+        bookings = [booking for shard_bookings in self._get_results("booking", method, *args)
+                    for booking in shard_bookings]
+        bookings.sort(key=lambda booking: (booking["date_ordinal"],
+                                           booking_handler._get_slot_hour(booking["slot"])))
+        return bookings
+
+    def get_booking_of_organization(self, user="", organization="", date_range=[]):
+        """Bookings of organization on all shards, sorted by date and hour"""
+        return self._merge_bookings("get_booking_of_organization", user, organization, date_range)
+
+    def get_booking_of_user(self, user="", date_range=[]):
+        """Bookings of user on all shards, sorted by date and hour"""
+        return self._merge_bookings("get_booking_of_user", user, date_range)
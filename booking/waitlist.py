@@ -0,0 +1,109 @@
+"""Waitlists of booked slots, waiters get the slot when it is cancelled
+Every (room, date, slot) has a heap of waiters, first come first served,
+or by organization quota left when asked for. A waiter leaving is only
+marked, marked entries are dropped when they reach the top or when they
+are as many as the live ones, so a slot never holds more than twice
+max_waiters entries"""
+import heapq
+import threading
+from itertools import count
+
+from exceptions import DuplicateException, WaitlistFullException
+
+
+class Waitlist:
+
+    def __init__(self, max_waiters=50, by_quota=False):
+        self.max_waiters = max_waiters  # live waiters of a slot
+        self.by_quota = by_quota  # organizations with more quota left go first
+        self.room_date_slots = {}  # (room, date_ordinal) -> {(start_hour, end_hour): heap}
+        self.waiters = {}  # (room, date_ordinal, start_hour, end_hour, user) -> live entry
+        self.live_counts = {}  # (room, date_ordinal, start_hour, end_hour) -> live waiters
+        self.sequence = count()
+        self.lock = threading.Lock()  # leaf lock, taken under room locks
+
+    def add(self, room_name, date_ordinal, start_hour, end_hour, user, priority=0):
+        """Queues user for the slot, lower priority goes first then
+        earlier ones. Returns count of waiters of the slot"""
+        slot_key = (room_name, date_ordinal, start_hour, end_hour)
+        with self.lock:
+            if slot_key + (user,) in self.waiters:
+                raise DuplicateException("Waitlist Entry")
+            live_count = self.live_counts.get(slot_key, 0)
+            if live_count >= self.max_waiters:
+                raise WaitlistFullException(self.max_waiters)
+            entry = [priority, next(self.sequence), user]  # user is None once left
+            heap = self.room_date_slots.setdefault((room_name, date_ordinal), {}).setdefault(
+                (start_hour, end_hour), [])
+            heapq.heappush(heap, entry)
+            self.waiters[slot_key + (user,)] = entry
+            self.live_counts[slot_key] = live_count + 1
+            return live_count + 1
+
+    def remove(self, room_name, date_ordinal, start_hour, end_hour, user):
+        """Takes user off the slot's waitlist, returns False if not on it"""
+        slot_key = (room_name, date_ordinal, start_hour, end_hour)
+        with self.lock:
+            entry = self.waiters.pop(slot_key + (user,), None)
+            if not entry:
+                return False
+            entry[2] = None
+            self._decrease_live_count(slot_key)
+            slots = self.room_date_slots[(room_name, date_ordinal)]
+            heap = slots[(start_hour, end_hour)]
+            if len(heap) > 2 * self.live_counts.get(slot_key, 0):  # mostly left, drop marked
+                heap[:] = [entry for entry in heap if entry[2] is not None]
+                heapq.heapify(heap)
+                self._drop_if_empty(slots, room_name, date_ordinal, start_hour, end_hour)
+            return True
+
+    def pop_next(self, room_name, date_ordinal, is_slot_free):
+        """Takes the first waiter of all slots of room & date that
+        is_slot_free(start_hour, end_hour) allows, returns
+        (user, start_hour, end_hour) or None if nobody fits"""
+        with self.lock:
+            slots = self.room_date_slots.get((room_name, date_ordinal))
+            if not slots:
+                return None
+            best = None
+            for (start_hour, end_hour), heap in list(slots.items()):
+                while heap and heap[0][2] is None:  # left already
+                    heapq.heappop(heap)
+                if heap and (best is None or heap[0] < best[0]) and is_slot_free(start_hour, end_hour):
+                    best = (heap[0], start_hour, end_hour)
+                self._drop_if_empty(slots, room_name, date_ordinal, start_hour, end_hour)
+            if best is None:
+                return None
+            entry, start_hour, end_hour = best
+            heapq.heappop(slots[(start_hour, end_hour)])
+            slot_key = (room_name, date_ordinal, start_hour, end_hour)
+            self.waiters.pop(slot_key + (entry[2],), None)
+            self._decrease_live_count(slot_key)
+            self._drop_if_empty(slots, room_name, date_ordinal, start_hour, end_hour)
+            return entry[2], start_hour, end_hour
+
+    def _decrease_live_count(self, slot_key):
+        live_count = self.live_counts.pop(slot_key) - 1
+        if live_count:
+            self.live_counts[slot_key] = live_count
+
+    def _drop_if_empty(self, slots, room_name, date_ordinal, start_hour, end_hour):
+        """Caller holds the lock"""
+        if not slots.get((start_hour, end_hour), True):
+            slots.pop((start_hour, end_hour))
+        if not slots:
+            self.room_date_slots.pop((room_name, date_ordinal), None)
+
+    def get_waiting_count(self, room_name, date_ordinal, start_hour, end_hour):
+        return self.live_counts.get((room_name, date_ordinal, start_hour, end_hour), 0)
+
+    def drop_before(self, before_ordinal):
+        """Drops waitlists of dates before the ordinal, they can't be booked"""
+        with self.lock:
+            for room_name, date_ordinal in list(self.room_date_slots):
+                if date_ordinal < before_ordinal:
+                    self.room_date_slots.pop((room_name, date_ordinal))
+            for key in [key for key in self.waiters if key[1] < before_ordinal]:
+                self.waiters.pop(key)
+            for slot_key in [slot_key for slot_key in self.live_counts if slot_key[1] < before_ordinal]:
+                self.live_counts.pop(slot_key)
@@ -44,3 +44,50 @@ class AuthorizationException(Exception):
 
     def __str__(self) -> str:
         return self.message
+
+
+class InvalidParameterException(Exception):
+
+    def __init__(self, value):
+        if value:
+            self.message = f"{value} is not valid"
+        else:
+            self.message = "A parameter is not valid"
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class QuotaExceededException(Exception):
+
+    def __init__(self, limit):
+        if limit:
+            self.message = f"You have completed your quota of {limit} hour booking"
+        else:
+            self.message = "You have completed your booking quota"
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class StaleSequenceException(Exception):
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.message = f"Changes after sequence {sequence} are no longer available, " \
+            "reload bookings and subscribe again"
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class WaitlistFullException(Exception):
+
+    def __init__(self, limit):
+        if limit:
+            self.message = f"Waitlist is full, at most {limit} can wait for a slot"
+        else:
+            self.message = "Waitlist is full"
+
+    def __str__(self) -> str:
+        return self.message
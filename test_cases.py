@@ -1,6 +1,14 @@
 from users.user import user_handler, organization_handler
 from booking.booking import room_handler, floor_handler, booking_handler
 
+# from booking.instrumentation import enable_stats, disable_stats, stats
+# enable_stats()  # counts calls, errors & latency of every handler method & lock waits, enable_stats(dump_interval=60)
+# also writes them to stderr every minute
+# from booking.persistence import JournalManager
+# journal_manager = JournalManager("data", checkpoint_every=100000)
+# journal_manager.open()  # replays earlier state from data directory, then journals every operation
+# journal_manager.checkpoint()  # compacts journal into a checkpoint, done every checkpoint_every operations too
+
 """Create Admin"""
 user_handler.create_admin_user("admin@varaha.com", "Varaha Admin")
 user_handler.create_admin_user("admin2@varaha.com", "Varaha Admin 2")
@@ -10,6 +18,8 @@ user_handler.create_admin_user("admin@varaha.com", "Varaha Admin")  # should thr
 """Create Organization"""
 organization_handler.create_organization("admin@varaha.com", "Varaha", "7006793206", other_details={"floor": 1})
 organization_handler.create_organization("admin@varaha.com", "Olous", "6006793206", other_details={"floor": 1})
+organization_handler.create_organization("admin@varaha.com", "Riyalto", "5006793206", other_details={"floor": 1},
+                                         monthly_quota=50)  # organization with its own monthly quota
 # Error case, 
 organization_handler.create_organization("admin@varaha.com", "Varaha", 
                                          "9006973206", 
@@ -77,10 +87,46 @@ booking_handler.book_room("kanav220anand@gmail.com", "A1", {12:13})  # Varaha
 booking_handler.book_room("kanav220anand@gmail.com", "A1", {13:14})  # Varaha
 booking_handler.book_room("kanavanand797@gmail.com", "A1", {14:15})  # Varaha another user
 booking_handler.book_room("kanavanand@olous.com", "A1", {12:13}, date="20-09-2023")
+booking_handler.book_room("kanavanand@olous.com", "A4", {9:12}, date="20-09-2023")  # 3 hour booking, uses 3 hours of quota
 # Error case, 
 booking_handler.book_room("kanav220anand@gmail.com", "A1", {14:15})  # slot already booked
 booking_handler.book_room("admin@varaha.com", "A1", {20:21})  # permissions
 booking_handler.book_room("kanav220anand@gmail.com", "AA2", {15:17})  # No Room Name
+booking_handler.book_room("kanav220anand@gmail.com", "A4", {10:11}, date="20-09-2023")  # overlaps with 9 to 12 booking
+
+booking_handler.book_many("kanavanand@olous.com", [("A2", "21-09-2023", {9:10}),
+                                                   ("A3", "21-09-2023", {9:10})])  # books all slots or none, returns result per slot
+# Error case, 
+booking_handler.book_many("kanavanand@olous.com", [("A2", "22-09-2023", {9:10}),
+                                                   ("A1", "20-09-2023", {12:13})])  # nothing booked since second slot is already booked
+
+
+"""Assign Rooms to a batch of meetings"""
+booking_handler.assign_rooms("kanavanand@olous.com", [
+    {"attendees": 6, "date": "25-09-2023", "window": {9:12}, "hours": 2},  # 2 hours, starting 9am to 10am
+    {"attendees": 12, "date": "25-09-2023", "window": {14:18}, "projector": True},
+])  # picks rooms leaving fewest empty seats & books all, returns {"room", "slot", "booked", "error"} per meeting
+booking_handler.assign_rooms("kanavanand@olous.com", [{"attendees": 6, "date": "26-09-2023", "window": {9:12}}],
+                             commit=False)  # only returns the rooms & slots it would book
+
+
+"""Create Recurring Booking"""
+booking_handler.book_recurring_room("kanav220anand@gmail.com", "A2", {10:11}, start_date="02-10-2023",
+                                    frequency="weekly", until="30-10-2023")  # every Monday 10am to 11am in October
+booking_handler.book_recurring_room("kanavanand@olous.com", "A3", {16:17}, start_date="02-10-2023",
+                                    frequency="daily", interval=2, count=5)  # every other day, 5 times
+# Error case, 
+booking_handler.book_room("kanavanand797@gmail.com", "A2", {10:11}, date="09-10-2023")  # held by recurring booking
+booking_handler.get_recurring_bookings_of_user("kanav220anand@gmail.com")  # returns recurring bookings of user with their ids
+booking_handler.cancel_room_booking("kanav220anand@gmail.com", "A2", {10:11}, date="09-10-2023")  # cancels one occurrence
+booking_handler.cancel_recurring_booking("kanav220anand@gmail.com", "<recurring booking id>")  # cancels remaining occurrences
+
+
+"""Waitlist"""
+booking_handler.join_waitlist("kanav220anand@gmail.com", "A1", {14:15})  # slot is booked, waits for it
+booking_handler.leave_waitlist("kanav220anand@gmail.com", "A1", {14:15})
+booking_handler.join_waitlist("kanav220anand@gmail.com", "A1", {14:15})  # gets the booking when the slot is cancelled
+# below, notified as a "waitlist_promoted" change of booking_handler.subscribe_changes(user="kanav220anand@gmail.com")
 
 
 """Cancel Booking"""
@@ -96,9 +142,46 @@ organization_handler.get_all_organizations()  # returns all organizations
 floor_handler.get_all_floors()  # returns all floors
 room_handler.list_rooms()  # returns all rooms
 booking_handler.get_all_bookings()  # returns all bookings
+# listings above are read only snapshots, later bookings/rooms don't change an already returned listing
+user_details = user_handler.get_user_details("kanav220anand@gmail.com")
+for change_record in (lambda: user_details["permissions"].__setitem__("manage_users", 1),
+                            lambda: setattr(user_details, "permissions", {"manage_users": 1}),
+                            lambda: setattr(room_handler.list_rooms()["A2"], "capacity", 1)):
+    try:
+        change_record()
+    except (AttributeError, TypeError):
+        pass  # returned records & their permissions are read only, changing them raises
+    else:
+        raise AssertionError("a returned record could be changed")
+room_changes = booking_handler.subscribe_changes(room="A1")  # changes of room A1 from now on, also floor=1 or
+# organization="Varaha", or all changes if none is given, instead of polling get_all_bookings()
+room_changes.get_pending()  # returns changes queued so far, each {"sequence", "kind", "key", "room", "slot", ...}
+room_changes.get(timeout=1)  # waits for next change, None if nothing changed within a second
+booking_handler.subscribe_changes(room="A1", from_sequence=room_changes.last_sequence)  # resumes after a sequence
+room_changes.close()
 
 room_handler.list_rooms(capacity=20)  # returns all rooms where capacity is atleast 20
 room_handler.list_rooms(capacity=20, projector_required=True)  # returns all rooms where capacity is atleast 20 & projector is available
+room_handler.list_rooms(date="20-09-2023", time_slot={12:13})  # returns all rooms free on 20-09-2023 from 12pm to 1pm
+room_handler.update_room("admin@varaha.com", "A2", other_details={"video_conferencing": True, "whiteboard": True,
+                                                                 "accessibility": ["wheelchair"]})
+room_handler.list_rooms(capacity=8, floor=1, attributes={"video_conferencing": True, "whiteboard": True})  # returns
+# rooms of floor 1 with capacity atleast 8, video conferencing & whiteboard
+room_handler.list_rooms(attributes={"accessibility": "wheelchair"})  # list values match any of their items
+
+room_handler.find_available_rooms("20-09-2023", {12:13}, min_capacity=10,
+                                  projector_required=True, limit=2)  # returns 2 best fitting free rooms, smallest first
+room_handler.find_available_rooms(time_slot={12:13}, min_capacity=20, floor=1)  # returns free rooms on floor 1 today
+room_handler.find_available_rooms(time_slot={12:13}, attributes={"whiteboard": True})  # free rooms with whiteboard
+room_handler.find_nearby_rooms("kanav220anand@gmail.com", "20-09-2023", {12:13}, min_capacity=10)  # free rooms
+# nearest to floor of user's organization(other_details "floor"), best fitting first on each floor
+floor_handler.get_rooms_of_floor(1)  # returns ["A1", "A2", "A3", "A4"]
+
+booking_handler.get_available_hours("A1", date="20-09-2023")  # returns free hours of room on date
+booking_handler.free_busy(["18-09-2023", "24-09-2023"], floor=1)  # returns {"dates": [...], "rooms": {room:
+# (24 bit busy mask per date, bit h set if hour h is booked)}}, cached until a booking of the room & date changes
+booking_handler.free_busy(["20-09-2023", "20-09-2023"], rooms=["A1", "A2"])
+booking_handler.get_first_available_hour("A1", date="20-09-2023", from_hour=12)  # returns first free hour at or after 12pm
 
 booking_handler.get_booking_of_organization("kanav220anand@gmail.com")  # returns all bookings of organization via user
 booking_handler.get_booking_of_organization(organization="Varaha")  # returns all bookings of organization via org name
@@ -110,9 +193,48 @@ booking_handler.get_booking_of_organization(organization="Olous", date_range=["1
 booking_handler.get_booking_of_user("kanav220anand@gmail.com")  # returns all bookings of user
 booking_handler.get_booking_of_user("kanavanand797@gmail.com")  # returns all bookings of user
 booking_handler.get_booking_of_user("kanavanand@olous.com")  # returns all bookings of user
+booking_handler.get_booking_of_user("kanavanand@olous.com", date_range=["12-09-2023", "20-09-2023"])  # returns all
+# bookings of user in date range
+
+page = booking_handler.get_booking_page_of_organization(organization="Varaha", page_size=20)  # returns
+# {"bookings": first 20 bookings by date and hour, "cursor": for the next page, None on the last page}
+booking_handler.get_booking_page_of_organization(organization="Varaha", page_size=20, cursor=page["cursor"])  # next page
+booking_handler.get_booking_page_of_user("kanav220anand@gmail.com", order="room")  # sorted by room, date and hour
+booking_handler.get_all_bookings_page(date_range=["12-09-2023", "14-09-2023"])  # page of all bookings in date range
+sum(1 for booking in booking_handler.iter_booking_of_user("kanav220anand@gmail.com"))  # bookings one by one, not
+# as a list, counted here
+
+# from booking.archive import Compactor
+# compactor = Compactor(booking_handler, horizon_days=90, interval=3600).start()  # archives bookings older than 90 days
+# every hour, booking lists above still include archived bookings, archived dates can't be booked or cancelled
+booking_handler.archive_bookings(booking_handler._get_date_ordinal("01-09-2023"))  # archives bookings before the date now
 
 organization_handler.get_organization_booking_hours("Varaha")  # returns the booking hours of organization in current month
 organization_handler.get_organization_booking_hours("Olous")  # returns the booking hours of organization in current month
+organization_handler.get_organization_booking_hours("Olous", date="20-09-2023")  # returns the booking hours of organization in
+# month of the date
+organization_handler.set_organization_booking_limit("admin@varaha.com", "Olous", 40)  # changes monthly quota of organization
+
+from booking.analytics import OccupancyAnalytics
+analytics = OccupancyAnalytics()  # occupancy cube of room x date x hour, kept up to date from booking changes
+analytics.get_utilization("floor", date_range=["01-09-2023", "30-09-2023"], hours=(9, 18))  # returns
+# {floor: {"booked_hours", "available_hours", "utilization"}}, also "room" or "organization"
+analytics.get_peak_hours("organization", "Varaha")  # returns {"hours": booked hours per hour of day, "peak_hours": [...]}
+analytics.get_idle_rooms(date_range=["01-09-2023", "30-09-2023"], hours=(9, 18), max_utilization=0.1)  # rooms used
+# at most 10% of working hours, least used first
+analytics.close()
+
+from booking.building import building_registry
+tower = building_registry.create_building("Tower B")  # own users, floors, rooms, bookings & locks
+tower.user_handler.create_admin_user("admin@towerb.com", "Tower Admin")
+tower.floor_handler.create_floor("admin@towerb.com", 1)
+tower.room_handler.list_rooms()  # returns rooms of Tower B only
+building_registry.get_building("default").booking_handler is booking_handler  # True, module handlers are the default building
+building_registry.list_buildings()  # returns ["Tower B", "default"]
+building_registry.remove_building("Tower B")
+
+# stats()  # returns {"operations": {"Booking.book_room": {"calls", "errors", "p50_ms", ...}}, "locks": {"room": {...}}}
+# disable_stats()  # restores handlers, no overhead left
 
 # import threading
 # def aa():
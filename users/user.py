@@ -1,19 +1,33 @@
 """User & Organization related operations"""
 import uuid
+from types import MappingProxyType
 
+from booking.building import DEFAULT_BUILDING, Building
 from exceptions import (AuthorizationException, DuplicateException,
-                        NotFoundException, RequiredParameterException)
-from utils.generic import get_month_year
+                        InvalidParameterException, NotFoundException,
+                        QuotaExceededException, RequiredParameterException)
+from utils.generic import (get_date_ordinal, get_month_of_ordinal,
+                           get_today_ordinal)
 from utils.authorization import Authorization
+from utils.ds_utils import StripedLock, VersionedSnapshot
+from utils.journal import OP_BOOKING_LIMIT, OP_ORGANIZATION, OP_USER, record
+from utils.records import OrganizationRecord, UserRecord
 
 
 class Organization:
-    organizations = {}
-    org_user_map = {}
-    org_booking_hours = {}
+    default_booking_limit = 30
+
+    def __init__(self):
+        self.organizations = {}
+        self.organizations_snapshot = VersionedSnapshot(self.organizations)
+        self.org_user_map = {}
+        self.org_booking_hours = {}  # (organization, month) -> booked hours
+        self.org_booking_limit = {}  # organization -> monthly quota, if not default
+        self.quota_locks = StripedLock()  # guards booked hours of an (organization, month)
 
     def create_organization(self, requestor="", name="", 
-                            contact_info="", other_details={}):
+                            contact_info="", other_details={},
+                            monthly_quota=None):
         """Public function to be called from outside the class
         Requires Manage Organizations Permission"""
 
@@ -23,19 +37,29 @@ class Organization:
         if org_exists:
             raise DuplicateException("Organization")
 
-        self.organizations[name] = {
-            "id": str(uuid.uuid4()),
-            "name": name,
-            "contact_info": contact_info,
-            "other_details": other_details
-        }
-        self._add_organization_to_mapping(name)  # create an empty entry in org-user mapping details
+        if monthly_quota is not None:
+            self._check_booking_limit(monthly_quota)
+        self._add_organization(name, contact_info, other_details, str(uuid.uuid4()))
+        if monthly_quota is not None:
+            self._set_organization_booking_limit(name, monthly_quota)
         return f"Organization with name {name} created successfully!!"
 
+    def _add_organization(self, name, contact_info, other_details, id):
+        """Stores organization, also used to replay the journal"""
+        self.organizations[name] = OrganizationRecord(
+            id=id,
+            name=name,
+            contact_info=contact_info,
+            other_details=MappingProxyType(dict(other_details))
+        )
+        self.organizations_snapshot.publish()
+        self._add_organization_to_mapping(name)  # create an empty entry in org-user mapping details
+        self.building.record(OP_ORGANIZATION, name, contact_info, dict(other_details), id)
+
     def _check_can_create_organization(self, requestor_email):
         """Checks whether requestor is authorized to create organization"""
         requestor_email = requestor_email.lower()
-        requestor_details = user_handler.get_user_details(requestor_email)
+        requestor_details = self.user_handler.get_user_details(requestor_email)
         return Authorization.can_manage_organizations(requestor_details)
 
     def _check_if_organization_exists(self, org_name):
@@ -51,8 +75,8 @@ class Organization:
         return self.organizations.get(organization_name, None)
 
     def get_all_organizations(self):
-        """Returns Details of all organizations"""
-        return self.organizations
+        """Returns read only snapshot of Details of all organizations"""
+        return self.organizations_snapshot.get()
 
     def _add_organization_to_mapping(self, org_name=""):
         self.org_user_map[org_name] = {}
@@ -62,51 +86,128 @@ class Organization:
         self.org_user_map[organization][user] = True
         return "User added to organization"
 
-    def increase_organization_booking_hours(self, organization):
-        """Function to increase organization's booking hours in current month"""
-        key = self._generate_org_booking_key(organization)
-        hr_count = self.org_booking_hours.get(key)
-        if hr_count:
-            hr_count += 1
+    def increase_organization_booking_hours(self, organization, hours=1, month=None):
+        """Function to increase organization's booking hours in a month
+        (month number, see utils.generic.get_month_of_ordinal), current month by default"""
+        key = self._generate_org_booking_key(organization, month)
+        with self.quota_locks.get_lock(key):
+            hr_count = self.org_booking_hours.get(key, 0) + hours
             self.org_booking_hours[key] = hr_count
-        else:
-            self.org_booking_hours[key] = 1
-        return f"Increased organization booking hours in current month to {hr_count}"
-
-    def decrease_organization_booking_hours(self, organization):
-        """Function to decrease organization's booking hours in current month"""
-        key = self._generate_org_booking_key(organization)
-        hr_count = self.org_booking_hours.get(key)
-        if hr_count:
-            hr_count -= 1
+        return f"Increased organization booking hours in month to {hr_count}"
+
+    def decrease_organization_booking_hours(self, organization, hours=1, month=None):
+        """Function to decrease organization's booking hours in a month,
+        current month by default"""
+        key = self._generate_org_booking_key(organization, month)
+        with self.quota_locks.get_lock(key):
+            hr_count = max(self.org_booking_hours.get(key, 0) - hours, 0)
             self.org_booking_hours[key] = hr_count
-        else:
-            self.org_booking_hours[key] = 0
-        return f"Decreased organization booking hours in current month to {hr_count}"
+        return f"Decreased organization booking hours in month to {hr_count}"
+
+    def reserve_organization_booking_hours(self, organization, month_hours={}):
+        """Admission check for bookings, month_hours is {month: hours}.
+        Hours of all months are added only if every month stays within
+        the quota, else QuotaExceededException is raised & nothing changes"""
+        limit = self.get_organization_booking_limit(organization)
+        keys = {month: self._generate_org_booking_key(organization, month)
+                for month in month_hours}
+        quota_locks = self.quota_locks.get_locks(keys.values())
+        for quota_lock in quota_locks:  # sorted order, can't deadlock
+            quota_lock.acquire()
+        try:
+            for month, hours in month_hours.items():
+                if self.org_booking_hours.get(keys[month], 0) + hours > limit:
+                    raise QuotaExceededException(limit)
+            for month, hours in month_hours.items():
+                self.org_booking_hours[keys[month]] = self.org_booking_hours.get(keys[month], 0) + hours
+        finally:
+            for quota_lock in quota_locks:
+                quota_lock.release()
+        return True
+
+    def release_organization_booking_hours(self, organization, month_hours={}):
+        """Gives back hours reserved for bookings, month_hours is {month: hours}"""
+        for month, hours in month_hours.items():
+            self.decrease_organization_booking_hours(organization, hours, month)
+        return True
 
-    def get_organization_booking_hours(self, organization):
-        """Returns organization's booking hours in current month"""
-        key = self._generate_org_booking_key(organization)
+    def get_organization_booking_hours(self, organization, month=None, date=""):
+        """Returns organization's booking hours in a month, or in the month
+        of date(dd-mm-YYYY), current month by default"""
+        if date:
+            try:
+                month = get_month_of_ordinal(get_date_ordinal(date))
+            except (TypeError, ValueError):
+                raise InvalidParameterException("Date")
+        key = self._generate_org_booking_key(organization, month)
         return self.org_booking_hours.get(key, 0)
-    
-    def _generate_org_booking_key(self, organization):
+
+    def get_organization_booking_limit(self, organization):
+        """Returns organization's monthly quota of booking hours"""
+        return self.org_booking_limit.get(organization, self.default_booking_limit)
+
+    def set_organization_booking_limit(self, requestor="", organization="", hours=0):
+        """Changes organization's monthly quota of booking hours
+        Requires Manage Organizations Permission"""
+        if not self._check_can_create_organization(requestor):  # check permissions
+            raise AuthorizationException("Update Organization")
+        if not self._check_if_organization_exists(organization):
+            raise NotFoundException("Organization")
+        self._set_organization_booking_limit(organization, hours)
+        return f"Monthly quota of organization {organization} set to {hours} hours"
+
+    def _check_booking_limit(self, hours):
+        if not isinstance(hours, int) or hours < 0:
+            raise InvalidParameterException("Monthly Quota")
+
+    def _set_organization_booking_limit(self, organization, hours):
+        self._check_booking_limit(hours)
+        self.org_booking_limit[organization] = hours
+        self.building.record(OP_BOOKING_LIMIT, organization, hours)
+
+    def _generate_org_booking_key(self, organization, month=None):
         """A unique key for every organization and month is generated
         so that each month's track records are maintained"""
-        return organization + get_month_year()
+        if month is None:
+            month = get_month_of_ordinal(get_today_ordinal())
+        return (organization, month)
 
 
-organization_handler = Organization()
+organization_handler = Organization()  # of the default building
 
 
 class User:
-    users = {}
     admin_role_name = "admin"
     normal_user_role_name = "user"
 
+    def __init__(self):
+        self.users = {}
+        self.users_snapshot = VersionedSnapshot(self.users)
+        self.role_permissions = {}  # (role, permissions) -> permissions shared by users
+
     def _create_user(self, *args, **kwargs):
         """Private function, to be called from inside the User class only"""
-        self.users[kwargs.get("email")] = kwargs
+        permissions = kwargs.get("permissions", {})
+        kwargs["permissions"] = self.role_permissions.setdefault(  # read only, users of a role share it
+            (kwargs.get("role"), tuple(sorted(permissions.items()))), MappingProxyType(dict(permissions)))
+        self.users[kwargs.get("email")] = UserRecord(**kwargs)
+        self.users_snapshot.publish()
+        if kwargs.get("organization"):
+            self.organization_handler._add_user_to_organization(
+                kwargs.get("organization"), kwargs.get("email"))  # create user-organization grouping
+        self.building.record(OP_USER, kwargs.get("email"), kwargs.get("full_name"),
+                             kwargs.get("role"), kwargs.get("id"), kwargs.get("organization"))
         return True
+
+    def _restore_user(self, email, full_name, role, id, organization):
+        """Creates user from a journal record, permissions come from role"""
+        if role == self.admin_role_name:
+            permissions = Authorization.get_admin_permissions()
+        else:
+            permissions = Authorization.get_user_permissions()
+        return self._create_user(email=email, full_name=full_name, role=role,
+                                 id=id, permissions=permissions,
+                                 organization=organization)
     
     def create_admin_user(self, email="", full_name=""):
         """Public function to be called from outside the class
@@ -138,7 +239,7 @@ class User:
         if user_exists:
             raise DuplicateException("User")
 
-        organization_details = organization_handler.\
+        organization_details = self.organization_handler.\
             get_organization_details(organization)
         if not organization_details:
             raise NotFoundException("Organization")
@@ -151,10 +252,6 @@ class User:
                           permissions=permissions, 
                           organization=organization
                           )
-
-        organization_handler._add_user_to_organization(
-            organization, email)  # create user-organization grouping
-
         return f"User with email {email} created successfully"
     
     def _check_can_create_users(self, requestor_email):
@@ -170,8 +267,8 @@ class User:
         return False
     
     def get_all_users(self):
-        """Returns Details of all organizations"""
-        return self.users
+        """Returns read only snapshot of Details of all users"""
+        return self.users_snapshot.get()
 
     def get_organization_from_user(self, user_email):
         """Returns Details of organization from user"""
@@ -186,4 +283,7 @@ class User:
             raise RequiredParameterException(email)
         return self.users.get(email, None)
 
-user_handler = User()
+user_handler = User()  # of the default building
+
+# bound here so users work without booking.booking, which binds the rest of it
+default_building = Building(DEFAULT_BUILDING, (organization_handler, user_handler), record)
@@ -1,3 +1,8 @@
+from itertools import count
+from threading import Lock
+from types import MappingProxyType
+
+
 class Node(object):
   
     def __init__(self, val):
@@ -113,4 +118,67 @@ class LinkedList(object):
         Time complexity O(1) as only returns True or False
         """
         #we only have to check the head if is None or not
-        return self.head == None
\ No newline at end of file
+        return self.head == None
+
+class StripedLock(object):
+    """
+    Fixed pool of locks shared by keys via hashing, so that operations
+    on different keys mostly proceed in parallel without keeping
+    one lock per key around
+    """
+
+    def __init__(self, stripes=64):
+        self.locks = [Lock() for _ in range(stripes)]
+
+    def get_lock(self, key):
+        """Returns the lock guarding key"""
+        return self.locks[hash(key) % len(self.locks)]
+
+    def get_locks(self, keys):
+        """
+        Returns distinct locks guarding all keys, in a fixed order
+        so that acquiring them one after other can't deadlock
+        """
+        stripes = sorted({hash(key) % len(self.locks) for key in keys})
+        return [self.locks[stripe] for stripe in stripes]
+
+    def drain(self):
+        """
+        Takes & releases every lock once, so every critical section that
+        began before the call has finished when it returns
+        """
+        for lock in self.locks:
+            with lock:
+                pass
+
+
+class VersionedSnapshot(object):
+    """
+    Copy-on-write read view of a dict. Writers mutate the dict and call
+    publish(), readers get an immutable copy which is made again only
+    after a publish, so readers & writers never wait for each other.
+    Values are shared with the dict, they should not be mutated in place
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.versions = count(1)
+        self.version = 0
+        self.snapshot = (-1, MappingProxyType({}))  # (version, copy) set together
+
+    def publish(self):
+        """Marks that the dict changed, next read copies it"""
+        self.version = next(self.versions)
+
+    def get(self):
+        """
+        Returns read only copy of the dict as of some moment at or after
+        the last publish. dict.copy is done in one step under the GIL,
+        so it never sees a write half done
+        """
+        version = self.version
+        snapshot_version, snapshot = self.snapshot
+        if snapshot_version != version:
+            snapshot = MappingProxyType(self.source.copy())
+            self.snapshot = (version, snapshot)
+        return snapshot
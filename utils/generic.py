@@ -1,20 +1,94 @@
+import time
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+
+class SystemClock:
+    """Current date & time of the machine, today's date is computed once
+    a day instead of on every call"""
+
+    def __init__(self):
+        self.today_ordinal = 0
+        self.next_midnight = 0  # timestamp when today_ordinal goes stale
+
+    def now(self):
+        return datetime.now()
+
+    def get_today_ordinal(self):
+        if time.time() >= self.next_midnight:
+            today = date.today()
+            tomorrow = datetime.combine(today + timedelta(days=1), datetime.min.time())
+            self.today_ordinal = today.toordinal()
+            self.next_midnight = tomorrow.timestamp()
+        return self.today_ordinal
+
+
+class FrozenClock:
+    """Clock stuck at one moment, for benchmarks & reproducible runs"""
+
+    def __init__(self, moment=None):
+        self.moment = moment or datetime.now()
+
+    def now(self):
+        return self.moment
+
+    def get_today_ordinal(self):
+        return self.moment.toordinal()
+
+
+clock = SystemClock()
+
+
+def set_clock(new_clock):
+    """Replaces the clock used for current date & time, returns old one"""
+    global clock
+    old_clock, clock = clock, new_clock
+    return old_clock
+
+
+def get_today_ordinal():
+    return clock.get_today_ordinal()
 
 
 def get_today():
-    return date.today().strftime("%d-%m-%Y")
+    return format_date_ordinal(clock.get_today_ordinal())
 
 
 def get_month_year():
-    return date.today().strftime("%m-%Y")
+    return format_date_ordinal(clock.get_today_ordinal())[3:]
 
 
 def get_date_before(days=30):
-    return (date.today()-timedelta(days=30)).strftime("%d-%m-%Y")
+    return format_date_ordinal(clock.get_today_ordinal() - days)
+
+
+@lru_cache(maxsize=4096)
+def get_date_ordinal(date_str):
+    """Returns proleptic Gregorian ordinal of a dd-mm-YYYY date string"""
+    return datetime.strptime(date_str, '%d-%m-%Y').toordinal()
+
+
+@lru_cache(maxsize=4096)
+def format_date_ordinal(ordinal):
+    """Returns dd-mm-YYYY date string of an ordinal"""
+    return date.fromordinal(ordinal).strftime('%d-%m-%Y')
+
+
+@lru_cache(maxsize=4096)
+def get_month_of_ordinal(ordinal):
+    """Returns number of months since year 0 of the ordinal's month,
+    so months can be compared & stepped as integers"""
+    day = date.fromordinal(ordinal)
+    return day.year * 12 + day.month - 1
+
+
+def get_current_minute_of_day():
+    now = clock.now()
+    return now.hour * 60 + now.minute
 
 
 def get_current_hour_minute():
-    return datetime.now().strftime('%H:%M')
+    return clock.now().strftime('%H:%M')
 
 
 # def compare_dates_string(date_str1, date_str2):
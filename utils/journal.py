@@ -0,0 +1,174 @@
+"""Append-only journal of mutating operations, so a restarted process can
+rebuild its in-memory state. In-memory structures stay the source of
+truth, journal is only written to & read back on startup.
+
+Frame of a record: 4 byte payload length, 4 byte crc32 of payload, then
+payload, a marshal dump of (op, args). Reading stops at the first torn or
+corrupt frame, which is what a crash in the middle of a write leaves"""
+import marshal
+import os
+import struct
+import threading
+import zlib
+from mmap import ACCESS_READ, mmap
+
+FRAME_HEADER = struct.Struct("<II")  # (payload length, crc32)
+OP_ORGANIZATION = "organization"
+OP_BOOKING_LIMIT = "booking_limit"
+OP_USER = "user"
+OP_FLOOR = "floor"
+OP_ROOM = "room"
+OP_ROOM_UPDATE = "room_update"
+OP_BOOK = "book"
+OP_CANCEL = "cancel"
+OP_SERIES = "series"
+OP_SERIES_SKIP = "series_skip"  # one occurrence of recurring booking cancelled
+OP_SERIES_END = "series_end"  # recurring booking cancelled from a date onwards
+OP_ARCHIVE = "archive"  # bookings dated before a date moved to the archive
+OP_ARCHIVE_ROWS = "archive_rows"  # archived bookings of a month, written by checkpoints only
+
+
+def encode_record(op, args):
+    """Returns framed bytes of one record"""
+    payload = marshal.dumps((op, args))
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_payloads(path):
+    """Yields (payload, end offset) of valid frames of the file, file is
+    memory mapped so nothing is copied before a frame is checked"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb") as journal_file, \
+            mmap(journal_file.fileno(), 0, access=ACCESS_READ) as data:
+        offset, size, header_size = 0, len(data), FRAME_HEADER.size
+        while offset + header_size <= size:
+            length, crc = FRAME_HEADER.unpack_from(data, offset)
+            start, end = offset + header_size, offset + header_size + length
+            if end > size:
+                return  # torn write at the tail
+            payload = data[start:end]
+            if zlib.crc32(payload) != crc:
+                return
+            offset = end
+            yield payload, offset
+
+
+def read_records(path):
+    """Yields (op, args) of records in the file"""
+    for payload, offset in _read_payloads(path):
+        yield marshal.loads(payload)
+
+
+def get_valid_size(path):
+    """Returns size of the file up to end of its last valid frame"""
+    valid_size = 0
+    for payload, valid_size in _read_payloads(path):
+        pass
+    return valid_size
+
+
+def write_records(path, records):
+    """Writes (op, args) records to a new file atomically, a reader sees
+    either the old file or the complete new one"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as new_file:
+        chunk = []
+        for op, args in records:
+            chunk.append(encode_record(op, args))
+            if len(chunk) >= 4096:
+                new_file.write(b"".join(chunk))
+                chunk = []
+        new_file.write(b"".join(chunk))
+        new_file.flush()
+        os.fsync(new_file.fileno())
+    os.replace(temp_path, path)
+
+
+class Journal:
+    """Appends records to a journal file with group commit, records are
+    buffered & written by a flusher thread every commit_interval seconds
+    (or once batch_size records are waiting), one write & fsync per batch.
+    A crash loses at most the last commit_interval of operations"""
+
+    def __init__(self, path, commit_interval=0.01, batch_size=1024, sync=True):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.sync = sync
+        self.lock = threading.Lock()  # guards buffer & file
+        self.buffer = []
+        self.records_count = 0  # records appended since journal was started
+        if os.path.exists(path):  # later records would be unreadable after a torn one
+            os.truncate(path, get_valid_size(path))
+        self.file = open(path, "ab")
+        self.on_flush = None  # called by flusher thread after every batch
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def append(self, op, args):
+        """Buffers a record, written with the next batch"""
+        frame = encode_record(op, args)
+        with self.lock:
+            self.buffer.append(frame)
+            self.records_count += 1
+            if len(self.buffer) < self.batch_size:
+                return
+            self._write_buffer()
+
+    def _write_buffer(self):
+        """Caller holds the lock"""
+        if not self.buffer:
+            return
+        self.file.write(b"".join(self.buffer))
+        self.buffer = []
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+
+    def flush(self):
+        """Writes buffered records now"""
+        with self.lock:
+            self._write_buffer()
+
+    def rotate(self, old_path):
+        """Moves records written so far to old_path & starts an empty file,
+        old file is kept until a checkpoint covers it"""
+        with self.lock:
+            self._write_buffer()
+            self.file.close()
+            os.replace(self.path, old_path)
+            self.file = open(self.path, "ab")
+            self.records_count = 0
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.commit_interval):
+            self.flush()
+            if self.on_flush:
+                self.on_flush(self)
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        with self.lock:
+            self._write_buffer()
+            self.file.close()
+
+
+journal = None  # journal operations are recorded in, if any
+
+
+def set_journal(new_journal):
+    """Replaces the journal operations are recorded in, returns old one"""
+    global journal
+    old_journal, journal = journal, new_journal
+    return old_journal
+
+
+def record(op, *args):
+    """Records a mutating operation, args must be marshal-able values
+    Caller still holds the locks of the change, so records of one room or
+    user are in the order they were applied"""
+    if journal is not None:
+        journal.append(op, args)
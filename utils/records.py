@@ -0,0 +1,168 @@
+"""Compact record types for entities kept in memory
+Records use __slots__ instead of a per object dict, and read like the
+dicts handlers used to return eg. record["name"], record.get("floor")"""
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+def intern_string(value):
+    """Returns the shared copy of a string, so repeated room, user,
+    organization & date names are stored once"""
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+class Record(Mapping):
+    """Read only dict view over the slots listed in fields, slots are set
+    once while the record is built. Records are shared with stores, a
+    change is a new record"""
+    __slots__ = ()
+    fields = ()
+    read_only_fields = ()  # slots holding read only dict views
+
+    def _set_slots(self, **values):
+        for slot, value in values.items():
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read only")
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def to_dict(self):
+        """Returns a plain dict copy of the record"""
+        return {field: getattr(self, field) for field in self.fields}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+    def __reduce__(self):
+        """Records are pickled to be sent between processes, read only
+        views are sent as dicts & wrapped again"""
+        values = tuple(dict(value) if isinstance(value, MappingProxyType) else value
+                       for value in (getattr(self, slot) for slot in self.__slots__))
+        return _restore_record, (type(self), values)
+
+
+def _restore_record(record_class, values):
+    record = record_class.__new__(record_class)
+    for slot, value in zip(record_class.__slots__, values):
+        if slot in record_class.read_only_fields:
+            value = MappingProxyType(value)
+        object.__setattr__(record, slot, value)
+    return record
+
+
+class BookingRecord(Record):
+    __slots__ = ("start_hour", "end_hour", "date", "date_ordinal",
+                 "user", "room", "organization")
+    fields = ("slot", "date", "user", "room", "organization", "date_ordinal")
+
+    def __init__(self, start_hour=0, end_hour=1, date="", date_ordinal=0,
+                 user="", room="", organization=""):
+        self._set_slots(
+            start_hour=start_hour,
+            end_hour=end_hour,
+            date=intern_string(date),
+            date_ordinal=date_ordinal,
+            user=intern_string(user),
+            room=intern_string(room),
+            organization=intern_string(organization)
+        )
+
+    @property
+    def slot(self):
+        """Slot in the {start:end} form it was booked with"""
+        return {self.start_hour: self.end_hour}
+
+
+class RoomRecord(Record):
+    __slots__ = ("id", "name", "floor", "capacity", "is_projector_available",
+                 "other_details", "is_available")
+    fields = __slots__
+    read_only_fields = ("other_details",)
+
+    def __init__(self, id="", name="", floor=1, capacity=0,
+                 is_projector_available=False, other_details={},
+                 is_available=True):
+        self._set_slots(
+            id=id,
+            name=intern_string(name),
+            floor=floor,
+            capacity=capacity,
+            is_projector_available=is_projector_available,
+            other_details=other_details,
+            is_available=is_available
+        )
+
+
+class UserRecord(Record):
+    __slots__ = ("email", "full_name", "role", "id", "permissions", "organization")
+    fields = __slots__
+    read_only_fields = ("permissions",)
+
+    def __init__(self, email="", full_name="", role="", id="",
+                 permissions={}, organization=""):
+        self._set_slots(
+            email=intern_string(email),
+            full_name=full_name,
+            role=intern_string(role),
+            id=id,
+            permissions=permissions,
+            organization=intern_string(organization)
+        )
+
+
+class OrganizationRecord(Record):
+    __slots__ = ("id", "name", "contact_info", "other_details")
+    fields = __slots__
+    read_only_fields = ("other_details",)
+
+    def __init__(self, id="", name="", contact_info="", other_details={}):
+        self._set_slots(
+            id=id,
+            name=intern_string(name),
+            contact_info=contact_info,
+            other_details=other_details
+        )
+
+
+class ChangeRecord(Record):
+    """Event of the booking change feed, see booking.feed"""
+    __slots__ = ("sequence", "kind", "key", "room", "floor", "organization",
+                 "user", "date_ordinal", "start_hour", "end_hour")
+    fields = ("sequence", "kind", "key", "room", "floor", "organization",
+              "user", "date_ordinal", "slot")
+
+    def __init__(self, sequence=0, kind="", key="", room="", floor=None,
+                 organization="", user="", date_ordinal=0, start_hour=0, end_hour=1):
+        self._set_slots(
+            sequence=sequence,
+            kind=kind,
+            key=key,
+            room=room,
+            floor=floor,
+            organization=organization,
+            user=user,
+            date_ordinal=date_ordinal,
+            start_hour=start_hour,
+            end_hour=end_hour
+        )
+
+    @property
+    def slot(self):
+        return {self.start_hour: self.end_hour}
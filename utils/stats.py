@@ -0,0 +1,202 @@
+"""Low overhead instrumentation of handler methods & locks
+Methods are wrapped only while instrumentation is attached, so detached
+code runs exactly as written. Every thread counts into its own record,
+records of all threads are added up when stats are read"""
+import functools
+import json
+import sys
+import threading
+from time import perf_counter
+
+HISTOGRAM_BUCKETS = 32  # bucket n counts latencies below 2**n microseconds
+
+
+def _get_bucket(seconds):
+    return min(int(seconds * 1000000).bit_length(), HISTOGRAM_BUCKETS - 1)
+
+
+def _get_percentile_ms(histogram, calls, percent):
+    """Upper bound of the bucket holding the percentile"""
+    wanted, seen = calls * percent / 100, 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if count and seen >= wanted:
+            return (1 << bucket) / 1000
+    return 0
+
+
+class TimedLock:
+    """Lock wrapper counting acquires and time spent waiting for them"""
+    __slots__ = ("lock", "name", "stats")
+
+    def __init__(self, lock, name, stats):
+        self.lock = lock
+        self.name = name
+        self.stats = stats
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            self.stats._add_lock_wait(self.name, 0)
+            return True
+        start = perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        self.stats._add_lock_wait(self.name, perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class Stats:
+    def __init__(self):
+        self.local = threading.local()
+        self.thread_records = []  # (operations, locks) of every thread
+        self.lock = threading.Lock()  # guards thread_records & attachments
+        self.patched_methods = []  # (handler, attribute name) wrapped on the handler
+        self.patched_locks = []  # (StripedLock, original locks)
+        self.dump_stopped = None
+
+    def _get_thread_record(self):
+        thread_record = getattr(self.local, "record", None)
+        if thread_record is None:
+            thread_record = self.local.record = ({}, {})
+            with self.lock:
+                self.thread_records.append(thread_record)
+        return thread_record
+
+    def _add_call(self, name, seconds, error=None):
+        operations = self._get_thread_record()[0]
+        operation = operations.get(name)
+        if operation is None:  # [calls, total seconds, histogram, {error: count}]
+            operation = operations[name] = [0, 0.0, [0] * HISTOGRAM_BUCKETS, {}]
+        operation[0] += 1
+        operation[1] += seconds
+        operation[2][_get_bucket(seconds)] += 1
+        if error is not None:
+            operation[3][error] = operation[3].get(error, 0) + 1
+
+    def _add_lock_wait(self, name, seconds):
+        locks = self._get_thread_record()[1]
+        lock_stats = locks.get(name)
+        if lock_stats is None:  # [acquires, contended, wait seconds, max wait]
+            lock_stats = locks[name] = [0, 0, 0.0, 0.0]
+        lock_stats[0] += 1
+        if seconds:
+            lock_stats[1] += 1
+            lock_stats[2] += seconds
+            lock_stats[3] = max(lock_stats[3], seconds)
+
+    def wrap(self, name, function):
+        """Returns function counting its calls, latency & exceptions"""
+        @functools.wraps(function)
+        def instrumented(*args, **kwargs):
+            start = perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self._add_call(name, perf_counter() - start, type(e).__name__)
+                raise
+            self._add_call(name, perf_counter() - start)
+            return result
+        return instrumented
+
+    def attach(self, handler, prefix=None):
+        """Instruments every public method of the handler, named
+        prefix.method, prefix is class name by default. Bound methods are
+        wrapped on the handler itself, other handlers of its class aren't
+        instrumented"""
+        handler_class = type(handler)
+        prefix = prefix or handler_class.__name__
+        with self.lock:
+            for attribute, value in list(vars(handler_class).items()):
+                if attribute.startswith("_") or not callable(value):
+                    continue
+                self.patched_methods.append((handler, attribute))
+                setattr(handler, attribute, self.wrap(f"{prefix}.{attribute}", getattr(handler, attribute)))
+
+    def attach_locks(self, name, striped_lock):
+        """Times acquires of every lock of a StripedLock"""
+        with self.lock:
+            self.patched_locks.append((striped_lock, striped_lock.locks))
+            striped_lock.locks = [TimedLock(lock, name, self) for lock in striped_lock.locks]
+
+    def detach(self):
+        """Restores methods & locks, stats gathered so far are kept"""
+        with self.lock:
+            for handler, attribute in reversed(self.patched_methods):
+                delattr(handler, attribute)  # method of the class is seen again
+            for striped_lock, locks in reversed(self.patched_locks):
+                striped_lock.locks = locks
+            self.patched_methods, self.patched_locks = [], []
+
+    def is_attached(self):
+        return bool(self.patched_methods or self.patched_locks)
+
+    def reset(self):
+        """Drops stats gathered so far"""
+        with self.lock:
+            for operations, locks in self.thread_records:
+                operations.clear()
+                locks.clear()
+
+    def get_stats(self):
+        """Returns stats of operations & locks added up over threads"""
+        operations, locks = {}, {}
+        with self.lock:
+            thread_records = list(self.thread_records)
+        for thread_operations, thread_locks in thread_records:
+            for name, (calls, seconds, histogram, errors) in list(thread_operations.items()):
+                operation = operations.setdefault(name, [0, 0.0, [0] * HISTOGRAM_BUCKETS, {}])
+                operation[0] += calls
+                operation[1] += seconds
+                operation[2] = [total + count for total, count in zip(operation[2], histogram)]
+                for error, count in list(errors.items()):
+                    operation[3][error] = operation[3].get(error, 0) + count
+            for name, (acquires, contended, seconds, max_seconds) in list(thread_locks.items()):
+                lock_stats = locks.setdefault(name, [0, 0, 0.0, 0.0])
+                lock_stats[0] += acquires
+                lock_stats[1] += contended
+                lock_stats[2] += seconds
+                lock_stats[3] = max(lock_stats[3], max_seconds)
+
+        return {
+            "operations": {name: {
+                "calls": calls,
+                "errors": errors,
+                "total_ms": seconds * 1000,
+                "mean_ms": seconds * 1000 / calls,
+                "p50_ms": _get_percentile_ms(histogram, calls, 50),
+                "p95_ms": _get_percentile_ms(histogram, calls, 95),
+                "p99_ms": _get_percentile_ms(histogram, calls, 99),
+                "histogram_us": {1 << bucket: count for bucket, count in enumerate(histogram) if count},
+            } for name, (calls, seconds, histogram, errors) in sorted(operations.items())},
+            "locks": {name: {
+                "acquires": acquires,
+                "contended": contended,
+                "wait_ms": seconds * 1000,
+                "max_wait_ms": max_seconds * 1000,
+            } for name, (acquires, contended, seconds, max_seconds) in sorted(locks.items())},
+        }
+
+    def start_dump(self, interval=60, output=None):
+        """Writes stats as a json line to output(stderr by default) every
+        interval seconds, until stop_dump"""
+        self.stop_dump()
+        stopped = self.dump_stopped = threading.Event()
+
+        def dump():
+            while not stopped.wait(interval):
+                (output or sys.stderr).write(json.dumps(self.get_stats()) + "\n")
+
+        threading.Thread(target=dump, daemon=True).start()
+
+    def stop_dump(self):
+        if self.dump_stopped:
+            self.dump_stopped.set()
+            self.dump_stopped = None